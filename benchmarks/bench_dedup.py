@@ -0,0 +1,53 @@
+# benchmarks/bench_dedup.py
+# Usage: python -m benchmarks.bench_dedup [--sizes 10000 2000000] [--queries 20000]
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import best_of, fmt_rate, make_history
+from dedup import DuplicateIndex, historical_duplicate_features
+
+
+def check_parity(n=5000):
+    # the vectorized training features must equal scoring the rows one at a time,
+    # in date order, against an index that grows as they are added
+    df = make_history(n, n_vendors=50)
+    df.loc[::7, 'invoice_no'] = None
+    hist = historical_duplicate_features(df)
+    index = DuplicateIndex()
+    seq = np.zeros_like(hist)
+    for i in np.argsort(df['date'].to_numpy(), kind='stable'):
+        row = df.iloc[i]
+        seq[i] = index.query(row['vendor'], row['invoice_no'], row['date'], row['amount'])
+        index.add(row['vendor'], row['invoice_no'], row['date'], row['amount'])
+    assert np.array_equal(hist, seq), 'historical features differ from sequential queries'
+
+    bulk = DuplicateIndex.from_dataframe(df)
+    index.compact()
+    probe = df.sample(200, random_state=0).to_dict('records')
+    assert np.array_equal(bulk.query_many(probe), index.query_many(probe)), 'bulk and online index differ'
+    print(f'parity ok on {n:,} rows')
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Duplicate index build and query latency')
+    ap.add_argument('--sizes', type=int, nargs='+', default=[10_000, 2_000_000])
+    ap.add_argument('--queries', type=int, default=20_000)
+    args = ap.parse_args()
+
+    check_parity()
+    for n in args.sizes:
+        df = make_history(n)
+        build_s, index = best_of(lambda: DuplicateIndex.from_dataframe(df), repeat=1)
+        hist_s, _ = best_of(lambda: historical_duplicate_features(df), repeat=1)
+        probe = df.sample(min(args.queries, n), random_state=1).to_dict('records')
+        t0 = time.perf_counter()
+        index.query_many(probe)
+        query_s = time.perf_counter() - t0
+        print(f'{n:>12,} rows  build {build_s:7.3f}s ({fmt_rate(n, build_s)})  '
+              f'history features {hist_s:7.3f}s  query {query_s / len(probe) * 1e6:6.1f}us')
+
+
+if __name__ == '__main__':
+    main()
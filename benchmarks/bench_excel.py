@@ -0,0 +1,54 @@
+# benchmarks/bench_excel.py
+# Usage: python -m benchmarks.bench_excel [--rows 10 1000 20000] [--cols 5 50]
+import argparse
+import os
+import tempfile
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from benchmarks.common import best_of
+from invoice_parser import parse_excel, _parse_text_fields
+
+
+def legacy_parse_excel(path):
+    # the original pandas path: whole sheet into a DataFrame, flattened back to text
+    df = pd.read_excel(path, engine='openpyxl')
+    text = ' '.join(df.astype(str).fillna('').agg(' '.join, axis=1).tolist())
+    return _parse_text_fields(text)
+
+
+def scaled_workbook(template, path, n_rows, n_cols):
+    # the sample invoice with n_rows extra line items, each n_cols wide, before the total row
+    wb = load_workbook(template)
+    ws = wb.active
+    total_row = [list(r) for r in ws.iter_rows(min_row=ws.max_row, values_only=True)][0]
+    ws.delete_rows(ws.max_row)
+    for i in range(n_rows):
+        ws.append([f'Item {i}', 'Consulting hours', i % 9 + 1, '$125.00', '$125.00']
+                  + [f'note {i}-{j}' for j in range(max(0, n_cols - 5))])
+    ws.append(total_row)
+    wb.save(path)
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Structured read-only Excel parsing vs the pandas flatten path')
+    ap.add_argument('--template', default='sample_invoice_low_risk.xlsx')
+    ap.add_argument('--rows', type=int, nargs='+', default=[10, 1000, 20000])
+    ap.add_argument('--cols', type=int, nargs='+', default=[5, 50])
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_cols in args.cols:
+            for n_rows in args.rows:
+                path = os.path.join(tmp, f'wb_{n_rows}_{n_cols}.xlsx')
+                scaled_workbook(args.template, path, n_rows, n_cols)
+                repeat = 1 if n_rows * n_cols > 100_000 else 3
+                t_new, new = best_of(lambda: parse_excel(path), repeat)
+                t_old, old = best_of(lambda: legacy_parse_excel(path), repeat)
+                print(f'{n_rows:>6} rows x {n_cols:>3} cols  read-only {t_new:7.3f}s  pandas {t_old:7.3f}s  '
+                      f'x{t_old / t_new:4.1f}  amount {new["amount"]} (pandas: {old["amount"]})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# benchmarks/bench_explain.py
+# Usage: python -m benchmarks.bench_explain [--rows 10000 100000] [--singles 500] [--parity 200]
+# Needs trained artifacts (python model_train.py).
+# Tree-contribution explanations: explainer build time, batch explain time (sklearn
+# leaf lookup + precomputed leaf contributions), single-invoice latency through the
+# compact export, additivity (baseline + contributions == predict_proba) and parity
+# with a brute-force walk of each tree's decision path.
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import best_of, fmt_rate, make_history
+from compact_forest import CompactForest
+from features_extraction import build_features_from_dataframe, FEATURE_COLS
+from tree_explainer import TreeExplainer
+from utils import get_registry
+
+
+def brute_force(model, Xs):
+    # mean over trees of (child value - parent value) credited to the parent's split feature
+    out = np.zeros((len(Xs), model.n_features_in_))
+    for est in model.estimators_:
+        tree = est.tree_
+        total = tree.value[:, 0, :].sum(axis=1)
+        value = tree.value[:, 0, 1] / np.where(total > 0, total, 1)
+        paths = est.decision_path(Xs.astype(np.float32))
+        for i in range(len(Xs)):
+            path = paths.indices[paths.indptr[i]:paths.indptr[i + 1]]
+            for parent, child in zip(path[:-1], path[1:]):
+                out[i, tree.feature[parent]] += value[child] - value[parent]
+    return out / len(model.estimators_)
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Per-feature tree contribution explanations: speed and correctness')
+    ap.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    ap.add_argument('--singles', type=int, default=500, help='single-invoice explanations timed')
+    ap.add_argument('--parity', type=int, default=200, help='rows checked against a brute-force path walk')
+    args = ap.parse_args()
+
+    artifacts = get_registry().get()
+    model, scaler = artifacts.model, artifacts.scaler
+    t_build, explainer = best_of(lambda: TreeExplainer.from_sklearn(model, FEATURE_COLS))
+    print(f'{explainer.n_trees} trees, {len(explainer.leaf_contributions):,} leaves: built in {t_build * 1e3:.0f}ms, '
+          f'{explainer.leaf_contributions.nbytes / 2**20:.1f} MB of leaf contributions')
+
+    X, _, _ = build_features_from_dataframe(make_history(max(args.rows)), dtype=np.float64)
+    for n in args.rows:
+        Xs = scaler.transform(X[:n])
+        t_leaves, leaves = best_of(lambda: explainer.sklearn_leaves(model, Xs))
+        t_contrib, contrib = best_of(lambda: explainer.contributions(leaves))
+        t_proba, proba = best_of(lambda: model.predict_proba(Xs)[:, 1])
+        gap = np.abs(explainer.baseline + contrib.sum(axis=1) - proba).max()
+        total = t_leaves + t_contrib
+        print(f'{n:>8,} invoices  explain {total:6.2f}s ({fmt_rate(n, total)}: leaves {t_leaves:.2f}s + '
+              f'contributions {t_contrib:.2f}s)  predict_proba {t_proba:.2f}s  max additivity gap {gap:.1e}')
+
+    compact = artifacts.compact_model or CompactForest.from_sklearn(model, scaler)
+    times = np.empty(args.singles)
+    for i in range(args.singles):
+        row = X[i:i + 1]
+        t0 = time.perf_counter()
+        explainer.contributions(compact.apply(row))
+        times[i] = time.perf_counter() - t0
+    print(f'single invoice via compact export: p50 {np.percentile(times, 50) * 1e3:.2f}ms  '
+          f'p99 {np.percentile(times, 99) * 1e3:.2f}ms')
+
+    Xs = scaler.transform(X[:args.parity])
+    fast = explainer.contributions(explainer.sklearn_leaves(model, Xs))
+    assert np.allclose(fast, brute_force(model, Xs), atol=1e-12), 'precomputed contributions differ from the path walk'
+    assert np.array_equal(fast[:50], explainer.contributions(compact.apply(X[:50]))), 'compact leaves differ'
+    print(f'parity ok: {args.parity} rows match a brute-force decision-path walk; compact and sklearn leaves agree')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+# benchmarks/bench_features.py
+# Usage: python -m benchmarks.bench_features [--sizes 10000 1000000 10000000]
+import argparse
+
+import numpy as np
+
+from benchmarks.common import make_history, best_of, fmt_rate
+from features_extraction import build_features_from_dataframe, compute_vendor_stats, extract_invoice_features
+
+
+def scalar_features(df, stats):
+    # the original per-row iterrows path, kept here as the speed baseline (parity: tests/test_features.py)
+    X = []
+    for _, row in df.iterrows():
+        parsed = {'invoice_no': row['invoice_no'], 'vendor': row['vendor'], 'date': row['date'], 'amount': row['amount']}
+        X.append(extract_invoice_features(parsed, stats))
+    return np.array(X)
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Benchmark columnar vs per-row feature building')
+    ap.add_argument('--sizes', type=int, nargs='+', default=[10_000, 1_000_000, 10_000_000])
+    ap.add_argument('--scalar-max', type=int, default=10_000,
+                    help='largest size for which the per-row baseline is also timed')
+    args = ap.parse_args()
+
+    for n in args.sizes:
+        df = make_history(n)
+        t_vec, (X, _, _) = best_of(lambda: build_features_from_dataframe(df), repeat=1 if n > 1_000_000 else 3)
+        line = f'{n:>12,} rows  columnar {t_vec:8.3f}s ({fmt_rate(n, t_vec)}, {X.nbytes / 2**20:,.1f} MiB)'
+        if n <= args.scalar_max:
+            stats = compute_vendor_stats(df)
+            t_row, _ = best_of(lambda: scalar_features(df, stats), repeat=1)
+            line += f'  per-row {t_row:8.3f}s ({fmt_rate(n, t_row)}, x{t_row / t_vec:,.0f})'
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# benchmarks/bench_history_store.py
+# Usage: python -m benchmarks.bench_history_store [--sizes 100000 2000000]
+import os
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.common import best_of, fmt_rate
+from history_store import convert_csv, load_history, info
+from synthetic import write_synthetic
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+
+def check_parity(csv_df, store_df):
+    # the store holds the same rows, grouped by month (file order kept within a month)
+    month = csv_df['date'].dt.strftime('%Y-%m')
+    ref = csv_df.iloc[np.argsort(month.to_numpy(), kind='stable')].reset_index(drop=True)
+    assert (ref['invoice_no'].to_numpy() == store_df['invoice_no'].to_numpy()).all(), 'row order differs'
+    assert (ref['vendor'].to_numpy() == store_df['vendor'].astype(object).to_numpy()).all(), 'vendors differ'
+    assert (ref['date'].to_numpy() == store_df['date'].to_numpy()).all(), 'dates differ'
+    assert np.array_equal(ref['amount'].to_numpy(), store_df['amount'].to_numpy()), 'amounts differ'
+    assert np.array_equal(ref['label'].to_numpy(), store_df['label'].to_numpy()), 'labels differ'
+
+
+def main():
+    ap = argparse.ArgumentParser(description='History load time: CSV with parse_dates vs the Parquet store')
+    ap.add_argument('--sizes', type=int, nargs='+', default=[100_000, 2_000_000])
+    ap.add_argument('--vendors', type=int, default=2000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            csv_path = os.path.join(tmp, f'history_{n}.csv')
+            store_path = os.path.join(tmp, f'history_{n}')
+            write_synthetic(csv_path, n, n_vendors=args.vendors, end_date='2025-12-31')
+            convert_s, _ = best_of(lambda: convert_csv(csv_path, store_path), repeat=1)
+
+            csv_s, csv_df = best_of(lambda: pd.read_csv(csv_path, parse_dates=['date']))
+            store_s, store_df = best_of(lambda: load_history(store_path))
+            month_s, month_df = best_of(lambda: load_history(store_path, start='2025-06-01', end='2025-06-30'))
+            check_parity(csv_df, store_df)
+            assert len(month_df) == int(csv_df['date'].between('2025-06-01', '2025-06-30').sum()), 'range rows differ'
+
+            mb = 2**20
+            print(f'{n:>12,} rows  csv {os.path.getsize(csv_path) / mb:7.1f}MB on disk, '
+                  f'{csv_df.memory_usage(deep=True).sum() / mb:7.1f}MB loaded  |  '
+                  f'store {dir_size(store_path) / mb:7.1f}MB, {store_df.memory_usage(deep=True).sum() / mb:7.1f}MB '
+                  f'({info(store_path)["months"]} months, converted in {convert_s:.2f}s)')
+            print(f'{"":>12}       load: csv {csv_s:7.3f}s ({fmt_rate(n, csv_s)})  store {store_s:7.3f}s '
+                  f'({fmt_rate(n, store_s)}, {csv_s / store_s:4.1f}x)  one month {month_s:7.3f}s '
+                  f'({len(month_df):,} rows, {csv_s / month_s:5.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# benchmarks/bench_inference.py
+# Usage: python -m benchmarks.bench_inference [--singles 1000] [--batches 1 64 512 4096]
+# Needs trained artifacts (python model_train.py).
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import make_history
+from compact_forest import CompactForest
+from features_extraction import build_features_from_dataframe
+from utils import load_model_and_artifacts
+
+
+def feature_rows(n):
+    X, _, _ = build_features_from_dataframe(make_history(n), dtype=np.float64)
+    return X
+
+
+def check_parity(compact, model, scaler, X):
+    # bit-identical on ordinary rows and on rows sitting exactly at / next to folded thresholds
+    assert np.array_equal(compact.predict_proba(X), model.predict_proba(scaler.transform(X))), 'random rows differ'
+    rng = np.random.default_rng(0)
+    nodes = rng.choice(np.flatnonzero(~compact.is_leaf), size=min(len(X), 5000))
+    edge = X[rng.integers(0, len(X), size=len(nodes))].copy()
+    for k, i in enumerate(nodes):
+        t = compact.threshold[i]
+        edge[k, compact.feature[i]] = (t, np.nextafter(t, np.inf), np.nextafter(t, -np.inf))[k % 3]
+    edge = edge[np.isfinite(edge).all(axis=1)]
+    assert np.array_equal(compact.predict_proba(edge), model.predict_proba(scaler.transform(edge))), 'threshold rows differ'
+    print(f'parity ok: {len(X):,} rows + {len(edge):,} threshold-edge rows, bit-identical')
+
+
+def latencies(fn, X, n):
+    times = np.empty(n)
+    for i in range(n):
+        row = X[i % len(X)][None, :]
+        t0 = time.perf_counter()
+        fn(row)
+        times[i] = time.perf_counter() - t0
+    return times
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Single-invoice and batch latency: sklearn vs compact forest export')
+    ap.add_argument('--singles', type=int, default=1000)
+    ap.add_argument('--batches', type=int, nargs='+', default=[1, 64, 512, 4096])
+    args = ap.parse_args()
+
+    model, scaler, _ = load_model_and_artifacts()
+    t0 = time.perf_counter()
+    compact = CompactForest.from_sklearn(model, scaler)
+    print(f'export: {compact.n_trees} trees, {compact.n_nodes:,} nodes, {time.perf_counter() - t0:.2f}s')
+    X = feature_rows(20_000)
+    check_parity(compact, model, scaler, X)
+
+    sk = lambda rows: model.predict_proba(scaler.transform(rows))
+    for name, fn in [('sklearn', sk), ('compact', compact.predict_proba)]:
+        times = latencies(fn, X, args.singles) * 1e6
+        print(f'single invoice {name:8s} p50 {np.percentile(times, 50):8.0f}us  p99 {np.percentile(times, 99):8.0f}us')
+    for n in args.batches:
+        rows = X[:n]
+        timing = []
+        for fn in (sk, compact.predict_proba):
+            t0 = time.perf_counter()
+            fn(rows)
+            timing.append(time.perf_counter() - t0)
+        print(f'batch {n:>6,}  sklearn {timing[0] * 1e3:8.2f}ms  compact {timing[1] * 1e3:8.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# benchmarks/bench_metrics.py
+# Usage: python -m benchmarks.bench_metrics [--calls 1000000] [--texts 20000]
+# Instrumentation overhead: per-call cost of span()/incr() and end-to-end
+# _parse_text_fields / feature-building cost with metrics off and on.
+import argparse
+import time
+
+
+import metrics
+from benchmarks.common import best_of, make_history
+from benchmarks.suite import invoice_texts
+from features_extraction import build_features_from_dataframe
+from invoice_parser import _parse_text_fields
+
+
+def per_call_ns(fn, calls):
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - t0) / calls * 1e9
+
+
+def empty_span():
+    with metrics.span('bench'):
+        pass
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Cost of the metrics instrumentation, disabled and enabled')
+    ap.add_argument('--calls', type=int, default=1_000_000)
+    ap.add_argument('--texts', type=int, default=20_000)
+    ap.add_argument('--rows', type=int, default=200_000)
+    args = ap.parse_args()
+
+    texts = invoice_texts(args.texts)
+    df = make_history(args.rows)
+    raw_parse = _parse_text_fields.__wrapped__
+    baseline = per_call_ns(lambda: None, args.calls)
+    t_raw, _ = best_of(lambda: [raw_parse(t) for t in texts])
+    for on in (False, True):
+        metrics.enable(on)
+        metrics.reset()
+        span_ns = per_call_ns(empty_span, args.calls) - baseline
+        incr_ns = per_call_ns(lambda: metrics.incr('bench'), args.calls) - baseline
+        t_parse, _ = best_of(lambda: [_parse_text_fields(t) for t in texts])
+        t_feat, _ = best_of(lambda: build_features_from_dataframe(df), repeat=3)
+        print(f'metrics {"on " if on else "off"}  span {span_ns:6.0f}ns  incr {incr_ns:6.0f}ns  '
+              f'_parse_text_fields {t_parse / len(texts) * 1e6:6.2f}us/text '
+              f'({(t_parse / t_raw - 1) * 100:+5.1f}% vs undecorated)  '
+              f'build_features_from_dataframe {t_feat:6.3f}s')
+    metrics.enable(False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+# benchmarks/bench_parse_pool.py
+# Usage: python -m benchmarks.bench_parse_pool [--files 200] [--workers 1 2 4 8]
+import argparse
+import glob
+import os
+import time
+
+from invoice_parser import parse_many
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Parsing throughput of invoice_parser.parse_many by worker count')
+    ap.add_argument('--files', type=int, default=200, help='number of files to parse (sample invoices repeated)')
+    ap.add_argument('--workers', type=int, nargs='+', default=None)
+    args = ap.parse_args()
+
+    samples = sorted(glob.glob('sample_invoice_*.xlsx') + glob.glob('sample_invoice_*.pdf'))
+    if not samples:
+        raise SystemExit('run from the repository root (sample_invoice_* files not found)')
+    paths = [samples[i % len(samples)] for i in range(args.files)]
+    cores = os.cpu_count() or 1
+    worker_counts = args.workers or sorted({1, 2, 4, 8, 16, 32, cores} & set(range(1, cores + 1)))
+
+    base = None
+    for workers in worker_counts:
+        t0 = time.perf_counter()
+        errors = sum('error' in res for _, res in parse_many(paths, workers=workers, ordered=False))
+        elapsed = time.perf_counter() - t0
+        base = base or elapsed
+        print(f'workers={workers:>3}  {elapsed:7.2f}s  {len(paths) / elapsed:8.1f} files/s  '
+              f'speedup x{base / elapsed:5.2f}  errors={errors}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+# benchmarks/bench_pdf_pages.py
+# Usage: python -m benchmarks.bench_pdf_pages [--pages 200]
+import argparse
+import os
+import tempfile
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from benchmarks.common import best_of
+from invoice_parser import parse_pdf
+
+
+def make_statement_pdf(path, n_pages):
+    # statement-style invoice: header on page 1, line items throughout, total on the last page
+    c = canvas.Canvas(path, pagesize=letter)
+    for p in range(n_pages):
+        y = 740
+        if p == 0:
+            for line in ['Omega Inc', 'Invoice Number: INV-2024-004', 'Date: 2024-08-10']:
+                c.drawString(72, y, line)
+                y -= 18
+        for i in range(40):
+            c.drawString(72, y, f'Item {p * 40 + i:05d}  Consulting hours  1  $125.00  $125.00')
+            y -= 15
+        if p == n_pages - 1:
+            c.drawString(72, y - 10, f'Grand Total: {n_pages * 40 * 125:,}.00')
+        c.showPage()
+    c.save()
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Streaming/early-stop PDF parsing vs reading every page')
+    ap.add_argument('--pages', type=int, default=200)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'statement.pdf')
+        make_statement_pdf(path, args.pages)
+        t_full, full = best_of(lambda: parse_pdf(path, max_pages=None, early_stop=False), repeat=1)
+        t_stream, streamed = best_of(lambda: parse_pdf(path), repeat=3)
+    print(f'{args.pages} pages  all pages {t_full:7.3f}s  streaming {t_stream:7.3f}s  x{t_full / t_stream:,.1f}')
+    print('same fields:', full == streamed, streamed)
+
+
+if __name__ == '__main__':
+    main()
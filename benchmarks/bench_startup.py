@@ -0,0 +1,95 @@
+# benchmarks/bench_startup.py
+# Usage: python -m benchmarks.bench_startup [--repeat 5] [--pdf sample_invoice_pdf.pdf] [--xlsx sample_invoice_low_risk.xlsx]
+# Start-up cost of short-lived scoring processes (batch workers, CLI runs). Every
+# run is a fresh interpreter scoring one invoice - pre-parsed JSON, an Excel file
+# or a PDF - and reports import, artifact load, parse and first-score times plus
+# the process's total wall time and which heavy modules it ended up importing.
+# Each scenario runs with the array artifacts memory-mapped (default) and read
+# into memory (INVOICE_ARTIFACT_MMAP=0). Train with `python model_train.py --compact`
+# to include the forest export, the largest memory-mappable artifact.
+# Only the standard library is imported at module level so the child runs measure
+# the scoring modules' imports, not this script's.
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import statistics
+import subprocess
+
+HEAVY_MODULES = ('numpy', 'pandas', 'sklearn', 'joblib', 'pdfplumber', 'openpyxl')
+PHASES = ('import_ms', 'load_ms', 'parse_ms', 'score_ms', 'in_process_ms', 'wall_ms')
+RECORD = {'vendor': 'Acme Supplies', 'invoice_no': 'INV-1001', 'date': '2025-06-30', 'amount': 1250.0}
+
+
+def child(kind, path):
+    # one cold start: import, load artifacts, (parse,) score one invoice
+    t0 = time.perf_counter()
+    import scoring
+    from utils import get_registry
+    t1 = time.perf_counter()
+    artifacts = get_registry().get()
+    t2 = time.perf_counter()
+    if kind == 'json':
+        record = dict(RECORD)
+    else:
+        from invoice_parser import parse_file
+        record = parse_file(path)
+    t3 = time.perf_counter()
+    scoring.score_records([record], artifacts=artifacts)
+    t4 = time.perf_counter()
+    return {
+        'import_ms': (t1 - t0) * 1e3,
+        'load_ms': (t2 - t1) * 1e3,
+        'parse_ms': (t3 - t2) * 1e3,
+        'score_ms': (t4 - t3) * 1e3,
+        'in_process_ms': (t4 - t0) * 1e3,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'compact_model': artifacts.compact_model is not None,
+        'imported': [m for m in HEAVY_MODULES if m in sys.modules],
+    }
+
+
+def run_once(kind, path, mmap):
+    env = dict(os.environ, INVOICE_ARTIFACT_MMAP='1' if mmap else '0')
+    cmd = [sys.executable, '-m', 'benchmarks.bench_startup', '--child', kind]
+    if path:
+        cmd += ['--file', path]
+    t0 = time.perf_counter()
+    out = subprocess.run(cmd, env=env, capture_output=True, text=True, check=True).stdout
+    wall = time.perf_counter() - t0
+    result = json.loads(out.strip().splitlines()[-1])
+    result['wall_ms'] = wall * 1e3
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Import + first-score time of a fresh scoring process')
+    ap.add_argument('--repeat', type=int, default=5, help='runs per scenario (medians are reported)')
+    ap.add_argument('--pdf', default='sample_invoice_pdf.pdf')
+    ap.add_argument('--xlsx', default='sample_invoice_low_risk.xlsx')
+    ap.add_argument('--child', choices=['json', 'excel', 'pdf'], help=argparse.SUPPRESS)
+    ap.add_argument('--file', help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child, args.file)))
+        return
+
+    scenarios = [('json', None), ('excel', args.xlsx), ('pdf', args.pdf)]
+    run_once('json', None, True)  # warm the page cache
+    for kind, path in scenarios:
+        for mmap in (True, False):
+            runs = [run_once(kind, path, mmap) for _ in range(args.repeat)]
+            med = {p: statistics.median(r[p] for r in runs) for p in PHASES}
+            rss = statistics.median(r['peak_rss_mb'] for r in runs)
+            print(f'{kind:5s} mmap {"on " if mmap else "off"}  '
+                  + '  '.join(f'{p[:-3]} {med[p]:7.1f}ms' for p in PHASES)
+                  + f'  peak RSS {rss:5.0f} MB  imports: {" ".join(runs[0]["imported"])}')
+    if not runs[0]['compact_model']:
+        print('(no model_compact.pkl - train with --compact to memory-map the forest export)')
+
+
+if __name__ == '__main__':
+    main()
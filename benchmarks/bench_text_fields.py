@@ -0,0 +1,104 @@
+# benchmarks/bench_text_fields.py
+# Usage: python -m benchmarks.bench_text_fields [--mb 8] [--fuzz 20000]
+import argparse
+import random
+import re
+from datetime import datetime
+
+from benchmarks.common import best_of
+from invoice_parser import _parse_text_fields, DATE_PATTERNS, AMOUNT_PATTERN, INVOICE_PATTERN
+
+TOKENS = ['Invoice', 'INVOICE', 'Invoice No.', 'Inv. No.', 'Inv No', 'Total', 'Grand Total', 'TOTAL:',
+          'Amount', 'Invoice Total:', '₹', 'Vendor:', 'Omega Inc', 'Beta Traders', 'Date:', '2024-08-10',
+          '2024-13-45', '10/08/2024', '31/02/2024', '10 August 2024', '10-Aug-2024', '5 Foo 2024',
+          '1,234.50', '5000', '12.', ',', '.5', 'INV-2024-001', 'x/y_z', ':', '  ', '\n', '\r\n', '\x0c',
+          '12024-08-10', 'a2024-08-10', '1/10/08/2024', 'Grand  Total', 'AMOUNT₹5', 'inv-', '-', '/']
+
+
+def legacy_parse_text_fields(text):
+    # the original implementation, kept as the parity/speed baseline
+    res = {'vendor': None, 'invoice_no': None, 'date': None, 'amount': None}
+    lines = [l.strip() for l in text.splitlines() if l.strip()]
+    if lines:
+        res['vendor'] = lines[0][:60]
+    m = re.search(INVOICE_PATTERN, text, flags=re.IGNORECASE)
+    if m:
+        res['invoice_no'] = m.group(2)
+    for pat in DATE_PATTERNS:
+        m = re.search(pat, text)
+        if m:
+            date_str = m.group(1)
+            try:
+                if '-' in date_str:
+                    parsed = datetime.strptime(date_str, '%Y-%m-%d')
+                elif '/' in date_str:
+                    parsed = datetime.strptime(date_str, '%d/%m/%Y')
+                else:
+                    parsed = datetime.strptime(date_str, '%d %B %Y')
+                res['date'] = parsed.strftime('%Y-%m-%d')
+                break
+            except Exception:
+                continue
+    m = re.search(AMOUNT_PATTERN, text, flags=re.IGNORECASE)
+    if m:
+        amt = m.group(2).replace(',', '')
+        try:
+            res['amount'] = float(amt)
+        except:
+            pass
+    else:
+        nums = re.findall(r"\b[0-9,]+\.?[0-9]*\b", text)
+        nums = [n.replace(',', '') for n in nums]
+        floats = []
+        for n in nums:
+            try:
+                floats.append(float(n))
+            except:
+                pass
+        if floats:
+            res['amount'] = float(max(floats))
+    return res
+
+
+def random_text(rng, n_tokens):
+    return ''.join(rng.choice(TOKENS) + rng.choice([' ', '', '\n', ': ']) for _ in range(n_tokens))
+
+
+def check_parity(n_cases, seed=0):
+    rng = random.Random(seed)
+    for _ in range(n_cases):
+        text = random_text(rng, rng.randint(0, 30))
+        new, old = _parse_text_fields(text), legacy_parse_text_fields(text)
+        if new != old:
+            raise AssertionError(f'mismatch for {text!r}: {new} != {old}')
+    print(f'parity ok on {n_cases:,} random texts')
+
+
+def invoice_text(rng, n_lines):
+    # invoice-like text: header fields, line items, labelled total at the end
+    lines = ['Omega Inc', 'INVOICE', f'Invoice Number: INV-2024-{rng.randint(0, 999):03d}', 'Date: 10/08/2024']
+    lines += [f'Item {i}  Consulting hours  {rng.randint(1, 9)}  $125.00  ${rng.randint(100, 9999)}.00'
+              for i in range(n_lines)]
+    lines += ['Due Date: 2024-09-10', f'Grand Total: {rng.randint(1000, 99999):,}.00']
+    return '\n'.join(lines)
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Throughput of _parse_text_fields vs the uncompiled multi-pass version')
+    ap.add_argument('--mb', type=float, default=8, help='total MB of invoice text per run')
+    ap.add_argument('--fuzz', type=int, default=20000, help='random texts for the parity check')
+    args = ap.parse_args()
+
+    check_parity(args.fuzz)
+    rng = random.Random(1)
+    for n_lines in (20, 200, 2000):
+        doc = invoice_text(rng, n_lines)
+        docs = [doc] * max(1, int(args.mb * 2**20 / len(doc.encode())))
+        mb = sum(len(d.encode()) for d in docs) / 2**20
+        t_new, _ = best_of(lambda: [_parse_text_fields(d) for d in docs])
+        t_old, _ = best_of(lambda: [legacy_parse_text_fields(d) for d in docs])
+        print(f'{n_lines:>5} item lines  compiled {mb / t_new:8.1f} MB/s  legacy {mb / t_old:8.1f} MB/s  x{t_old / t_new:.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+# benchmarks/bench_velocity.py
+# Usage: python -m benchmarks.bench_velocity [--sizes 10000 2000000] [--queries 20000]
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.common import best_of, fmt_rate, make_history
+from velocity import VelocityTracker, historical_velocity_features
+
+
+def check_parity(n=5000):
+    # the vectorized training features must equal querying then adding the rows
+    # one at a time, in date order, on a ring-buffer tracker
+    df = make_history(n, n_vendors=20)
+    df['amount'] += np.random.default_rng(1).integers(0, 100, size=n) / 100
+    hist = historical_velocity_features(df)
+    tracker = VelocityTracker()
+    seq = np.zeros_like(hist)
+    for i in np.argsort(df['date'].to_numpy(), kind='stable'):
+        row = df.iloc[i]
+        seq[i] = tracker.query(row['vendor'], row['date'])
+        tracker.add(row['vendor'], row['date'], row['amount'])
+    assert np.array_equal(hist[:, [0, 1, 3]], seq[:, [0, 1, 3]]), 'window counts / gaps differ'
+    assert np.allclose(hist[:, 2], seq[:, 2]), 'window amount sums differ'
+
+    # scoring-time queries come after the history; the bulk build keeps only its tail
+    bulk = VelocityTracker.from_dataframe(df)
+    probe = df.sample(200, random_state=0).to_dict('records')
+    for k, r in enumerate(probe):
+        r['date'] = df['date'].max() + pd.Timedelta(days=k % 40)
+    assert np.allclose(bulk.query_many(probe), tracker.query_many(probe)), 'bulk and online tracker differ'
+    print(f'parity ok on {n:,} rows')
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Velocity feature engine: vectorized history and online query cost')
+    ap.add_argument('--sizes', type=int, nargs='+', default=[10_000, 2_000_000])
+    ap.add_argument('--queries', type=int, default=20_000)
+    args = ap.parse_args()
+
+    check_parity()
+    for n in args.sizes:
+        df = make_history(n)
+        hist_s, _ = best_of(lambda: historical_velocity_features(df), repeat=1)
+        build_s, tracker = best_of(lambda: VelocityTracker.from_dataframe(df), repeat=1)
+        probe = df.sample(min(args.queries, n), random_state=1).to_dict('records')
+        t0 = time.perf_counter()
+        tracker.query_many(probe)
+        query_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for r in probe:
+            tracker.add(r['vendor'], r['date'], r['amount'])
+        add_s = time.perf_counter() - t0
+        print(f'{n:>12,} rows  history features {hist_s:7.3f}s ({fmt_rate(n, hist_s)})  '
+              f'tracker build {build_s:6.3f}s  query {query_s / len(probe) * 1e6:5.1f}us  '
+              f'add {add_s / len(probe) * 1e6:5.1f}us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# benchmarks/bench_vendor_resolver.py
+# Usage: python -m benchmarks.bench_vendor_resolver [--vendors 1000 50000] [--queries 2000] [--rows 1000000]
+# Vendor resolution: index build time, per-query latency of exact / fuzzy /
+# cached lookups, fuzzy accuracy on misspelled names, parity of the trigram
+# index with a brute-force Dice scan, unseen names that must stay unresolved,
+# and batch normalization throughput.
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import best_of, fmt_rate
+import synthetic
+from vendor_resolver import (VendorResolver, canonical_vendor, CANDIDATE_SIMILARITY, MAX_CANDIDATES,
+                             _edit_similarity, _same_vendor, _trigrams)
+
+WORD_CHARS = list('abcdefghijklmnopqrstuvwxyz')
+SUFFIXES = ['Pvt Ltd', 'Inc', 'LLC', 'Traders', 'Services', 'Supplies', 'Co', 'Enterprises', 'Logistics', '']
+# new vendors that look like known ones (synthetic.vendor_names(2000)): each must resolve to None
+UNSEEN = ['Zeta Traders', 'Delta Traders', 'Gamma Supplies', 'Vendor 09999', 'Vendor 12345', 'Vendor 2000']
+# misspellings of known ones: each must resolve to its vendor
+TYPOS = {'Beta Tradres': 'Beta Traders', 'ALPHA SUPLIES PVT LTD': 'Alpha Supplies', 'Delta Servces': 'Delta Services',
+         'Vendr 00999': 'Vendor 00999', 'Vendor 01234 LLC': 'Vendor 01234'}
+
+
+def vendor_names(n, seed=0):
+    # distinct made-up company names: one or two random words plus a trade/legal suffix
+    rng = np.random.default_rng(seed)
+    words = [''.join(rng.choice(WORD_CHARS, rng.integers(3, 10))).capitalize() for _ in range(max(1000, n // 5))]
+    names = set()
+    while len(names) < n:
+        parts = list(rng.choice(words, rng.integers(1, 3))) + [SUFFIXES[rng.integers(len(SUFFIXES))]]
+        names.add(' '.join(parts).strip())
+    return sorted(names)
+
+
+def misspell(name, rng):
+    # upper-cased, one character dropped
+    i = int(rng.integers(1, len(name) - 1))
+    return (name[:i] + name[i + 1:]).upper()
+
+
+def brute_force(resolver, name):
+    key = canonical_vendor(name)
+    grams = _trigrams(key)
+    sims = np.array([2 * len(grams & _trigrams(k)) / (len(grams) + len(_trigrams(k))) for k in resolver._keys])
+    order = np.argsort(-sims, kind='stable')
+    candidates = [i for i in order[:MAX_CANDIDATES] if sims[i] >= CANDIDATE_SIMILARITY]
+    best, best_sim = None, 0.0
+    for i in candidates:
+        if _same_vendor(key, resolver._keys[i]) and _edit_similarity(key, resolver._keys[i]) > best_sim:
+            best, best_sim = i, _edit_similarity(key, resolver._keys[i])
+    return resolver._names[best] if best is not None and best_sim >= resolver.threshold else None
+
+
+def check_unseen():
+    resolver = VendorResolver.from_names(synthetic.vendor_names(2000))
+    for name in UNSEEN:
+        assert resolver.resolve(name) is None, f'unseen vendor {name!r} resolved to {resolver.resolve(name)!r}'
+    for name, vendor in TYPOS.items():
+        assert resolver.resolve(name) == vendor, f'{name!r} resolved to {resolver.resolve(name)!r}, not {vendor!r}'
+    print(f'unseen names stay unresolved ({len(UNSEEN)}), misspellings resolve ({len(TYPOS)})')
+
+
+def per_query_us(resolver, names):
+    t0 = time.perf_counter()
+    for name in names:
+        resolver.resolve(name)
+    return (time.perf_counter() - t0) / len(names) * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Vendor resolver build time, query latency and accuracy')
+    ap.add_argument('--vendors', type=int, nargs='+', default=[1_000, 50_000])
+    ap.add_argument('--queries', type=int, default=2_000)
+    ap.add_argument('--rows', type=int, default=1_000_000, help='rows for the batch normalization timing')
+    ap.add_argument('--parity', type=int, default=50, help='fuzzy queries checked against a brute-force scan')
+    args = ap.parse_args()
+
+    check_unseen()
+    rng = np.random.default_rng(0)
+    for n in args.vendors:
+        names = vendor_names(n)
+        t_build, resolver = best_of(lambda: VendorResolver.from_names(names), repeat=1)
+        picks = rng.integers(0, n, size=args.queries)
+        exact = [names[i].upper() + ' Pvt. Ltd.' for i in picks]
+        fuzzy = [misspell(names[i], rng) for i in picks]
+        exact_us = per_query_us(resolver, exact)
+        fuzzy_us = per_query_us(resolver, fuzzy)
+        cached_us = per_query_us(resolver, fuzzy)
+        keys = [canonical_vendor(names[i]) for i in picks]
+        hits = np.mean([r is not None and canonical_vendor(r) == k for r, k in zip(resolver.resolve_many(fuzzy), keys)])
+        for name in fuzzy[:args.parity]:
+            resolver._cache.clear()
+            assert resolver.resolve(name) == brute_force(resolver, name), f'index and brute force differ on {name!r}'
+        print(f'{n:>7,} vendors  build {t_build:6.2f}s  exact {exact_us:7.1f}us  fuzzy {fuzzy_us:7.1f}us  '
+              f'cached {cached_us:5.2f}us  misspelled -> right vendor {hits:6.1%}  (parity ok on {args.parity})')
+
+        rows = np.array(names, dtype=object)[rng.integers(0, n, size=args.rows)]
+        t_norm, _ = best_of(lambda: VendorResolver().normalize_many(rows), repeat=1)
+        print(f'         normalize_many on {args.rows:,} rows {t_norm:6.2f}s ({fmt_rate(args.rows, t_norm)})')
+
+
+if __name__ == '__main__':
+    main()
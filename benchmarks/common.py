@@ -0,0 +1,37 @@
+# benchmarks/common.py
+import time
+
+import numpy as np
+import pandas as pd
+
+VENDORS = ['Alpha Supplies', 'Beta Traders', 'Gamma Co', 'Delta Services', 'Omega Inc']
+
+
+def make_history(n, n_vendors=1000, seed=0):
+    # synthetic invoice history with the same columns as data/synthetic_invoices.csv
+    rng = np.random.default_rng(seed)
+    vendors = np.array(VENDORS + [f'Vendor {i:05d}' for i in range(max(0, n_vendors - len(VENDORS)))])
+    base = rng.choice([100, 250, 500, 1200, 5000, 10000], size=n)
+    amount = np.maximum(10, base + np.round(rng.normal(0, base * 0.15)))
+    return pd.DataFrame({
+        'invoice_no': pd.Series(rng.integers(1000, 10000, size=n)).map('INV-{}'.format),
+        'vendor': vendors[rng.integers(0, len(vendors), size=n)],
+        'date': pd.Timestamp('2025-01-01') - pd.to_timedelta(rng.integers(0, 365, size=n), unit='D'),
+        'amount': amount.astype(np.float64),
+        'label': (rng.random(n) < 0.05).astype(np.int64),
+    })
+
+
+def best_of(fn, repeat=3):
+    # minimum wall time over `repeat` runs and the last result
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def fmt_rate(n, seconds):
+    return f'{n / seconds:,.0f}/s' if seconds > 0 else 'inf'
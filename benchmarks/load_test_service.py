@@ -0,0 +1,100 @@
+# benchmarks/load_test_service.py
+# Usage: python service.py --port 8000 &
+#        python -m benchmarks.load_test_service [--url http://127.0.0.1:8000] [--concurrency 1 16 64]
+#                                               [--requests 2000] [--file sample_invoice_pdf.pdf]
+# Keep-alive HTTP/1.1 clients on asyncio streams (stdlib only); reports throughput,
+# p50/p95/p99 latency and the service's mean micro-batch size.
+import json
+import time
+import asyncio
+import argparse
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from benchmarks.common import make_history
+
+
+def invoice_payloads(n):
+    df = make_history(n)
+    df['date'] = df['date'].dt.strftime('%Y-%m-%d')
+    return [json.dumps(r).encode() for r in df[['vendor', 'invoice_no', 'date', 'amount']].to_dict('records')]
+
+
+async def request(reader, writer, host, method, path, body=b'', content_type='application/json'):
+    writer.write(f'{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: {content_type}\r\n'
+                 f'Content-Length: {len(body)}\r\n\r\n'.encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def client(url, jobs, latencies, errors):
+    reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+    try:
+        while jobs:
+            path, body, content_type = jobs.pop()
+            t0 = time.perf_counter()
+            status, _ = await request(reader, writer, url.netloc, 'POST', path, body, content_type)
+            latencies.append(time.perf_counter() - t0)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def get_json(url, path):
+    reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+    try:
+        _, body = await request(reader, writer, url.netloc, 'GET', path)
+        return json.loads(body)
+    finally:
+        writer.close()
+
+
+async def run(url, jobs, concurrency):
+    latencies, errors = [], []
+    jobs = list(reversed(jobs))
+    before = await get_json(url, '/health')
+    t0 = time.perf_counter()
+    await asyncio.gather(*[client(url, jobs, latencies, errors) for _ in range(concurrency)])
+    elapsed = time.perf_counter() - t0
+    after = await get_json(url, '/health')
+    batches = after['batches'] - before['batches']
+    mean_batch = (after['batched_invoices'] - before['batched_invoices']) / batches if batches else float('nan')
+    return np.array(latencies) * 1e3, errors, elapsed, mean_batch
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Throughput and tail latency of a running scoring service')
+    ap.add_argument('--url', default='http://127.0.0.1:8000')
+    ap.add_argument('--concurrency', type=int, nargs='+', default=[1, 16, 64])
+    ap.add_argument('--requests', type=int, default=2000)
+    ap.add_argument('--file', default=None, help='post this invoice file to /score instead of JSON invoices')
+    args = ap.parse_args()
+
+    url = urlsplit(args.url)
+    if args.file:
+        with open(args.file, 'rb') as f:
+            data = f.read()
+        jobs = [('/score', data, 'application/octet-stream')] * args.requests
+    else:
+        jobs = [('/score', body, 'application/json') for body in invoice_payloads(args.requests)]
+
+    for c in args.concurrency:
+        ms, errors, elapsed, mean_batch = asyncio.run(run(url, jobs, c))
+        print(f'concurrency {c:>4}  {len(ms) / elapsed:8,.0f} req/s  p50 {np.percentile(ms, 50):7.2f}ms  '
+              f'p95 {np.percentile(ms, 95):7.2f}ms  p99 {np.percentile(ms, 99):7.2f}ms  '
+              f'mean batch {mean_batch:5.1f}  errors {len(errors)}')
+
+
+if __name__ == '__main__':
+    main()
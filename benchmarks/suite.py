@@ -0,0 +1,265 @@
+# benchmarks/suite.py
+# Per-stage benchmark suite with machine-readable results.
+# Usage: python -m benchmarks.suite run --out bench.json [--quick] [--stages parse_pdf predict_proba ...]
+#        python -m benchmarks.suite compare base.json bench.json [--threshold 0.10]
+# Every (stage, size) runs in a fresh process, so peak_rss_mb is that stage's own peak.
+# compare exits with status 1 when any metric regressed by more than the threshold.
+import os
+import sys
+import io
+import json
+import time
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from benchmarks.common import make_history
+
+# metric -> True when higher is better
+METRICS = {'throughput': True, 'p50_ms': False, 'p95_ms': False, 'p99_ms': False, 'peak_rss_mb': False}
+
+
+def invoice_texts(n, seed=0):
+    # text as pdfplumber returns it for a simple invoice, one per history row
+    df = make_history(n, seed=seed)
+    rng = np.random.default_rng(seed)
+    texts = []
+    for row, items in zip(df.itertuples(index=False), rng.integers(1, 8, size=n)):
+        lines = [row.vendor, f'Invoice No: {row.invoice_no}', f'Date: {row.date:%Y-%m-%d}', 'Bill To: ACME Corp']
+        lines += [f'Item {i} Consulting hours {i + 1} 125.00 {125 * (i + 1)}.00' for i in range(items)]
+        lines.append(f'Grand Total: {row.amount:,.2f}')
+        texts.append('\n'.join(lines))
+    return texts
+
+
+def _records(n):
+    df = make_history(n)
+    df['date'] = df['date'].dt.strftime('%Y-%m-%d')
+    return df[['invoice_no', 'vendor', 'date', 'amount']].to_dict('records')
+
+
+def _feature_rows(n):
+    from features_extraction import build_features_from_dataframe
+    X, _, _ = build_features_from_dataframe(make_history(max(n, 1000)), dtype=np.float64)
+    return X[:n]
+
+
+def _per_item(fn, items):
+    # one latency per call
+    times = np.empty(len(items))
+    for i, item in enumerate(items):
+        t0 = time.perf_counter()
+        fn(item)
+        times[i] = time.perf_counter() - t0
+    return times
+
+
+def _repeated(fn, repeat):
+    # one latency per whole-batch call
+    return _per_item(lambda _: fn(), range(repeat))
+
+
+def _invoice_files(n, fmt, work_dir):
+    from synthetic import write_invoice_files
+    return write_invoice_files(work_dir, n, formats=(fmt,), workers=min(8, os.cpu_count() or 1))
+
+
+def stage_parse_pdf(n, work_dir):
+    from invoice_parser import parse_pdf
+    return n, _per_item(parse_pdf, _invoice_files(n, 'pdf', work_dir))
+
+
+def stage_parse_excel(n, work_dir):
+    from invoice_parser import parse_excel
+    return n, _per_item(parse_excel, _invoice_files(n, 'xlsx', work_dir))
+
+
+def stage_parse_text_fields(n, work_dir):
+    from invoice_parser import _parse_text_fields
+    return n, _per_item(_parse_text_fields, invoice_texts(n))
+
+
+def stage_extract_invoice_features(n, work_dir):
+    from features_extraction import compute_vendor_stats, extract_invoice_features
+    stats = compute_vendor_stats(make_history(10_000))
+    return n, _per_item(lambda r: extract_invoice_features(r, stats), _records(n))
+
+
+def stage_build_features_from_dataframe(n, work_dir):
+    from features_extraction import build_features_from_dataframe
+    df = make_history(n)
+    return n, _repeated(lambda: build_features_from_dataframe(df), 1 if n > 1_000_000 else 3)
+
+
+def _batch_repeat(n):
+    return int(np.clip(100_000 // max(n, 1), 3, 1000))
+
+
+def stage_scaler_transform(n, work_dir):
+    # n = rows per transform call
+    from utils import load_model_and_artifacts
+    _, scaler, _ = load_model_and_artifacts()
+    X = _feature_rows(n)
+    repeat = _batch_repeat(n)
+    return n * repeat, _repeated(lambda: scaler.transform(X), repeat)
+
+
+def stage_predict_proba(n, work_dir):
+    # n = rows per call: scaler + model, through the compact export when scoring.py would use it
+    from scoring import predict_features
+    from utils import get_registry
+    artifacts = get_registry().get()
+    X = _feature_rows(n)
+    repeat = _batch_repeat(n)
+    return n * repeat, _repeated(lambda: predict_features(X, artifacts), repeat)
+
+
+def stage_train(n, work_dir):
+    # model_train.py's in-memory training on an n-row synthetic history (artifacts are not written)
+    from model_train import train_in_memory
+    from synthetic import write_synthetic
+    path = os.path.join(work_dir, 'history.csv')
+    write_synthetic(path, n, n_vendors=max(5, n // 500), end_date='2025-12-31')
+    with contextlib.redirect_stdout(io.StringIO()):
+        times = _repeated(lambda: train_in_memory(path), 1)
+    return n, times
+
+
+# stage -> (function, sizes, unit of size)
+STAGES = {
+    'parse_pdf': (stage_parse_pdf, [20, 200], 'files'),
+    'parse_excel': (stage_parse_excel, [20, 200], 'files'),
+    'parse_text_fields': (stage_parse_text_fields, [1_000, 20_000], 'texts'),
+    'extract_invoice_features': (stage_extract_invoice_features, [1_000, 20_000], 'invoices'),
+    'build_features_from_dataframe': (stage_build_features_from_dataframe, [10_000, 1_000_000], 'rows'),
+    'scaler_transform': (stage_scaler_transform, [1, 1_000, 100_000], 'rows per call'),
+    'predict_proba': (stage_predict_proba, [1, 1_000, 100_000], 'rows per call'),
+    'train': (stage_train, [3_000, 50_000], 'rows'),
+}
+
+
+def run_stage(name, size):
+    # child-process entry point: one stage at one size
+    fn = STAGES[name][0]
+    with tempfile.TemporaryDirectory() as work_dir:
+        items, times = fn(size, work_dir)
+    total = float(times.sum())
+    ms = times * 1e3
+    return {
+        'stage': name,
+        'size': size,
+        'unit': STAGES[name][2],
+        'calls': len(times),
+        'items': int(items),
+        'total_s': total,
+        'throughput': items / total if total > 0 else None,
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _metadata():
+    import sklearn
+    import pandas as pd
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def run(stages, quick=False):
+    results = []
+    ctx = multiprocessing.get_context('spawn')
+    for name in stages:
+        sizes = STAGES[name][1][:1] if quick else STAGES[name][1]
+        for size in sizes:
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                r = pool.submit(run_stage, name, size).result()
+            results.append(r)
+            print(f'{name:30s} {size:>9,} {r["unit"]:13s} {r["throughput"]:12,.1f}/s  p50 {r["p50_ms"]:9.3f}ms  '
+                  f'p95 {r["p95_ms"]:9.3f}ms  p99 {r["p99_ms"]:9.3f}ms  peak RSS {r["peak_rss_mb"]:7,.0f} MB',
+                  flush=True)
+    return {'meta': _metadata(), 'results': results}
+
+
+def compare(base, new, threshold=0.10, metrics=tuple(METRICS)):
+    # [(stage, size, metric, base value, new value, relative change, regressed)] for the
+    # (stage, size) pairs present in both runs; change > 0 always means "worse"
+    rows = []
+    base_results = {(r['stage'], r['size']): r for r in base['results']}
+    for r in new['results']:
+        b = base_results.get((r['stage'], r['size']))
+        if b is None:
+            continue
+        for metric in metrics:
+            higher_is_better = METRICS[metric]
+            old, cur = b.get(metric), r.get(metric)
+            if not old or cur is None:
+                continue
+            change = (old - cur) / old if higher_is_better else (cur - old) / old
+            rows.append((r['stage'], r['size'], metric, old, cur, change, change > threshold))
+    return rows
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Per-stage benchmark suite (JSON results + regression compare)')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    r = sub.add_parser('run', help='run the suite')
+    r.add_argument('--out', default='bench.json')
+    r.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES))
+    r.add_argument('--quick', action='store_true', help='smallest size of each stage only')
+    c = sub.add_parser('compare', help='flag regressions of a run against a baseline')
+    c.add_argument('base')
+    c.add_argument('new')
+    c.add_argument('--threshold', type=float, default=0.10, help='relative change that counts as a regression')
+    c.add_argument('--metrics', nargs='+', choices=list(METRICS), default=list(METRICS),
+                   help='metrics to compare (tail latencies of short stages are noisy)')
+    args = ap.parse_args(argv)
+
+    if args.cmd == 'run':
+        report = run(args.stages, quick=args.quick)
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print('Results written to', args.out)
+        return 0
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    rows = compare(base, new, args.threshold, args.metrics)
+    print(f'base {base["meta"].get("commit")}  vs  new {new["meta"].get("commit")}  '
+          f'(change: + is worse; threshold {args.threshold:.0%})')
+    for stage, size, metric, old, cur, change, regressed in rows:
+        flag = 'REGRESSION' if regressed else ''
+        print(f'{stage:30s} {size:>9,} {metric:12s} {old:14,.3f} -> {cur:14,.3f}  {change:+7.1%}  {flag}')
+    regressions = sum(row[-1] for row in rows)
+    print(f'{regressions} regression(s) in {len(rows)} comparisons')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
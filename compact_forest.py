@@ -0,0 +1,166 @@
+# compact_forest.py
+# Array-backed export of the trained RandomForestClassifier (with the StandardScaler
+# folded into the split thresholds) and a pure-NumPy evaluator that returns the same
+# probabilities as scaler.transform + model.predict_proba, bit for bit.
+import numpy as np
+
+_DBL_MAX = np.finfo(np.float64).max
+_LOW_BITS = np.int64(0x7FFF_FFFF_FFFF_FFFF)
+
+
+def _to_ordered(x):
+    # float64 -> int64 whose integer order is the float order (finite values)
+    bits = np.asarray(x, dtype=np.float64).view(np.int64)
+    return np.where(bits < 0, bits ^ _LOW_BITS, bits)
+
+
+def _from_ordered(o):
+    return np.where(o < 0, o ^ _LOW_BITS, o).astype(np.int64).view(np.float64)
+
+
+def _goes_left(x, threshold, mean, scale):
+    # the comparison the fitted pipeline makes: the scaler works in float64, the
+    # trees cast their input to float32 and compare it with a float64 threshold
+    with np.errstate(over='ignore', invalid='ignore'):
+        z = x
+        if mean is not None:
+            z = z - mean
+        if scale is not None:
+            z = z / scale
+        return z.astype(np.float32).astype(np.float64) <= threshold
+
+
+def fold_thresholds(threshold, mean=None, scale=None):
+    """Raw-feature thresholds T with  x <= T  <=>  the fitted pipeline sends x left.
+
+    mean/scale are the StandardScaler statistics of each node's feature (None
+    when the scaler was not used). The pipeline's test is monotone in x, so T
+    is the largest float64 it still sends left; it is found by bisecting the
+    float64 bit patterns, which makes the fold exact rather than approximate.
+    """
+    threshold = np.asarray(threshold, dtype=np.float64)
+    lo = np.full(threshold.shape, _to_ordered(-_DBL_MAX), dtype=np.int64)
+    hi = np.full(threshold.shape, _to_ordered(_DBL_MAX), dtype=np.int64)
+    never = ~_goes_left(_from_ordered(lo), threshold, mean, scale)
+    # invariant: lo goes left; answer in [lo, hi]
+    while True:
+        active = lo < hi
+        if not active.any():
+            break
+        mid = (lo >> 1) + (hi >> 1) + (((lo & 1) + (hi & 1) + 1) >> 1)
+        left = _goes_left(_from_ordered(mid), threshold, mean, scale)
+        lo = np.where(active & left, mid, lo)
+        hi = np.where(active & ~left, mid - 1, hi)
+    return np.where(never, -np.inf, _from_ordered(lo))
+
+
+class CompactForest:
+    """A fitted forest as flat node arrays, every tree concatenated.
+
+    Split thresholds apply to raw features (the scaler is folded in) and leaves
+    point at themselves. All trees and rows are evaluated together, one tree
+    level per vectorized step. Per-tree probabilities are summed in tree order
+    with a cumulative sum and divided by the tree count, the same float
+    operations sklearn performs, so the output matches predict_proba exactly.
+    """
+
+    def __init__(self, feature, threshold, left, right, missing_left, value, roots, max_depth, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.n_features = n_features
+        self.is_leaf = left == np.arange(len(left))
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @classmethod
+    def from_sklearn(cls, model, scaler=None):
+        # model: fitted RandomForestClassifier; scaler: the StandardScaler applied before it
+        features, thresholds, lefts, rights, missing, values, roots = [], [], [], [], [], [], []
+        offset = 0
+        for est in model.estimators_:
+            tree = est.tree_
+            n = tree.node_count
+            ids = np.arange(offset, offset + n)
+            leaf = tree.children_left < 0
+            features.append(np.where(leaf, 0, tree.feature))
+            thresholds.append(np.where(leaf, np.inf, tree.threshold))
+            lefts.append(np.where(leaf, ids, tree.children_left + offset))
+            rights.append(np.where(leaf, ids, tree.children_right + offset))
+            missing.append(np.asarray(getattr(tree, 'missing_go_to_left', np.zeros(n)), dtype=bool) & ~leaf)
+            # class fractions, normalized like DecisionTreeClassifier.predict_proba:
+            # scikit-learn < 1.4 stores weighted class counts in tree.value
+            value = tree.value[:, 0, :model.n_classes_]
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+            roots.append(offset)
+            offset += n
+
+        feature = np.concatenate(features).astype(np.int32)
+        threshold = np.concatenate(thresholds)
+        internal = np.isfinite(threshold)
+        mean = scale = None
+        if scaler is not None:
+            f = feature[internal]
+            mean = scaler.mean_[f] if getattr(scaler, 'mean_', None) is not None and scaler.with_mean else None
+            scale = scaler.scale_[f] if getattr(scaler, 'scale_', None) is not None and scaler.with_std else None
+        threshold[internal] = fold_thresholds(threshold[internal], mean, scale)
+
+        return cls(feature=feature,
+                   threshold=threshold,
+                   left=np.concatenate(lefts).astype(np.int32),
+                   right=np.concatenate(rights).astype(np.int32),
+                   missing_left=np.concatenate(missing),
+                   value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+                   roots=np.array(roots, dtype=np.int32),
+                   max_depth=max(est.tree_.max_depth for est in model.estimators_),
+                   n_features=int(model.n_features_in_))
+
+    def apply(self, X):
+        # (n_trees, n_rows) leaf index reached by each row in each tree; X is raw (unscaled).
+        # Every (tree, row) pair steps down one level per iteration and drops out of
+        # the active set once it reaches a leaf, so work follows the actual path lengths.
+        X = np.asarray(X, dtype=np.float64)
+        n, n_features = X.shape
+        flat = X.ravel()
+        node = np.repeat(self.roots.astype(np.int64), n)
+        offset = np.tile(np.arange(n, dtype=np.int64) * n_features, self.n_trees)
+        check_missing = self.missing_left.any() and np.isnan(X).any()
+        active = np.arange(len(node))
+        while len(active):
+            current = node[active]
+            x = flat[offset[active] + self.feature[current]]
+            go_left = x <= self.threshold[current]
+            if check_missing:
+                go_left |= np.isnan(x) & self.missing_left[current]
+            nxt = np.where(go_left, self.left[current], self.right[current])
+            node[active] = nxt
+            active = active[~self.is_leaf[nxt]]
+        return node.reshape(self.n_trees, n)
+
+    def predict_proba(self, X, chunk_size=4096):
+        # (n_rows, n_classes) class probabilities for raw feature rows (1-D X = one row)
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        if X.shape[1] != self.n_features:
+            raise ValueError(f'expected {self.n_features} features, got {X.shape[1]}')
+        out = np.empty((len(X), self.value.shape[1]), dtype=np.float64)
+        for start in range(0, len(X), chunk_size):
+            leaves = self.apply(X[start:start + chunk_size])
+            # running sum in tree order, like sklearn's accumulation, then the same division
+            total = np.cumsum(self.value[leaves], axis=0)[-1]
+            out[start:start + chunk_size] = total / self.n_trees
+        return out
@@ -4,11 +4,16 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib import colors
 
-def create_sample_pdf_invoice():
-    """Create a sample PDF invoice for testing fraud detection"""
+def write_pdf_invoice(path, invoice):
+    """Write an invoice dict as a PDF.
+
+    invoice keys: invoice_no, date, due_date, vendor, contact, phone and
+    items - a list of (item, description, quantity, unit_price, total).
+    Returns the invoice total.
+    """
     
     # Create the PDF document
-    doc = SimpleDocTemplate("sample_invoice_pdf.pdf", pagesize=letter)
+    doc = SimpleDocTemplate(path, pagesize=letter)
     styles = getSampleStyleSheet()
     
     # Create custom styles
@@ -29,12 +34,12 @@ def create_sample_pdf_invoice():
     
     # Invoice details
     invoice_data = [
-        ["Invoice Number:", "INV-2024-004"],
-        ["Date:", "2024-08-10"],
-        ["Due Date:", "2024-09-10"],
-        ["Vendor:", "Omega Inc"],
-        ["Contact:", "billing@omegainc.com"],
-        ["Phone:", "+1-555-0999"]
+        ["Invoice Number:", invoice['invoice_no']],
+        ["Date:", invoice['date']],
+        ["Due Date:", invoice['due_date']],
+        ["Vendor:", invoice['vendor']],
+        ["Contact:", invoice['contact']],
+        ["Phone:", invoice['phone']]
     ]
     
     # Create a table for invoice details
@@ -50,12 +55,9 @@ def create_sample_pdf_invoice():
     story.append(Spacer(1, 20))
     
     # Items table
-    items_data = [
-        ["Item", "Description", "Quantity", "Unit Price", "Total"],
-        ["Software License", "Enterprise software package", "1", "$2,500.00", "$2,500.00"],
-        ["Training", "On-site training session", "2", "$750.00", "$1,500.00"],
-        ["Support", "Annual support contract", "1", "$1,000.00", "$1,000.00"]
-    ]
+    items_data = [["Item", "Description", "Quantity", "Unit Price", "Total"]]
+    for item, description, quantity, unit_price, line_total in invoice['items']:
+        items_data.append([item, description, str(quantity), f"${unit_price:,.2f}", f"${line_total:,.2f}"])
     
     items_table = Table(items_data, colWidths=[1.5*inch, 2.5*inch, 0.8*inch, 1.2*inch, 1*inch])
     items_table.setStyle(TableStyle([
@@ -72,7 +74,7 @@ def create_sample_pdf_invoice():
     story.append(Spacer(1, 20))
     
     # Total
-    total = 5000.00
+    total = sum(line[4] for line in invoice['items'])
     total_data = [["", "", "", "TOTAL:", f"${total:,.2f}"]]
     total_table = Table(total_data, colWidths=[1.5*inch, 2.5*inch, 0.8*inch, 1.2*inch, 1*inch])
     total_table.setStyle(TableStyle([
@@ -86,6 +88,24 @@ def create_sample_pdf_invoice():
     
     # Build the PDF
     doc.build(story)
+    return total
+
+def create_sample_pdf_invoice():
+    """Create a sample PDF invoice for testing fraud detection"""
+    invoice = {
+        'invoice_no': "INV-2024-004",
+        'date': "2024-08-10",
+        'due_date': "2024-09-10",
+        'vendor': "Omega Inc",
+        'contact': "billing@omegainc.com",
+        'phone': "+1-555-0999",
+        'items': [
+            ["Software License", "Enterprise software package", 1, 2500.00, 2500.00],
+            ["Training", "On-site training session", 2, 750.00, 1500.00],
+            ["Support", "Annual support contract", 1, 1000.00, 1000.00]
+        ],
+    }
+    total = write_pdf_invoice("sample_invoice_pdf.pdf", invoice)
     print(f"Created: sample_invoice_pdf.pdf (Amount: ${total:,.2f})")
 
 if __name__ == "__main__":
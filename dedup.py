@@ -0,0 +1,238 @@
+# dedup.py
+# Duplicate / near-duplicate invoice detection.
+#  - exact: same normalized vendor + invoice number seen before
+#  - near:  same vendor and amount (to the cent) within NEAR_DUP_WINDOW_DAYS
+import re
+import bisect
+import hashlib
+import datetime as dt
+import numpy as np
+import pandas as pd
+
+NEAR_DUP_WINDOW_DAYS = 30
+
+_VENDOR_JUNK = re.compile(r'[^a-z0-9]+')
+_INVOICE_JUNK = re.compile(r'[^A-Z0-9]+')
+_EPOCH = pd.Timestamp('1970-01-01')
+_EPOCH_ORDINAL = dt.date(1970, 1, 1).toordinal()
+NO_DAY = np.iinfo(np.int64).min
+_MASK = (1 << 64) - 1
+_MIX = 0x9E3779B97F4A7C15
+
+
+def normalize_vendor(vendor):
+    if vendor is None or vendor != vendor:  # None / NaN
+        return ''
+    return _VENDOR_JUNK.sub(' ', str(vendor).lower()).strip()
+
+
+def normalize_invoice_no(invoice_no):
+    # "INV-2024/001", "inv 2024 001" -> "INV2024001"
+    if invoice_no is None or invoice_no != invoice_no:
+        return ''
+    return _INVOICE_JUNK.sub('', str(invoice_no).upper())
+
+
+def _str_hash(s):
+    # stable 64-bit hash (unlike hash(), identical across processes and runs)
+    return int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), 'little')
+
+
+def _combine(h, x):
+    # mix a 64-bit hash with a second hash or integer; wraps modulo 2**64 like
+    # the uint64 array version in key_arrays
+    return (h * _MIX + x) & _MASK
+
+
+def _hash_column(values, normalize):
+    # (uint64 hashes, non-empty mask) of normalized values, normalizing and
+    # hashing each distinct value once
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+    normalized = [normalize(u) for u in uniques] + ['']
+    hashes = np.array([_str_hash(u) for u in normalized], dtype=np.uint64)
+    present = np.array([u != '' for u in normalized])
+    return hashes[codes], present[codes]
+
+
+def day_number(date):
+    # scalar fast paths for date objects and ISO date strings, else the vectorized parser
+    if isinstance(date, dt.date) and not pd.isna(date):
+        return date.toordinal() - _EPOCH_ORDINAL
+    if isinstance(date, str) and len(date) == 10:
+        try:
+            return dt.date.fromisoformat(date).toordinal() - _EPOCH_ORDINAL
+        except ValueError:
+            pass
+    return int(day_numbers([date])[0])
+
+
+def day_numbers(dates):
+    # days since 1970-01-01 as int64; NO_DAY marks a missing/unparseable date
+    ts = pd.to_datetime(pd.Series(dates), errors='coerce')
+    days = ((ts - _EPOCH) // pd.Timedelta(days=1)).to_numpy(dtype=np.float64)
+    return np.where(np.isnan(days), NO_DAY, days).astype(np.int64)
+
+
+def _cents(amounts):
+    return np.round(np.asarray(amounts, dtype=np.float64) * 100).astype(np.int64)
+
+
+def key_arrays(df):
+    # per-row exact/near keys: exact = vendor+invoice_no (valid where has_no),
+    # near = vendor+amount in cents (valid where dated)
+    vendor_h, _ = _hash_column(df['vendor'].to_numpy(), normalize_vendor)
+    inv_h, has_no = _hash_column(df['invoice_no'].to_numpy(), normalize_invoice_no)
+    day = day_numbers(df['date'].to_numpy())
+    amount = df['amount'].to_numpy(dtype=np.float64)
+    dated = (day != NO_DAY) & (amount >= 0)
+    cents = _cents(np.where(dated, amount, 0)).astype(np.uint64)
+    with np.errstate(over='ignore'):
+        mixed = vendor_h * np.uint64(_MIX)
+        return {
+            'vendor': vendor_h,
+            'exact': mixed + inv_h,
+            'has_no': has_no,
+            'near': mixed + cents,
+            'day': day,
+            'dated': dated,
+        }
+
+
+class DuplicateIndex:
+    """Answers "seen before?" for an invoice against the historical records.
+
+    Bulk-built history lives in sorted numpy arrays of 64-bit key hashes
+    (exact lookups and near-duplicate day ranges are searchsorted calls, so
+    O(log n)); invoices added afterwards go into small dict/sorted-list deltas
+    that compact() folds back into the arrays.
+    """
+
+    def __init__(self, window_days=NEAR_DUP_WINDOW_DAYS):
+        self.window_days = window_days
+        self._exact_keys = np.empty(0, dtype=np.uint64)
+        self._exact_counts = np.empty(0, dtype=np.int64)
+        self._near_keys = np.empty(0, dtype=np.uint64)
+        self._near_days = np.empty(0, dtype=np.int64)
+        self._exact_delta = {}
+        self._near_delta = {}
+
+    def __len__(self):
+        return int(self._exact_counts.sum()) + sum(self._exact_delta.values())
+
+    @classmethod
+    def from_dataframe(cls, df, window_days=NEAR_DUP_WINDOW_DAYS):
+        return cls.from_keys(key_arrays(df), window_days)
+
+    @classmethod
+    def from_keys(cls, keys, window_days=NEAR_DUP_WINDOW_DAYS):
+        # keys: the dict of per-row arrays key_arrays returns (possibly concatenated
+        # across chunks of a larger history)
+        index = cls(window_days)
+        index._exact_keys, index._exact_counts = np.unique(keys['exact'][keys['has_no']], return_counts=True)
+        near, days = keys['near'][keys['dated']], keys['day'][keys['dated']]
+        order = np.lexsort((days, near))
+        index._near_keys, index._near_days = near[order], days[order]
+        return index
+
+    def add(self, vendor, invoice_no, date, amount):
+        exact, near, day = self._record_keys(vendor, invoice_no, date, amount)
+        if exact is not None:
+            self._exact_delta[exact] = self._exact_delta.get(exact, 0) + 1
+        if near is not None:
+            bisect.insort(self._near_delta.setdefault(near, []), day)
+
+    def query(self, vendor, invoice_no, date, amount):
+        # (number of records with the same vendor + invoice number,
+        #  number with the same vendor + amount within window_days of date)
+        exact, near, day = self._record_keys(vendor, invoice_no, date, amount)
+        exact_count = 0
+        if exact is not None:
+            key = np.uint64(exact)  # a plain int > 2**63 would be compared as float
+            i = np.searchsorted(self._exact_keys, key)
+            if i < len(self._exact_keys) and self._exact_keys[i] == key:
+                exact_count = int(self._exact_counts[i])
+            exact_count += self._exact_delta.get(exact, 0)
+        near_count = 0
+        if near is not None:
+            key = np.uint64(near)
+            lo = np.searchsorted(self._near_keys, key, side='left')
+            hi = np.searchsorted(self._near_keys, key, side='right')
+            days = self._near_days[lo:hi]
+            near_count = int(np.searchsorted(days, day + self.window_days, side='right')
+                             - np.searchsorted(days, day - self.window_days, side='left'))
+            extra = self._near_delta.get(near)
+            if extra:
+                near_count += (bisect.bisect_right(extra, day + self.window_days)
+                               - bisect.bisect_left(extra, day - self.window_days))
+        return exact_count, near_count
+
+    def query_many(self, records):
+        # records: parsed invoice dicts; returns an (n, 2) int array of query() results
+        return np.array([self.query(r.get('vendor'), r.get('invoice_no'), r.get('date'), r.get('amount'))
+                         for r in records], dtype=np.int64).reshape(-1, 2)
+
+    def compact(self):
+        # fold the online deltas into the sorted arrays
+        if self._exact_delta:
+            keys = np.concatenate([self._exact_keys, np.fromiter(self._exact_delta, dtype=np.uint64)])
+            counts = np.concatenate([self._exact_counts, np.fromiter(self._exact_delta.values(), dtype=np.int64)])
+            self._exact_keys, inverse = np.unique(keys, return_inverse=True)
+            self._exact_counts = np.bincount(inverse, weights=counts).astype(np.int64)
+            self._exact_delta = {}
+        if self._near_delta:
+            near = np.concatenate([self._near_keys] + [np.full(len(d), k, dtype=np.uint64)
+                                                       for k, d in self._near_delta.items()])
+            days = np.concatenate([self._near_days] + [np.asarray(d, dtype=np.int64)
+                                                       for d in self._near_delta.values()])
+            order = np.lexsort((days, near))
+            self._near_keys, self._near_days = near[order], days[order]
+            self._near_delta = {}
+
+    def _record_keys(self, vendor, invoice_no, date, amount):
+        # scalar counterpart of key_arrays
+        vendor_h = _str_hash(normalize_vendor(vendor))
+        inv_n = normalize_invoice_no(invoice_no)
+        exact = _combine(vendor_h, _str_hash(inv_n)) if inv_n else None
+        near = day = None
+        if date is not None and amount is not None and amount == amount and amount >= 0:
+            day = day_number(date)
+            if day != NO_DAY:
+                near = _combine(vendor_h, round(float(amount) * 100))
+        return exact, near, day
+
+
+def historical_duplicate_features(df, window_days=NEAR_DUP_WINDOW_DAYS):
+    """Training-time duplicate features: for each row, counts over *earlier* rows only.
+
+    Rows are ordered by date (ties keep file order). Returns an (n, 2) array of
+    [same vendor + invoice number seen before, same vendor + amount within
+    window_days before], matching what DuplicateIndex.query would have returned
+    had the rows been scored and added one at a time.
+    """
+    return duplicate_features_from_keys(key_arrays(df), window_days)
+
+
+def duplicate_features_from_keys(keys, window_days=NEAR_DUP_WINDOW_DAYS):
+    # historical_duplicate_features on precomputed key_arrays output
+    n = len(keys['day'])
+    out = np.zeros((n, 2), dtype=np.int64)
+    day = keys['day']
+    order = np.argsort(np.where(day != NO_DAY, day, np.iinfo(np.int64).max), kind='stable')
+
+    sorted_exact = keys['exact'][order]
+    prior = pd.Series(sorted_exact).groupby(sorted_exact).cumcount().to_numpy()
+    out[order, 0] = np.where(keys['has_no'][order], prior, 0)
+
+    dated = keys['dated']
+    if dated.any():
+        rows = np.flatnonzero(dated)
+        codes, _ = pd.factorize(keys['near'][dated])
+        d = day[dated] - day[dated].min()
+        # sort by (key, day, original position); composite key+day for the window search
+        srt = np.lexsort((rows, d, codes))
+        span = int(d.max()) + window_days + 2
+        composite = codes[srt].astype(np.int64) * span + d[srt]
+        pos = np.arange(len(srt))
+        first = np.searchsorted(composite, composite - window_days, side='left')
+        out[rows[srt], 1] = pos - first
+    return out
@@ -4,34 +4,64 @@ import pandas as pd
 from collections import Counter
 from datetime import datetime
 
-FEATURE_COLS = ['amount', 'is_round_amount', 'amount_num_digits', 'vendor_freq', 'amount_zscore']
+import metrics
+from dedup import historical_duplicate_features
+from velocity import VELOCITY_COLS, NO_PREV, historical_velocity_features
 
+FEATURE_COLS = ['amount', 'is_round_amount', 'amount_num_digits', 'vendor_freq', 'amount_zscore',
+                'dup_invoice_count', 'near_dup_count'] + VELOCITY_COLS
 
-def extract_invoice_features(parsed_invoice, stats):
+# powers of ten used to count integer digits without string conversion
+_POW10 = 10 ** np.arange(1, 19, dtype=np.int64)
+
+
+def vendor_profile(stats, vendor):
+    # (count, mean, std) of a vendor's amounts; global mean/std for unseen vendors.
+    # stats is the stats.json dict or a vendor_stats.VendorStatsStore
+    if hasattr(stats, 'lookup'):
+        return stats.lookup(vendor)
+    return (stats['vendor_counts'].get(vendor, 0),
+            stats['vendor_amount_mean'].get(vendor, stats['global_mean']),
+            stats['vendor_amount_std'].get(vendor, stats['global_std']))
+
+
+def extract_invoice_features(parsed_invoice, stats, dedup_index=None, velocity=None, resolver=None):
     # parsed_invoice is a dict with keys: invoice_no, vendor, date (str YYYY-MM-DD), amount (float)
+    # dedup_index: optional dedup.DuplicateIndex of past invoices (duplicate counts are 0 without it)
+    # velocity: optional velocity.VelocityTracker (counts 0, no previous invoice without it)
+    # resolver: optional vendor_resolver.VendorResolver mapping the parsed vendor to a known one
     amt = float(parsed_invoice.get('amount', 0.0))
     vendor = parsed_invoice.get('vendor', 'UNKNOWN')
+    if resolver is not None:
+        vendor = resolver.resolve(vendor) or vendor
     date_str = parsed_invoice.get('date', None)
 
     is_round = 1 if (amt % 100 == 0) else 0
     num_digits = len(str(int(max(1,amt))))
 
-    vendor_freq = stats['vendor_counts'].get(vendor, 0)
     # amount zscore relative to vendor; fallback to global stats
-    vendor_mean = stats['vendor_amount_mean'].get(vendor, stats['global_mean'])
-    vendor_std = stats['vendor_amount_std'].get(vendor, stats['global_std'])
+    vendor_freq, vendor_mean, vendor_std = vendor_profile(stats, vendor)
+    if vendor_freq == 0:
+        metrics.incr('unknown_vendors')
     if vendor_std <= 0:
         amt_z = 0.0
     else:
         amt_z = (amt - vendor_mean)/vendor_std
 
-    feat = [amt, is_round, num_digits, vendor_freq, amt_z]
+    dup_count, near_dup_count = 0, 0
+    if dedup_index is not None:
+        dup_count, near_dup_count = dedup_index.query(vendor, parsed_invoice.get('invoice_no'), date_str, amt)
+
+    recent = [0, 0, 0.0, NO_PREV]
+    if velocity is not None:
+        recent = velocity.query(vendor, date_str)
+
+    feat = [amt, is_round, num_digits, vendor_freq, amt_z, dup_count, near_dup_count] + recent
     return feat
 
 
-def build_features_from_dataframe(df):
-    # df: must contain invoice_no, vendor, date, amount, label(optional)
-    # compute vendor stats
+def compute_vendor_stats(df):
+    # vendor/global amount statistics, in the format stored as stats.json
     vendor_groups = df.groupby('vendor')['amount']
     vendor_counts = df['vendor'].value_counts().to_dict()
     vendor_mean = vendor_groups.mean().to_dict()
@@ -39,22 +69,80 @@ def build_features_from_dataframe(df):
     global_mean = df['amount'].mean()
     global_std = df['amount'].std(ddof=0)
 
-    stats = {
-        'vendor_counts': vendor_counts,
+    return {
+        'vendor_counts': {k: int(v) for k,v in vendor_counts.items()},
         'vendor_amount_mean': {k: float(v) for k,v in vendor_mean.items()},
         'vendor_amount_std': {k: float(v) for k,v in vendor_std.items()},
         'global_mean': float(global_mean),
         'global_std': float(global_std)
     }
 
-    X = []
-    y = []
-    for _, row in df.iterrows():
-        parsed = {'invoice_no': row['invoice_no'], 'vendor': row['vendor'], 'date': row['date'], 'amount': row['amount']}
-        feats = extract_invoice_features(parsed, stats)
-        X.append(feats)
-        if 'label' in row:
-            y.append(int(row['label']))
-    X = np.array(X)
-    y = np.array(y) if len(y)>0 else None
-    return X, y, stats
\ No newline at end of file
+
+@metrics.timed('features.build_matrix')
+def build_feature_matrix(df, stats, dtype=np.float32, duplicates=None, velocity=None):
+    # columnar equivalent of extract_invoice_features over every row of df;
+    # duplicates is an (n, 2) array of duplicate counts (zeros when None),
+    # velocity an (n, 4) array of velocity features (no history when None)
+    amt = df['amount'].to_numpy(dtype=np.float64)
+
+    is_round = (np.mod(amt, 100) == 0)
+    ints = np.fmax(1, amt).astype(np.int64)
+    num_digits = np.searchsorted(_POW10, ints, side='right') + 1
+
+    # look each distinct vendor up once, then broadcast back to rows; code -1
+    # (missing vendor) picks the trailing "unknown" slot
+    codes, uniques = pd.factorize(df['vendor'])
+    profiles = np.array([vendor_profile(stats, v) for v in uniques] + [vendor_profile(stats, None)],
+                        dtype=np.float64).reshape(-1, 3)[codes]
+    vendor_freq, vendor_mean, vendor_std = profiles[:, 0], profiles[:, 1], profiles[:, 2]
+    if metrics.enabled():
+        metrics.incr('unknown_vendors', int((vendor_freq == 0).sum()))
+    safe_std = np.where(vendor_std > 0, vendor_std, 1.0)
+    amt_z = np.where(vendor_std > 0, (amt - vendor_mean) / safe_std, 0.0)
+
+    X = np.empty((len(df), len(FEATURE_COLS)), dtype=dtype)
+    X[:, 0] = amt
+    X[:, 1] = is_round
+    X[:, 2] = num_digits
+    X[:, 3] = vendor_freq
+    X[:, 4] = amt_z
+    X[:, 5:7] = 0 if duplicates is None else duplicates
+    if velocity is None:
+        X[:, 7:] = 0
+        X[:, -1] = NO_PREV
+    else:
+        X[:, 7:] = velocity
+    return X
+
+
+def build_features_from_dataframe(df, dtype=np.float32):
+    # df: must contain invoice_no, vendor, date, amount, label(optional)
+    stats = compute_vendor_stats(df)
+    # duplicate and velocity features look only at earlier invoices, as they would at scoring time
+    X = build_feature_matrix(df, stats, dtype=dtype, duplicates=historical_duplicate_features(df),
+                             velocity=historical_velocity_features(df))
+    y = df['label'].to_numpy(dtype=np.int64) if 'label' in df.columns else None
+    return X, y, stats
+
+
+def build_features_from_records(records, stats, dtype=np.float32, dedup_index=None, velocity=None, resolver=None):
+    # batch equivalent of extract_invoice_features for a list of parsed invoice dicts;
+    # a missing amount is treated as 0.0 and a missing vendor as unknown
+    vendors = [r.get('vendor') for r in records]
+    if resolver is not None:
+        with metrics.span('features.vendor_resolve'):
+            vendors = resolver.resolve_many(vendors, keep_unresolved=True)
+        records = [dict(r, vendor=v) for r, v in zip(records, vendors)]
+    df = pd.DataFrame({
+        'vendor': vendors,
+        'amount': pd.to_numeric(pd.Series([r.get('amount') for r in records], dtype=object)).fillna(0.0),
+    })
+    duplicates = None
+    if dedup_index is not None:
+        with metrics.span('features.dedup_query'):
+            duplicates = dedup_index.query_many([dict(r, amount=a) for r, a in zip(records, df['amount'])])
+    recent = None
+    if velocity is not None:
+        with metrics.span('features.velocity_query'):
+            recent = velocity.query_many(records)
+    return build_feature_matrix(df, stats, dtype=dtype, duplicates=duplicates, velocity=recent)
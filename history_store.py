@@ -0,0 +1,170 @@
+# history_store.py
+# Columnar invoice history: Parquet files partitioned by invoice month
+# (month=YYYY-MM/), with typed columns - vendor dictionary-encoded, date as
+# date32, label int8 - so loads skip CSV parsing and date-ranged reads only
+# open the months they need.
+# pyarrow is imported by the functions that read or write a store, so CSV
+# training (which only calls is_store) does not need it installed.
+# Usage: python history_store.py convert data/synthetic_invoices.csv data/history
+#        python history_store.py info data/history
+import os
+import shutil
+import argparse
+import datetime as dt
+
+DEFAULT_STORE = 'data/history'
+COLUMNS = ['invoice_no', 'vendor', 'date', 'amount', 'label']
+# older exports name the label column differently
+LABEL_ALIASES = ('is_fraud',)
+
+
+def schema():
+    import pyarrow as pa
+    return pa.schema([
+        ('invoice_no', pa.string()),
+        ('vendor', pa.dictionary(pa.int32(), pa.string())),
+        ('date', pa.date32()),
+        ('amount', pa.float64()),
+        ('label', pa.int8()),
+    ])
+
+
+def _partitioning():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    return ds.partitioning(pa.schema([('month', pa.string())]), flavor='hive')
+
+
+def _csv_batches(csv_path, block_size):
+    # typed record batches of the CSV, with a month column for partitioning
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pcsv
+    store_schema = schema()
+    with open(csv_path) as f:
+        header = f.readline().strip().split(',')
+    names = {alias: 'label' for alias in LABEL_ALIASES if alias in header and 'label' not in header}
+    types = {col: store_schema.field(names.get(col, col)).type for col in header if names.get(col, col) in store_schema.names}
+    reader = pcsv.open_csv(csv_path,
+                           read_options=pcsv.ReadOptions(block_size=block_size),
+                           convert_options=pcsv.ConvertOptions(column_types=types, include_columns=list(types)))
+    out_schema = store_schema.append(pa.field('month', pa.string()))
+    for batch in reader:
+        columns = {names.get(col, col): batch.column(col) for col in batch.schema.names}
+        arrays = [columns[f.name] if f.name in columns else pa.nulls(batch.num_rows, f.type) for f in store_schema]
+        arrays.append(pc.strftime(columns['date'], format='%Y-%m'))
+        yield pa.RecordBatch.from_arrays(arrays, schema=out_schema)
+
+
+def convert_csv(csv_path, store_path=DEFAULT_STORE, block_size=16 << 20):
+    """Convert an invoice CSV into a month-partitioned Parquet store.
+
+    The CSV is read in blocks of block_size bytes and streamed into the
+    dataset writer, so memory does not grow with the file. The store is
+    written next to store_path and swapped in when complete. Returns the
+    number of rows written.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    tmp = f'{store_path}.tmp-{os.getpid()}'
+    rows = [0]
+
+    def counted():
+        for batch in _csv_batches(csv_path, block_size):
+            rows[0] += batch.num_rows
+            yield batch
+
+    ds.write_dataset(counted(), tmp, schema=schema().append(pa.field('month', pa.string())),
+                     format='parquet', partitioning=_partitioning(), preserve_order=True,
+                     existing_data_behavior='error', basename_template='part-{i}.parquet')
+    if os.path.exists(store_path):
+        shutil.rmtree(store_path)
+    os.replace(tmp, store_path)
+    return rows[0]
+
+
+def is_store(path):
+    return os.path.isdir(path)
+
+
+def _filter(start=None, end=None):
+    # date-range predicate; the month bound prunes whole partitions, the date
+    # bound is pushed down to Parquet row-group statistics
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    expr = None
+    if start is not None:
+        start = dt.date.fromisoformat(str(start)[:10])
+        cond = (ds.field('month') >= start.strftime('%Y-%m')) & (ds.field('date') >= pa.scalar(start, pa.date32()))
+        expr = cond
+    if end is not None:
+        end = dt.date.fromisoformat(str(end)[:10])
+        cond = (ds.field('month') <= end.strftime('%Y-%m')) & (ds.field('date') <= pa.scalar(end, pa.date32()))
+        expr = cond if expr is None else expr & cond
+    return expr
+
+
+def open_store(store_path=DEFAULT_STORE):
+    import pyarrow.dataset as ds
+    return ds.dataset(store_path, format='parquet', partitioning=_partitioning())
+
+
+def _to_pandas(table):
+    df = table.to_pandas(date_as_object=False)
+    if 'vendor' in df.columns:
+        # a date-ranged read keeps the whole dictionary; vendors with no rows in range
+        # would otherwise show up as zero-count categories
+        df['vendor'] = df['vendor'].cat.remove_unused_categories()
+    return df
+
+
+def load_history(store_path=DEFAULT_STORE, start=None, end=None, columns=None):
+    """Invoices dated in [start, end] (inclusive, either bound optional) as a DataFrame.
+
+    Columns come back typed: vendor as a pandas Categorical, date as
+    datetime64, amount float64, label int8.
+    """
+    table = open_store(store_path).to_table(columns=columns or COLUMNS, filter=_filter(start, end))
+    return _to_pandas(table)
+
+
+def iter_history_batches(store_path=DEFAULT_STORE, batch_rows=1_000_000, start=None, end=None, columns=None):
+    # DataFrame batches of load_history, for chunked training
+    scanner = open_store(store_path).scanner(columns=columns or COLUMNS, filter=_filter(start, end),
+                                             batch_size=batch_rows)
+    for batch in scanner.to_batches():
+        if batch.num_rows:
+            yield _to_pandas(batch)
+
+
+def info(store_path=DEFAULT_STORE):
+    import pyarrow.dataset as ds
+    dataset = open_store(store_path)
+    months = {}
+    for fragment in dataset.get_fragments():
+        month = ds.get_partition_keys(fragment.partition_expression).get('month')
+        months[month] = months.get(month, 0) + fragment.count_rows()
+    size = sum(os.path.getsize(p) for p in dataset.files)
+    return {'rows': sum(months.values()), 'months': len(months), 'files': len(dataset.files),
+            'bytes': size, 'first_month': min(months, default=None), 'last_month': max(months, default=None)}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Month-partitioned Parquet invoice history')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    c = sub.add_parser('convert', help='convert an invoice CSV into a store')
+    c.add_argument('csv')
+    c.add_argument('store', nargs='?', default=DEFAULT_STORE)
+    i = sub.add_parser('info', help='row/month/file counts of a store')
+    i.add_argument('store', nargs='?', default=DEFAULT_STORE)
+    args = ap.parse_args(argv)
+
+    if args.cmd == 'convert':
+        n = convert_csv(args.csv, args.store)
+        print(f'Converted {n:,} rows -> {args.store}')
+    else:
+        print(info(args.store))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,84 +1,454 @@
 # invoice_parser.py
-import pdfplumber
-import pandas as pd
+# pdfplumber and openpyxl are imported by the parser that needs them, so
+# scoring pre-parsed invoices (or only one file type) never loads the other.
+import io
+import os
 import re
-from datetime import datetime
+import signal
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, date
+
+import metrics
 
 DATE_PATTERNS = [r"\b(\d{4}-\d{2}-\d{2})\b", r"\b(\d{2}/\d{2}/\d{4})\b", r"\b(\d{1,2}[- ]\w{3,9}[- ]\d{4})\b"]
 AMOUNT_PATTERN = r"(Total|Amount|Grand Total)[:\s]*₹?\s*([0-9,]+\.?[0-9]*)"
 INVOICE_PATTERN = r"(Invoice|Inv\.? No\.?|Invoice No\.)[:\s]*([A-Za-z0-9\-_/]+)"
+SUPPORTED_EXTENSIONS = ('.pdf', '.xlsx', '.xls')
+REQUIRED_FIELDS = frozenset(['vendor', 'invoice_no', 'date', 'amount'])
+MAX_PDF_PAGES = 50
+# in the error of a parse that hit its timeout
+PARSE_TIMEOUT_ERROR = 'parse timed out'
+# bump whenever extraction logic changes so cached parse results are invalidated
+PARSER_VERSION = '3'
+
+# Excel label cells (normalized by _cell_label) -> field. Amount labels are
+# listed most specific first; the best-ranked one found in the workbook wins.
+EXCEL_LABELS = {
+    'invoice number': 'invoice_no', 'invoice no': 'invoice_no', 'invoice no.': 'invoice_no',
+    'inv no': 'invoice_no', 'inv. no.': 'invoice_no', 'invoice id': 'invoice_no',
+    'vendor': 'vendor', 'vendor name': 'vendor', 'supplier': 'vendor', 'supplier name': 'vendor',
+    'billed by': 'vendor', 'seller': 'vendor',
+    'date': 'date', 'invoice date': 'date', 'bill date': 'date', 'issue date': 'date',
+}
+EXCEL_AMOUNT_LABELS = ['grand total', 'total amount', 'amount due', 'total due', 'invoice total',
+                       'balance due', 'total', 'amount']
+
+# Precompiled extractors. Every invoice/amount/date match contains a literal
+# anchor ("inv", "total"/"amount", "-", "/") at a fixed offset from its start,
+# so instead of trying the pattern at every position we jump between anchor
+# occurrences with str.find and only run the regex there. _DATE_ANCHORS is
+# None for the free-form date format, which falls back to a plain search.
+_INVOICE_RE = re.compile(INVOICE_PATTERN, flags=re.IGNORECASE)
+_AMOUNT_RE = re.compile(AMOUNT_PATTERN, flags=re.IGNORECASE)
+_DATE_RES = [re.compile(pat) for pat in DATE_PATTERNS]
+_INVOICE_ANCHORS = [('inv', 0)]
+_AMOUNT_ANCHORS = [('total', 0), ('amount', 0), ('grand total', 0)]
+_DATE_ANCHORS = [[('-', 4)], [('/', 2)], None]
+_NUMBER_RE = re.compile(r"\b[0-9,]+\.?[0-9]*\b")
+_FIRST_CHAR_RE = re.compile(r"\S")
+_LINE_BREAK_RE = re.compile('[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
+
+
+def _page_order(n_pages, max_pages=None):
+    # first page, then last page (where totals usually are), then the rest in order
+    order = [0, n_pages - 1] + list(range(1, n_pages - 1)) if n_pages > 1 else list(range(n_pages))
+    return order[:max_pages] if max_pages else order
+
+
+def _open_source(source):
+    # parsers accept a path, raw bytes (bytes/bytearray/memoryview) or a binary file-like object
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    return source
+
+
+def source_kind(source, name=None):
+    # 'pdf' or 'excel': by file extension when there is a name/path, else by the %PDF header
+    if name is None and isinstance(source, (str, os.PathLike)):
+        name = source
+    if name is not None:
+        return 'pdf' if str(name).lower().endswith('.pdf') else 'excel'
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        head = bytes(source[:1024])
+    else:
+        pos = source.tell()
+        head = source.read(1024)
+        source.seek(pos)
+    return 'pdf' if b'%PDF' in head else 'excel'
+
 
+def iter_pdf_pages(path, max_pages=MAX_PDF_PAGES):
+    # lazily yield (page_index, text) in _page_order; pages past max_pages are never decoded.
+    # `path` may also be bytes or a file-like object
+    import pdfplumber
+    with pdfplumber.open(_open_source(path)) as pdf:
+        pages = pdf.pages
+        for i in _page_order(len(pages), max_pages):
+            page = pages[i]
+            with metrics.span('parse.pdf_page'):
+                text = page.extract_text() or ''
+            metrics.incr('pdf_pages_decoded')
+            close = getattr(page, 'close', None)  # frees the page's layout cache on pdfplumber >= 0.10
+            if close:
+                close()
+            yield i, text
 
-def parse_pdf(path):
-    text = ''
+
+@metrics.timed('parse.pdf')
+def parse_pdf(path, max_pages=MAX_PDF_PAGES, early_stop=True):
+    # Pages are decoded one at a time; with early_stop, decoding stops as soon as
+    # every required field has been seen. Text is reassembled in page order.
+    pages = {}
+    found = set()
     try:
-        with pdfplumber.open(path) as pdf:
-            for page in pdf.pages:
-                text += '\n' + page.extract_text() or ''
+        for i, page_text in iter_pdf_pages(path, max_pages):
+            pages[i] = page_text
+            if early_stop:
+                found |= _fields_found(page_text)
+                if found >= REQUIRED_FIELDS:
+                    break
     except Exception as e:
+        metrics.incr('parse_failures', kind='pdf')
         return {'error': f'pdf parse error: {e}'}
 
+    text = ''.join('\n' + pages[i] for i in sorted(pages))
     return _parse_text_fields(text)
 
 
+def _cell_label(value):
+    # normalized label text of a cell ("Invoice Number:" -> "invoice number")
+    return value.strip().rstrip(':#').strip().lower()
+
+
+def _cell_amount(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    m = _NUMBER_RE.search(str(value))
+    if m:
+        try:
+            return float(m.group(0).replace(',', ''))
+        except ValueError:
+            return None
+    return None
+
+
+def _cell_date(value):
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y-%m-%d')
+    return _scan_fields(str(value))[2]
+
+
+def _cell_text(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+_EXCEL_CONVERTERS = {
+    'invoice_no': _cell_text,
+    'vendor': lambda v: _cell_text(v)[:60],
+    'date': _cell_date,
+    'amount': _cell_amount,
+}
+
+
+def _iter_labelled_cells(row):
+    # (label, value) pairs in a row: a text cell followed by the next non-empty
+    # cell to its right, or a single "Label: value" cell
+    cells = [v for v in row if v is not None and not (isinstance(v, str) and not v.strip())]
+    for i, v in enumerate(cells):
+        if not isinstance(v, str):
+            continue
+        if ':' in v and v.split(':', 1)[1].strip():
+            label, inline = v.split(':', 1)
+            yield _cell_label(label), inline.strip()
+        elif i + 1 < len(cells):
+            yield _cell_label(v), cells[i + 1]
+
+
+@metrics.timed('parse.excel')
 def parse_excel(path):
+    """Extract invoice fields from a workbook by reading labelled cells.
+
+    Streams every sheet with openpyxl in read-only, values-only mode and looks
+    for label cells (EXCEL_LABELS) with their value in the next non-empty cell to
+    the right. Fields without a labelled cell fall back to the regex extractor
+    over the workbook text, one line per row.
+    """
+    res = {'vendor': None, 'invoice_no': None, 'date': None, 'amount': None}
+    amount_rank = len(EXCEL_AMOUNT_LABELS)
+    lines = []
     try:
-        df = pd.read_excel(path, engine='openpyxl')
+        import openpyxl
+        wb = openpyxl.load_workbook(_open_source(path), read_only=True, data_only=True)
+        try:
+            for ws in wb.worksheets:
+                for row in ws.iter_rows(values_only=True):
+                    lines.append(' '.join(_cell_text(v) for v in row if v is not None))
+                    for label, value in _iter_labelled_cells(row):
+                        if label in EXCEL_AMOUNT_LABELS:
+                            rank = EXCEL_AMOUNT_LABELS.index(label)
+                            if rank < amount_rank:
+                                amount = _cell_amount(value)
+                                if amount is not None:
+                                    res['amount'], amount_rank = amount, rank
+                            continue
+                        field = EXCEL_LABELS.get(label)
+                        if field and res[field] is None:
+                            res[field] = _EXCEL_CONVERTERS[field](value) or None
+        finally:
+            wb.close()
     except Exception as e:
+        metrics.incr('parse_failures', kind='excel')
         return {'error': f'excel parse error: {e}'}
-    text = ' '.join(df.astype(str).fillna('').agg(' '.join, axis=1).tolist())
-    return _parse_text_fields(text)
 
+    if any(v is None for v in res.values()):
+        metrics.incr('excel_text_fallbacks')
+        fallback = _parse_text_fields('\n'.join(lines))
+        for field, value in res.items():
+            if value is None:
+                res[field] = fallback[field]
+    return res
 
-def _parse_text_fields(text):
-    res = {'vendor': None, 'invoice_no': None, 'date': None, 'amount': None}
-    # Basic vendor heuristic: first non-empty line
-    lines = [l.strip() for l in text.splitlines() if l.strip()]
-    if lines:
-        res['vendor'] = lines[0][:60]
 
-    # invoice
-    m = re.search(INVOICE_PATTERN, text, flags=re.IGNORECASE)
-    if m:
-        res['invoice_no'] = m.group(2)
+def parse_file(source, name=None):
+    # source: path, bytes or file-like; name (e.g. the uploaded file name) picks
+    # the parser by extension, otherwise see source_kind
+    if source_kind(source, name) == 'pdf':
+        return parse_pdf(source)
+    return parse_excel(source)
 
-    # date
-    for pat in DATE_PATTERNS:
-        m = re.search(pat, text)
-        if m:
-            date_str = m.group(1)
+
+def _parse_isolated(path, timeout=None, name=None):
+    # worker entry point: never raises, so one bad file cannot take down a batch.
+    # path may be anything parse_file takes (name then picks the parser).
+    # The timeout uses SIGALRM, which only the main thread can install (POSIX
+    # only); elsewhere - e.g. in-process parsing from a server thread - files
+    # are parsed without a time limit.
+    use_alarm = (bool(timeout) and hasattr(signal, 'SIGALRM')
+                 and threading.current_thread() is threading.main_thread())
+    armed = False
+
+    def _on_alarm(signum, frame):
+        raise TimeoutError(f'{PARSE_TIMEOUT_ERROR} after {timeout}s')
+
+    try:
+        if use_alarm:
+            previous = signal.signal(signal.SIGALRM, _on_alarm)
+            armed = True
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        return parse_file(path, name)
+    except TimeoutError as e:
+        metrics.incr('parse_failures', kind='timeout')
+        return {'error': f'parse error: {e}'}
+    except Exception as e:
+        metrics.incr('parse_failures', kind='exception')
+        return {'error': f'parse error: {e}'}
+    finally:
+        if armed:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+
+def _parse_in_worker(path, timeout=None):
+    # pool entry point: the result plus the metrics the worker recorded for it
+    return _parse_isolated(path, timeout), metrics.drain()
+
+
+def _future_result(fut):
+    try:
+        res, worker_metrics = fut.result()
+    except Exception as e:
+        # e.g. BrokenProcessPool when a worker dies on a pathological file
+        metrics.incr('parse_failures', kind='worker')
+        return {'error': f'parse worker failed: {e!r}'}
+    metrics.merge(worker_metrics)
+    return res
+
+
+def _parse_alone(path, timeout=None):
+    # a file whose pool broke under it, parsed again in a pool of its own: if it
+    # is the file that kills its worker, only its own result is lost
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        return _future_result(pool.submit(_parse_in_worker, path, timeout))
+
+
+def parse_many(paths, workers=None, timeout=None, ordered=True, max_pending=None):
+    """Parse invoice files across a process pool, yielding (path, result) pairs.
+
+    workers defaults to os.cpu_count(); workers=1 parses in-process. With
+    ordered=False results are yielded as soon as they complete. At most
+    max_pending files (default 4 per worker) are in flight, so `paths` may be a
+    lazy iterator over a very large batch. Failures and timeouts come back as
+    {'error': ...} results instead of raising. When a worker dies (which breaks
+    the whole pool), later files go to a new pool and every file that was in
+    flight is parsed again on its own, so only the file that killed its
+    worker ends up with an error.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for path in paths:
+            yield path, _parse_isolated(path, timeout)
+        return
+
+    max_pending = max_pending or workers * 4
+    path_iter = iter(paths)
+    pool = ProcessPoolExecutor(max_workers=workers)
+    pending = deque()
+
+    def submit(path):
+        nonlocal pool
+        try:
+            return pool.submit(_parse_in_worker, path, timeout)
+        except BrokenProcessPool:
+            pool.shutdown(wait=False)
+            pool = ProcessPoolExecutor(max_workers=workers)
+            metrics.incr('parse_pool_restarts')
+            return pool.submit(_parse_in_worker, path, timeout)
+
+    def fill():
+        while len(pending) < max_pending:
             try:
-                # try ISO first
-                if '-' in date_str:
-                    parsed = datetime.strptime(date_str, '%Y-%m-%d')
-                elif '/' in date_str:
-                    parsed = datetime.strptime(date_str, '%d/%m/%Y')
-                else:
-                    parsed = datetime.strptime(date_str, '%d %B %Y')
-                res['date'] = parsed.strftime('%Y-%m-%d')
+                path = next(path_iter)
+            except StopIteration:
+                return
+            pending.append((path, submit(path)))
+
+    def result(path, fut):
+        if isinstance(fut.exception(), BrokenProcessPool):
+            metrics.incr('parse_retries')
+            return _parse_alone(path, timeout)
+        return _future_result(fut)
+
+    try:
+        fill()
+        while pending:
+            if ordered:
+                path, fut = pending.popleft()
+                yield path, result(path, fut)
+            else:
+                done, _ = wait([f for _, f in pending], return_when=FIRST_COMPLETED)
+                finished = [item for item in pending if item[1] in done]
+                for item in finished:
+                    pending.remove(item)
+                for path, fut in finished:
+                    yield path, result(path, fut)
+            fill()
+    finally:
+        pool.shutdown()
+
+
+def _normalize_date(date_str):
+    # returns YYYY-MM-DD, or None when the string does not parse
+    try:
+        # try ISO first
+        if '-' in date_str:
+            parsed = datetime.strptime(date_str, '%Y-%m-%d')
+        elif '/' in date_str:
+            parsed = datetime.strptime(date_str, '%d/%m/%Y')
+        else:
+            parsed = datetime.strptime(date_str, '%d %B %Y')
+    except ValueError:
+        return None
+    return parsed.strftime('%Y-%m-%d')
+
+
+def _anchored_search(regex, text, folded, anchors):
+    # same result as regex.search(text); `folded` is the text the anchors are
+    # looked up in (a lower-cased copy for case-insensitive patterns), or None
+    # to fall back to a plain search
+    if anchors is None or folded is None:
+        return regex.search(text)
+    best = None
+    for anchor, offset in anchors:
+        i = folded.find(anchor, offset)
+        while i != -1:
+            m = regex.match(text, i - offset)
+            if m:
+                if best is None or m.start() < best.start():
+                    best = m
+                break
+            i = folded.find(anchor, i + 1)
+    return best
+
+
+def _scan_fields(text):
+    # (invoice_no, raw amount string, normalized date) - the values the
+    # original independent re.search calls produce
+    # lower() keeps positions aligned only for ASCII text
+    folded = text.lower() if text.isascii() else None
+    m = _anchored_search(_INVOICE_RE, text, folded, _INVOICE_ANCHORS)
+    invoice_no = m.group(2) if m else None
+    m = _anchored_search(_AMOUNT_RE, text, folded, _AMOUNT_ANCHORS)
+    amount = m.group(2) if m else None
+
+    # formats in DATE_PATTERNS priority order; later formats are only searched
+    # when the first match of every earlier one is missing or does not parse
+    date = None
+    for regex, anchors in zip(_DATE_RES, _DATE_ANCHORS):
+        m = _anchored_search(regex, text, text, anchors)
+        if m:
+            date = _normalize_date(m.group(1))
+            if date:
                 break
-            except Exception:
-                continue
+    return invoice_no, amount, date
+
+
+def _fields_found(text):
+    # which of REQUIRED_FIELDS have an explicit match in this piece of text
+    invoice_no, amount, date = _scan_fields(text)
+    found = set()
+    if _FIRST_CHAR_RE.search(text):
+        found.add('vendor')
+    if invoice_no is not None:
+        found.add('invoice_no')
+    if date is not None:
+        found.add('date')
+    if amount is not None:
+        found.add('amount')
+    return found
+
+
+def _first_line(text):
+    # first non-empty line, stripped - without splitting the whole text
+    m = _FIRST_CHAR_RE.search(text)
+    if m is None:
+        return None
+    end = _LINE_BREAK_RE.search(text, m.start())
+    return text[m.start():end.start() if end else len(text)].strip()
+
+
+def _largest_number(text):
+    nums = (n.replace(',', '') for n in _NUMBER_RE.findall(text))
+    # after dropping commas a match is a valid float unless it has no digits left
+    floats = [float(n) for n in nums if n and n != '.']
+    return max(floats) if floats else None
+
+
+@metrics.timed('parse.text_fields')
+def _parse_text_fields(text):
+    res = {'vendor': None, 'invoice_no': None, 'date': None, 'amount': None}
+    # Basic vendor heuristic: first non-empty line
+    first = _first_line(text)
+    if first:
+        res['vendor'] = first[:60]
+
+    res['invoice_no'], amount, res['date'] = _scan_fields(text)
 
     # amount
-    m = re.search(AMOUNT_PATTERN, text, flags=re.IGNORECASE)
-    if m:
-        amt = m.group(2).replace(',', '')
+    if amount is not None:
         try:
-            res['amount'] = float(amt)
-        except:
+            res['amount'] = float(amount.replace(',', ''))
+        except ValueError:
             pass
     else:
         # fallback: find the largest number in text
-        nums = re.findall(r"\b[0-9,]+\.?[0-9]*\b", text)
-        nums = [n.replace(',', '') for n in nums]
-        floats = []
-        for n in nums:
-            try:
-                floats.append(float(n))
-            except:
-                pass
-        if floats:
-            res['amount'] = float(max(floats))
+        metrics.incr('amount_fallback_largest_number')
+        largest = _largest_number(text)
+        if largest is not None:
+            res['amount'] = float(largest)
 
-    return res
\ No newline at end of file
+    return res
@@ -0,0 +1,305 @@
+# metrics.py
+# Lightweight pipeline instrumentation: timing spans per stage, counters and
+# gauges, exported as Prometheus text or JSON lines. Everything is off unless
+# INVOICE_METRICS=1 (or enable() is called); disabled, span() hands back a
+# shared no-op context manager and incr() returns at once.
+#
+# Environment:
+#   INVOICE_METRICS=1                 record spans/counters
+#   INVOICE_METRICS_FILE=path         export at interpreter exit (.prom: Prometheus text, else JSON lines)
+#   INVOICE_PROFILE=cprofile,tracemalloc
+#                                     profile the profiled() blocks (batch scoring, app/service requests)
+#   INVOICE_PROFILE_DIR=dir           where .prof / tracemalloc reports go (default data/profiles)
+import os
+import json
+import time
+import atexit
+import functools
+import threading
+from bisect import bisect_left
+
+PREFIX = 'invoice'
+# span histogram bucket upper bounds, seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEFAULT_PROFILE_DIR = 'data/profiles'
+
+_enabled = os.environ.get('INVOICE_METRICS', '').lower() in ('1', 'true', 'yes', 'on')
+_lock = threading.Lock()
+_counters = {}  # (name, labels) -> value
+_gauges = {}    # (name, labels) -> value
+_spans = {}     # stage -> [count, sum, max, bucket counts...]
+
+
+def enabled():
+    return _enabled
+
+
+def enable(on=True):
+    # also exported to the environment so parser worker processes follow suit
+    global _enabled
+    _enabled = bool(on)
+    os.environ['INVOICE_METRICS'] = '1' if on else '0'
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _spans.clear()
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items())) if labels else ()
+
+
+def incr(name, n=1, **labels):
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + n
+
+
+def set_gauge(name, value, **labels):
+    if not _enabled:
+        return
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(stage, seconds):
+    # one timing of a stage into its histogram
+    with _lock:
+        h = _spans.get(stage)
+        if h is None:
+            h = _spans[stage] = [0, 0.0, 0.0] + [0] * (len(BUCKETS) + 1)
+        h[0] += 1
+        h[1] += seconds
+        h[2] = max(h[2], seconds)
+        h[3 + bisect_left(BUCKETS, seconds)] += 1
+
+
+class _Span:
+    __slots__ = ('stage', 't0')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.stage, time.perf_counter() - self.t0)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(stage):
+    # `with span('parse.pdf'): ...` times the block when metrics are enabled
+    return _Span(stage) if _enabled else _NULL_SPAN
+
+
+def timed(stage):
+    # decorator form of span()
+    def wrap(fn):
+        @functools.wraps(fn)
+        def timed_fn(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(stage, time.perf_counter() - t0)
+        return timed_fn
+    return wrap
+
+
+def snapshot():
+    # plain-dict copy of everything recorded so far
+    with _lock:
+        return {
+            'counters': [[name, dict(labels), value] for (name, labels), value in _counters.items()],
+            'gauges': [[name, dict(labels), value] for (name, labels), value in _gauges.items()],
+            'spans': {stage: list(h) for stage, h in _spans.items()},
+        }
+
+
+def drain():
+    # snapshot and reset, for shipping a worker process's metrics to its parent;
+    # None when disabled or nothing was recorded
+    if not _enabled:
+        return None
+    with _lock:
+        if not (_counters or _gauges or _spans):
+            return None
+    snap = snapshot()
+    reset()
+    return snap
+
+
+def merge(snap):
+    # add a snapshot (e.g. from drain() in a worker) into this process's metrics
+    if not snap:
+        return
+    with _lock:
+        for name, labels, value in snap['counters']:
+            key = _key(name, labels)
+            _counters[key] = _counters.get(key, 0) + value
+        for name, labels, value in snap['gauges']:
+            _gauges[_key(name, labels)] = value
+        for stage, h in snap['spans'].items():
+            mine = _spans.get(stage)
+            if mine is None:
+                _spans[stage] = list(h)
+            else:
+                mine[0] += h[0]
+                mine[1] += h[1]
+                mine[2] = max(mine[2], h[2])
+                for i in range(3, len(mine)):
+                    mine[i] += h[i]
+
+
+def _labels_text(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{str(v)}"' for k, v in sorted(labels.items())) + '}'
+
+
+def prometheus_text(snap=None):
+    """Prometheus text exposition (format 0.0.4) of a snapshot (default: current).
+
+    Counters are exported as <prefix>_<name>_total, gauges as <prefix>_<name>,
+    and every span stage as one series of the <prefix>_stage_seconds histogram.
+    """
+    snap = snap or snapshot()
+    lines = []
+    seen = set()
+    for name, labels, value in sorted(snap['counters'], key=lambda c: (c[0], sorted(c[1].items()))):
+        metric = f'{PREFIX}_{name}_total'
+        if metric not in seen:
+            lines.append(f'# TYPE {metric} counter')
+            seen.add(metric)
+        lines.append(f'{metric}{_labels_text(labels)} {value}')
+    for name, labels, value in sorted(snap['gauges'], key=lambda g: (g[0], sorted(g[1].items()))):
+        metric = f'{PREFIX}_{name}'
+        if metric not in seen:
+            lines.append(f'# TYPE {metric} gauge')
+            seen.add(metric)
+        lines.append(f'{metric}{_labels_text(labels)} {value}')
+    if snap['spans']:
+        metric = f'{PREFIX}_stage_seconds'
+        lines.append(f'# TYPE {metric} histogram')
+        for stage, h in sorted(snap['spans'].items()):
+            cumulative = 0
+            for bound, n in zip(BUCKETS + (float('inf'),), h[3:]):
+                cumulative += n
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{stage="{stage}"}} {h[1]!r}')
+            lines.append(f'{metric}_count{{stage="{stage}"}} {h[0]}')
+    return '\n'.join(lines) + '\n'
+
+
+def json_line(snap=None):
+    # one JSON object: timestamp, pid, counters, gauges and per-stage count/sum/max/mean seconds
+    snap = snap or snapshot()
+    return json.dumps({
+        'ts': time.time(),
+        'pid': os.getpid(),
+        'counters': [{'name': n, 'labels': l, 'value': v} for n, l, v in snap['counters']],
+        'gauges': [{'name': n, 'labels': l, 'value': v} for n, l, v in snap['gauges']],
+        'spans': {stage: {'count': h[0], 'sum': h[1], 'max': h[2], 'mean': h[1] / h[0] if h[0] else None,
+                          'buckets': dict(zip([str(b) for b in BUCKETS] + ['+Inf'], h[3:]))}
+                  for stage, h in snap['spans'].items()},
+    })
+
+
+def export(path):
+    # .prom: overwrite with Prometheus text (e.g. for a node_exporter textfile collector);
+    # anything else: append one JSON line
+    if path.endswith('.prom'):
+        tmp = f'{path}.tmp-{os.getpid()}'
+        with open(tmp, 'w') as f:
+            f.write(prometheus_text())
+        os.replace(tmp, path)
+    else:
+        with open(path, 'a') as f:
+            f.write(json_line() + '\n')
+
+
+# --- profiling hooks ---------------------------------------------------------
+
+_profile_modes = {m.strip().lower() for m in os.environ.get('INVOICE_PROFILE', '').split(',') if m.strip()}
+_profile_seq = [0]
+
+
+def _profile_path(name, ext):
+    directory = os.environ.get('INVOICE_PROFILE_DIR', DEFAULT_PROFILE_DIR)
+    os.makedirs(directory, exist_ok=True)
+    with _lock:
+        _profile_seq[0] += 1
+        seq = _profile_seq[0]
+    return os.path.join(directory, f'{name}-{os.getpid()}-{seq:04d}.{ext}')
+
+
+class _Profiled:
+    def __init__(self, name):
+        self.name = name
+        self.profiler = None
+        self.started_tracing = False
+
+    def __enter__(self):
+        if 'tracemalloc' in _profile_modes:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started_tracing = True
+            tracemalloc.reset_peak()
+        if 'cprofile' in _profile_modes:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            try:
+                self.profiler.enable()
+            except ValueError:
+                self.profiler = None  # another profiler is active (nested block or other thread)
+        return self
+
+    def __exit__(self, *exc):
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump_stats(_profile_path(self.name, 'prof'))
+        if 'tracemalloc' in _profile_modes:
+            import tracemalloc
+            _, peak = tracemalloc.get_traced_memory()
+            set_gauge('peak_traced_bytes', peak, block=self.name)
+            top = tracemalloc.take_snapshot().statistics('lineno')[:25]
+            with open(_profile_path(self.name, 'tracemalloc.txt'), 'w') as f:
+                f.write(f'peak traced bytes: {peak}\n')
+                f.writelines(f'{stat}\n' for stat in top)
+            if self.started_tracing:
+                tracemalloc.stop()
+        return False
+
+
+def profiled(name):
+    # cProfile and/or tracemalloc around a block, per INVOICE_PROFILE; no-op otherwise
+    return _Profiled(name) if _profile_modes else _NULL_SPAN
+
+
+_export_path = os.environ.get('INVOICE_METRICS_FILE')
+if _export_path:
+    atexit.register(lambda: _enabled and export(_export_path))
@@ -1,74 +1,148 @@
 # model_train.py
 import os
-import json
-import random
-import numpy as np
+import argparse
 import pandas as pd
-from datetime import datetime, timedelta
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
-from joblib import dump
-from features_extraction import build_features_from_dataframe
+from sklearn.metrics import roc_auc_score, average_precision_score
+from features_extraction import build_features_from_dataframe, FEATURE_COLS
+from utils import atomic_dump, atomic_write_json, write_manifest
+from vendor_stats import VendorStatsStore
+from vendor_resolver import VendorResolver
+from dedup import DuplicateIndex
+from velocity import VelocityTracker
+from compact_forest import CompactForest
+from tree_explainer import TreeExplainer
+from synthetic import write_synthetic
+from train_chunked import train_chunked, DEFAULT_WORK_DIR
+from history_store import is_store, load_history
+import tune
 
 DATA_PATH = 'data/synthetic_invoices.csv'
 ARTIFACT_DIR = 'data/model_artifacts'
 os.makedirs(ARTIFACT_DIR, exist_ok=True)
 
 
-def generate_synthetic(n=3000, out=DATA_PATH):
-    vendors = ['Alpha Supplies','Beta Traders','Gamma Co','Delta Services','Omega Inc']
-    rows = []
-    for i in range(n):
-        vendor = random.choice(vendors)
-        inv_no = f"INV-{random.randint(1000,9999)}"
-        # pick an amount; fraudulent invoices more likely to be round large amounts or tiny amounts
-        base = random.choice([100,250,500,1200,5000,10000])
-        noise = np.round(np.random.normal(0, base*0.15))
-        amount = max(10, base + noise)
-        # fraud label probability depends on vendor and patterns
-        fraud_prob = 0.02
-        if amount > 3000:
-            fraud_prob += 0.12
-        if amount % 100 == 0:
-            fraud_prob += 0.08
-        if random.random() < 0.01:
-            fraud_prob += 0.4
-        label = int(random.random() < fraud_prob)
-        date = datetime.now() - timedelta(days=random.randint(0,365))
-        rows.append({'invoice_no':inv_no, 'vendor':vendor, 'date':date.strftime('%Y-%m-%d'), 'amount':float(amount), 'label':label})
-    df = pd.DataFrame(rows)
-    os.makedirs(os.path.dirname(out), exist_ok=True)
-    df.to_csv(out, index=False)
+def generate_synthetic(n=3000, out=DATA_PATH, n_vendors=5, seed=0):
+    # vectorized, chunked generator; see synthetic.py for the fraud patterns and
+    # `python synthetic.py rows ...` for load-test sized data
+    write_synthetic(out, n, n_vendors=n_vendors, seed=seed)
     print(f"Synthetic data saved to {out}")
 
 
-if __name__ == '__main__':
-    if not os.path.exists(DATA_PATH):
-        print('Generating synthetic data...')
-        generate_synthetic()
+BASE_PARAMS = {'random_state': 42, 'class_weight': 'balanced'}
+DEFAULT_PARAMS = {'n_estimators': 200}
+
 
+def make_classifier(**params):
+    return RandomForestClassifier(**{**BASE_PARAMS, **DEFAULT_PARAMS, **params})
+
+
+def train_in_memory(path=DATA_PATH, start=None, end=None, tune_options=None):
+    # tune_options: keyword arguments for tune.search; the forest's parameters are
+    # then picked by cross-validation on the training split
     print('Loading data...')
-    df = pd.read_csv(DATA_PATH, parse_dates=['date'])
+    if is_store(path):
+        # typed Parquet, only the months in [start, end] are read
+        df = load_history(path, start=start, end=end)
+    elif path.lower().endswith('.parquet'):
+        df = pd.read_parquet(path)
+        df['date'] = pd.to_datetime(df['date'])
+    else:
+        df = pd.read_csv(path, parse_dates=['date'])
+    # spellings of one vendor ("Beta Traders", "BETA TRADERS PVT LTD") become one name
+    resolver = VendorResolver()
+    df['vendor'] = resolver.normalize_many(df['vendor'])
 
     # Build ML features
     X, y, stats = build_features_from_dataframe(df)
 
-    # Save stats for use at prediction time
-    with open(os.path.join(ARTIFACT_DIR, 'stats.json'), 'w') as f:
-        json.dump(stats, f, default=str)
-
     # scale
     scaler = StandardScaler()
     Xs = scaler.fit_transform(X)
-    dump(scaler, os.path.join(ARTIFACT_DIR, 'scaler.pkl'))
 
     X_train, X_test, y_train, y_test = train_test_split(Xs, y, test_size=0.2, random_state=42, stratify=y)
+    params = None
+    if tune_options is not None:
+        best, _ = tune.search(X_train, y_train, base_params=BASE_PARAMS, **tune_options)
+        params = best['params']
+        print('Selected parameters:', params)
     print('Training model...')
-    clf = RandomForestClassifier(n_estimators=200, random_state=42, class_weight='balanced')
+    clf = make_classifier(**(params or {}))
     clf.fit(X_train, y_train)
     print('Train acc:', clf.score(X_train, y_train))
     print('Test acc:', clf.score(X_test, y_test))
+    if tune_options is not None:
+        proba = clf.predict_proba(X_test)[:, 1]
+        flagged = proba >= tune_options.get('threshold', tune.DECISION_THRESHOLD)
+        print(f'Test ROC-AUC {roc_auc_score(y_test, proba):.3f}  PR-AUC {average_precision_score(y_test, proba):.3f}  '
+              f'recall {(flagged & (y_test == 1)).sum() / max((y_test == 1).sum(), 1):.3f}')
+    # incremental store of the same statistics, for online updates between retrains;
+    # history index for the duplicate features; last 30 days per vendor for velocity;
+    # the vendor index scoring resolves parsed vendor names with
+    return (stats, VendorStatsStore.from_dataframe(df), DuplicateIndex.from_dataframe(df),
+            VelocityTracker.from_dataframe(df), scaler, clf, resolver.compact())
+
+
+def save_artifacts(stats, store, dedup_index, tracker, scaler, clf, resolver, compact=False):
+    # everything derived from the model is built before the first file is replaced,
+    # so the model and its explainer / compact export land back to back
+    explainer = TreeExplainer.from_sklearn(clf, FEATURE_COLS)
+    compact_model = CompactForest.from_sklearn(clf, scaler) if compact else None
+    atomic_write_json(stats, os.path.join(ARTIFACT_DIR, 'stats.json'))
+    store.save(os.path.join(ARTIFACT_DIR, 'vendor_stats.json'))
+    atomic_dump(dedup_index, os.path.join(ARTIFACT_DIR, 'dedup_index.pkl'))
+    atomic_dump(tracker, os.path.join(ARTIFACT_DIR, 'velocity.pkl'))
+    atomic_dump(resolver, os.path.join(ARTIFACT_DIR, 'vendor_resolver.pkl'))
+    atomic_dump(scaler, os.path.join(ARTIFACT_DIR, 'scaler.pkl'))
+    atomic_dump(clf, os.path.join(ARTIFACT_DIR, 'model.pkl'))
+    atomic_dump(explainer, os.path.join(ARTIFACT_DIR, 'explainer.pkl'))
+    compact_path = os.path.join(ARTIFACT_DIR, 'model_compact.pkl')
+    if compact_model is not None:
+        atomic_dump(compact_model, compact_path)
+    elif os.path.exists(compact_path):
+        os.remove(compact_path)  # would be stale against the new model
+    # last: seals the files above as one set; until then scorers keep the previous set
+    write_manifest(ARTIFACT_DIR)
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Train the fraud model and write its artifacts')
+    ap.add_argument('--data', default=DATA_PATH,
+                    help='invoice history: .csv, .parquet or a history_store.py directory')
+    ap.add_argument('--start', default=None, help='history store only: earliest invoice date (YYYY-MM-DD)')
+    ap.add_argument('--end', default=None, help='history store only: latest invoice date (YYYY-MM-DD)')
+    ap.add_argument('--compact', action='store_true',
+                    help='also export the forest as flat arrays (model_compact.pkl) for fast single-invoice scoring')
+    ap.add_argument('--chunked', action='store_true',
+                    help='out-of-core: stream the history in chunks, features in memory-mapped files')
+    ap.add_argument('--memory-budget-mb', type=int, default=1024, help='chunked mode: memory budget')
+    ap.add_argument('--chunk-rows', type=int, default=None, help='chunked mode: rows per chunk (default: from budget)')
+    ap.add_argument('--work-dir', default=DEFAULT_WORK_DIR, help='chunked mode: where the memmaps go')
+    ap.add_argument('--tune', action='store_true',
+                    help='cross-validated parameter search; trains the fastest candidate meeting --recall-target')
+    ap.add_argument('--n-iter', type=int, default=None, help='tuning: random search of this many candidates (default: full grid)')
+    ap.add_argument('--cv', type=int, default=5, help='tuning: stratified folds')
+    ap.add_argument('--recall-target', type=float, default=0.8,
+                    help=f'tuning: minimum CV recall at probability >= {tune.DECISION_THRESHOLD}')
+    ap.add_argument('--tune-jobs', type=int, default=None, help='tuning: worker processes (default: all cores)')
+    args = ap.parse_args()
+    if args.tune and args.chunked:
+        ap.error('--tune works on the in-memory path only')
+    if (args.start or args.end) and not is_store(args.data):
+        ap.error('--start/--end need a history store directory (python history_store.py convert ...)')
+
+    if args.data == DATA_PATH and not os.path.exists(DATA_PATH):
+        print('Generating synthetic data...')
+        generate_synthetic()
 
-    dump(clf, os.path.join(ARTIFACT_DIR, 'model.pkl'))
-    print('Model and artifacts saved to', ARTIFACT_DIR)
\ No newline at end of file
+    if args.chunked:
+        result = train_chunked(args.data, make_classifier(), memory_budget_mb=args.memory_budget_mb,
+                               work_dir=args.work_dir, chunk_rows=args.chunk_rows, start=args.start, end=args.end)
+    else:
+        tune_options = None
+        if args.tune:
+            tune_options = dict(n_iter=args.n_iter, cv=args.cv, recall_target=args.recall_target, n_jobs=args.tune_jobs)
+        result = train_in_memory(args.data, start=args.start, end=args.end, tune_options=tune_options)
+    save_artifacts(*result, compact=args.compact)
+    print('Model and artifacts saved to', ARTIFACT_DIR)
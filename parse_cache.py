@@ -0,0 +1,185 @@
+# parse_cache.py
+# Persistent cache of parse results keyed by the SHA-256 of the file bytes, so a
+# resubmitted invoice costs a hash and a lookup instead of a full PDF/Excel decode.
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from invoice_parser import parse_file, parse_many, source_kind, PARSER_VERSION
+
+DEFAULT_CACHE_PATH = 'data/parse_cache.sqlite'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS parses (
+    key TEXT PRIMARY KEY,
+    parser_version TEXT NOT NULL,
+    result TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS parses_last_used ON parses (last_used);
+-- entry count and byte total of parses, kept current by triggers so that
+-- checking the size limits after a put does not scan the table
+CREATE TABLE IF NOT EXISTS parse_totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO parse_totals SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM parses;
+CREATE TRIGGER IF NOT EXISTS parses_insert AFTER INSERT ON parses BEGIN
+    UPDATE parse_totals SET entries = entries + 1, bytes = bytes + new.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS parses_delete AFTER DELETE ON parses BEGIN
+    UPDATE parse_totals SET entries = entries - 1, bytes = bytes - old.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS parses_resize AFTER UPDATE OF size ON parses BEGIN
+    UPDATE parse_totals SET bytes = bytes + new.size - old.size WHERE id = 0;
+END;
+'''
+
+
+def file_digest(source, chunk_size=1 << 20):
+    # SHA-256 of a file given by path, of raw bytes, or of a file-like object
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(source).hexdigest()
+    h = hashlib.sha256()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                h.update(chunk)
+    else:
+        pos = source.tell()
+        for chunk in iter(lambda: source.read(chunk_size), b''):
+            h.update(chunk)
+        source.seek(pos)
+    return h.hexdigest()
+
+
+def _cache_key(source, name=None):
+    # (digest, kind), or None when the file cannot be read - parse_file reports that
+    try:
+        return file_digest(source), source_kind(source, name)
+    except OSError:
+        return None
+
+
+class ParseCache:
+    """SQLite-backed, size-bounded LRU cache of parse_pdf/parse_excel results.
+
+    Entries are keyed by (file kind, SHA-256 of the bytes) and tagged with
+    invoice_parser.PARSER_VERSION; rows written by another parser version are
+    dropped when the cache is opened. Error results are not cached. The entry
+    count and byte total live in a one-row table maintained by triggers, so a
+    put only evicts (oldest last_used first) once a limit is crossed, without
+    scanning the table. Hit, miss and eviction counters are available from
+    stats().
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=100_000, max_bytes=256 * 2**20,
+                 parser_version=PARSER_VERSION):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.parser_version = parser_version
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+        self._conn.execute('DELETE FROM parses WHERE parser_version != ?', (parser_version,))
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _key(self, digest, kind):
+        return f'{kind}:{digest}'
+
+    def get(self, digest, kind):
+        key = self._key(digest, kind)
+        with self._lock:
+            row = self._conn.execute('SELECT result FROM parses WHERE key = ? AND parser_version = ?',
+                                     (key, self.parser_version)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute('UPDATE parses SET last_used = ? WHERE key = ?', (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, digest, kind, result):
+        if 'error' in result:
+            return
+        payload = json.dumps(result)
+        with self._lock:
+            # an upsert, not INSERT OR REPLACE: the rows REPLACE deletes do not fire delete triggers
+            self._conn.execute('INSERT INTO parses VALUES (?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+                               'parser_version = excluded.parser_version, result = excluded.result, '
+                               'size = excluded.size, last_used = excluded.last_used',
+                               (self._key(digest, kind), self.parser_version, payload, len(payload), time.time()))
+            self._evict()
+
+    def _totals(self):
+        return self._conn.execute('SELECT entries, bytes FROM parse_totals').fetchone()
+
+    def _evict(self):
+        count, total = self._totals()
+        if count <= self.max_entries and (self.max_bytes is None or total <= self.max_bytes):
+            return
+        doomed = []
+        for key, size in self._conn.execute('SELECT key, size FROM parses ORDER BY last_used'):
+            if count <= self.max_entries and (self.max_bytes is None or total <= self.max_bytes):
+                break
+            doomed.append((key,))
+            count -= 1
+            total -= size
+        self._conn.executemany('DELETE FROM parses WHERE key = ?', doomed)
+        self.evictions += len(doomed)
+
+    def parse(self, source, name=None):
+        # parse_file(source, name) through the cache
+        key = _cache_key(source, name)
+        result = self.get(*key) if key else None
+        if result is None:
+            result = parse_file(source, name)
+            if key:
+                self.put(*key, result)
+        return result
+
+    def parse_many(self, paths, **kwargs):
+        # like invoice_parser.parse_many (same keyword arguments; paths may also be
+        # bytes), but cached files are answered here and only misses go to the pool
+        paths = list(paths)
+        keys = [_cache_key(p) for p in paths]
+        results = [self.get(*k) if k else None for k in keys]
+        todo = [i for i, res in enumerate(results) if res is None]
+        kwargs['ordered'] = True
+        for i, (_, res) in zip(todo, parse_many([paths[i] for i in todo], **kwargs)):
+            results[i] = res
+            if keys[i]:
+                self.put(*keys[i], res)
+        return list(zip(paths, results))
+
+    def stats(self):
+        with self._lock:
+            count, total = self._totals()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': count,
+            'bytes': total,
+        }
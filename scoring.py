@@ -0,0 +1,255 @@
+# scoring.py
+# Batch scoring: parse a set of invoice files and score them with one predict_proba call.
+# Usage: python scoring.py <invoice dir or files...> --out results.csv
+import os
+import argparse
+import numpy as np
+import pandas as pd
+from invoice_parser import parse_many, SUPPORTED_EXTENSIONS
+from parse_cache import ParseCache, DEFAULT_CACHE_PATH
+from features_extraction import build_features_from_records, FEATURE_COLS
+from utils import get_registry
+from tree_explainer import TreeExplainer
+import metrics
+
+# (min probability, band, label, color) - highest band first, same cut-offs as the app
+RISK_LEVELS = [
+    (0.7, 'high', "🚨 HIGH RISK - Likely Fraudulent", 'red'),
+    (0.4, 'medium', "⚠️ MEDIUM RISK - Suspicious", 'orange'),
+    (0.2, 'review', "🟡 LOW RISK - Review Recommended", 'yellow'),
+    (0.0, 'low', "✅ LOW RISK - Likely Genuine", 'green'),
+]
+
+# batches up to this size go through the compact forest export when one was
+# trained; larger ones are faster in sklearn's compiled tree code
+COMPACT_MAX_ROWS = 256
+
+# readable names of the model's input features, for explanations
+FEATURE_LABELS = {
+    'amount': 'Invoice amount',
+    'is_round_amount': 'Round amount (divisible by 100)',
+    'amount_num_digits': 'Digits in the amount',
+    'vendor_freq': 'Invoices from this vendor in the history',
+    'amount_zscore': "Amount vs the vendor's typical invoices",
+    'dup_invoice_count': 'Invoice number billed before by this vendor',
+    'near_dup_count': 'Same amount billed within 30 days',
+    'vendor_invoices_7d': 'Vendor invoices in the last 7 days',
+    'vendor_invoices_30d': 'Vendor invoices in the last 30 days',
+    'vendor_amount_30d': 'Vendor amount billed in the last 30 days',
+    'days_since_prev_invoice': "Days since the vendor's previous invoice",
+}
+CONTRIB_COLS = ['contrib_' + c for c in FEATURE_COLS]
+# features that raise an invoice's probability by at least this much are listed in 'risk_factors'
+MIN_RISK_CONTRIBUTION = 0.02
+TOP_RISK_FACTORS = 3
+
+RECORD_FIELDS = ('vendor', 'invoice_no', 'date', 'amount')
+RESULT_COLS = ['file', 'invoice_no', 'vendor', 'resolved_vendor', 'date', 'amount', 'fraud_probability', 'risk_band', 'risk_label', 'error']
+
+
+def risk_level(proba):
+    # (label, color) for a single probability
+    for threshold, _, label, color in RISK_LEVELS:
+        if proba >= threshold:
+            return label, color
+    return RISK_LEVELS[-1][2], RISK_LEVELS[-1][3]
+
+
+def risk_bands(probas):
+    # vectorized band names for an array of probabilities (NaN -> None)
+    probas = np.asarray(probas, dtype=np.float64)
+    conds = [probas >= t for t, _, _, _ in RISK_LEVELS]
+    return np.select(conds, [b for _, b, _, _ in RISK_LEVELS], default=None)
+
+
+def predict_features(X, artifacts):
+    # fraud probability for each row of a raw (unscaled) float64 feature matrix;
+    # the compact and sklearn paths return identical values
+    if artifacts.compact_model is not None and len(X) <= COMPACT_MAX_ROWS:
+        with metrics.span('model.predict_compact'):
+            return artifacts.compact_model.predict_proba(X)[:, 1]
+    with metrics.span('model.scale'):
+        Xs = artifacts.scaler.transform(X)
+    with metrics.span('model.predict_proba'):
+        return artifacts.model.predict_proba(Xs)[:, 1]
+
+
+def _feature_matrix(records, artifacts):
+    if not records:
+        return np.empty((0, len(FEATURE_COLS)), dtype=np.float64)
+    return build_features_from_records(records, artifacts.stats, dtype=np.float64, dedup_index=artifacts.dedup_index,
+                                       velocity=artifacts.velocity, resolver=artifacts.vendor_resolver)
+
+
+def predict_records(records, artifacts):
+    # fraud probability for each parsed invoice dict, in one scaler/model call
+    if not records:
+        return np.empty(0, dtype=np.float64)
+    return predict_features(_feature_matrix(records, artifacts), artifacts)
+
+
+_built_explainers = {}
+
+
+def get_explainer(artifacts):
+    # the artifacts' TreeExplainer; artifact sets trained before explainer.pkl
+    # existed get one built from the model (~0.1s), kept for that set
+    if artifacts.explainer is not None:
+        return artifacts.explainer
+    explainer = _built_explainers.get(artifacts.signature)
+    if explainer is None:
+        explainer = TreeExplainer.from_sklearn(artifacts.model, FEATURE_COLS)
+        _built_explainers.clear()
+        _built_explainers[artifacts.signature] = explainer
+    return explainer
+
+
+def explain_features(X, artifacts):
+    # (n_rows, n_features) tree-path contributions of each raw feature to each row's
+    # fraud probability: get_explainer(artifacts).baseline + row sum == predict_features(X)
+    explainer = get_explainer(artifacts)
+    if artifacts.compact_model is not None and len(X) <= COMPACT_MAX_ROWS:
+        with metrics.span('model.apply_compact'):
+            leaves = artifacts.compact_model.apply(X)
+    else:
+        with metrics.span('model.apply'):
+            leaves = explainer.sklearn_leaves(artifacts.model, artifacts.scaler.transform(X))
+    with metrics.span('model.explain'):
+        return explainer.contributions(leaves)
+
+
+def risk_factor_summary(contributions, top=TOP_RISK_FACTORS, min_contribution=MIN_RISK_CONTRIBUTION):
+    # 'amount_zscore +0.21, dup_invoice_count +0.08' per row: the features raising
+    # the probability most, largest first ('' when none reaches min_contribution)
+    order = np.argsort(-contributions, axis=1, kind='stable')[:, :top]
+    values = np.take_along_axis(contributions, order, axis=1)
+    names = np.array(FEATURE_COLS, dtype=object)
+    summary = np.full(len(contributions), '', dtype=object)
+    for j in range(order.shape[1]):
+        hit = values[:, j] >= min_contribution
+        text = names[order[hit, j]] + np.char.mod(' %+.2f', values[hit, j]).astype(object)
+        summary[hit] = np.where(summary[hit] == '', text, summary[hit] + ', ' + text)
+    return summary
+
+
+@metrics.timed('score.records')
+def score_records(records, names=None, artifacts=None, explain=False):
+    # records: parsed invoice dicts (as returned by parse_pdf/parse_excel); records
+    # carrying an 'error' key are reported but not scored. artifacts: a
+    # utils.Artifacts, by default the process-wide registry's current one.
+    # explain=True adds a 'risk_factors' summary and the per-feature tree
+    # contributions (CONTRIB_COLS) of each scored invoice
+    artifacts = artifacts or get_registry().get()
+    names = names if names is not None else [None] * len(records)
+
+    df = pd.DataFrame({
+        'file': names,
+        'invoice_no': [r.get('invoice_no') for r in records],
+        'vendor': [r.get('vendor') for r in records],
+        'date': [r.get('date') for r in records],
+        'amount': [r.get('amount') for r in records],
+        'error': [r.get('error') for r in records],
+    })
+    ok = df['error'].isna().to_numpy()
+    proba = np.full(len(df), np.nan)
+    X = _feature_matrix([r for r, good in zip(records, ok) if good], artifacts)
+    if len(X):
+        proba[ok] = predict_features(X, artifacts)
+    metrics.incr('invoices_scored', int(ok.sum()))
+
+    # the known vendor each parsed name was matched to (resolver results are cached)
+    resolver = artifacts.vendor_resolver
+    df['resolved_vendor'] = resolver.resolve_many(df['vendor']) if resolver is not None else None
+    df['fraud_probability'] = proba
+    df['risk_band'] = risk_bands(proba)
+    labels = {band: label for _, band, label, _ in RISK_LEVELS}
+    df['risk_label'] = df['risk_band'].map(labels)
+    if not explain:
+        return df[RESULT_COLS]
+    contributions = np.full((len(df), len(FEATURE_COLS)), np.nan)
+    df['risk_factors'] = None
+    if len(X):
+        contributions[ok] = explain_features(X, artifacts)
+        df.loc[ok, 'risk_factors'] = risk_factor_summary(contributions[ok])
+    return pd.concat([df[RESULT_COLS + ['risk_factors']],
+                      pd.DataFrame(contributions, index=df.index, columns=CONTRIB_COLS)], axis=1)
+
+
+def record_from_json(obj):
+    # a parsed-invoice dict from a JSON object; invalid input becomes an error record
+    if not isinstance(obj, dict):
+        return {'error': 'invoice must be a JSON object'}
+    record = {k: obj.get(k) for k in RECORD_FIELDS}
+    amount = record['amount']
+    if amount is not None and (isinstance(amount, bool) or not isinstance(amount, (int, float))):
+        return dict(record, error='amount must be a number')
+    for k in ('vendor', 'invoice_no', 'date'):
+        if record[k] is not None and not isinstance(record[k], str):
+            return dict(record, error=f'{k} must be a string')
+    return record
+
+
+def find_invoice_files(inputs, recursive=False):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            if recursive:
+                found = [os.path.join(root, f) for root, _, files in os.walk(item) for f in files]
+            else:
+                found = [os.path.join(item, f) for f in os.listdir(item)]
+            paths.extend(sorted(p for p in found if p.lower().endswith(SUPPORTED_EXTENSIONS)))
+        else:
+            paths.append(item)
+    return paths
+
+
+def score_batch(paths, artifacts=None, workers=None, timeout=None, cache=None, names=None, explain=False):
+    # parse every file (in parallel unless workers=1; through a ParseCache when
+    # given) and score all of them with a single predict_proba call. paths may
+    # also hold in-memory file contents (bytes); names label the result rows.
+    paths = list(paths)
+    if names is None:
+        names = [str(p) if isinstance(p, (str, os.PathLike)) else None for p in paths]
+    if len(paths) < 2:
+        workers = 1
+    parse = cache.parse_many if cache is not None else parse_many
+    with metrics.profiled('score_batch'):
+        records = [res for _, res in parse(paths, workers=workers, timeout=timeout)]
+        return score_records(records, names=names, artifacts=artifacts, explain=explain)
+
+
+def write_results(df, out):
+    if out.lower().endswith('.parquet'):
+        df.to_parquet(out, index=False)
+    else:
+        df.to_csv(out, index=False)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Score a folder of invoices (PDF/XLSX) for fraud risk')
+    ap.add_argument('inputs', nargs='+', help='invoice files and/or directories')
+    ap.add_argument('--out', default='scores.csv', help='output file (.csv or .parquet)')
+    ap.add_argument('--recursive', action='store_true', help='descend into sub-directories')
+    ap.add_argument('--workers', type=int, default=None, help='parser processes (default: all cores, 1 = in-process)')
+    ap.add_argument('--timeout', type=float, default=None, help='per-file parse timeout in seconds')
+    ap.add_argument('--cache', nargs='?', const=DEFAULT_CACHE_PATH, default=None,
+                    help=f'reuse parse results for files seen before (default path: {DEFAULT_CACHE_PATH})')
+    ap.add_argument('--explain', action='store_true',
+                    help='add per-feature contributions to each probability and a risk_factors summary')
+    args = ap.parse_args(argv)
+
+    paths = find_invoice_files(args.inputs, recursive=args.recursive)
+    if not paths:
+        ap.error('no invoice files found')
+    cache = ParseCache(args.cache) if args.cache else None
+    df = score_batch(paths, workers=args.workers, timeout=args.timeout, cache=cache, explain=args.explain)
+    write_results(df, args.out)
+    counts = df['risk_band'].value_counts().to_dict()
+    print(f'Scored {int(df["fraud_probability"].notna().sum())}/{len(df)} invoices -> {args.out} {counts}')
+    if cache is not None:
+        print('Parse cache:', cache.stats())
+        cache.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,355 @@
+# service.py
+# HTTP scoring service: a plain ASGI app (no web framework) around scoring.py.
+#   POST /score        one invoice: a JSON object {vendor, invoice_no, date, amount},
+#                      a multipart/form-data upload, or the raw PDF/XLSX bytes
+#                      (422 when the file does not parse, 504 when parsing times out)
+#   POST /score/batch  a JSON list of invoices, or a multipart upload of several files
+#   GET  /health       artifact and micro-batching counters
+#   GET  /metrics      pipeline metrics, Prometheus text format (needs INVOICE_METRICS=1, see metrics.py)
+# Usage: python service.py --port 8000 --parse-workers 4 --parse-timeout 30
+#        uvicorn service:app --port 8000
+import os
+import json
+import math
+import asyncio
+import argparse
+from email.parser import BytesParser
+from email.policy import HTTP
+from urllib.parse import parse_qs
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from invoice_parser import _parse_isolated, PARSE_TIMEOUT_ERROR
+from scoring import score_records, record_from_json, COMPACT_MAX_ROWS
+from utils import get_registry
+import metrics
+
+MAX_BODY_BYTES = 20 * 2**20
+DEFAULT_PARSE_TIMEOUT = 30.0
+# how much longer than the parse timeout a request waits for its worker (which
+# may be stuck where the alarm cannot interrupt it) before giving up on it
+PARSE_TIMEOUT_GRACE = 5.0
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _parse_upload(data, name=None, timeout=None):
+    # process-pool entry point; never raises, a bad or slow file becomes an error
+    # record. Returns the record and the worker's metrics for it
+    return _parse_isolated(data, timeout, name), metrics.drain()
+
+
+def _timed_out(record):
+    return PARSE_TIMEOUT_ERROR in (record.get('error') or '')
+
+
+def _json_value(v):
+    if v is None or isinstance(v, str):
+        return v
+    if hasattr(v, 'item'):
+        v = v.item()  # numpy scalar
+    if isinstance(v, float) and math.isnan(v):
+        return None
+    return v
+
+
+def _score_batch(records, names):
+    # micro-batch scoring on the batcher thread (profiled when INVOICE_PROFILE is set)
+    with metrics.profiled('service_batch'):
+        return score_records(records, names)
+
+
+def _rows(df):
+    return [{k: _json_value(v) for k, v in row.items()} for row in df.to_dict('records')]
+
+
+class MicroBatcher:
+    """Collects single-invoice score requests into one score_records call.
+
+    The first waiting request opens a batch, which takes whatever else has
+    queued max_wait seconds later (at most max_batch requests, no wait when
+    that many are already queued). Scoring runs on a single background
+    thread, so requests arriving meanwhile queue up for the next batch and
+    the event loop keeps accepting connections.
+    """
+
+    def __init__(self, max_batch=COMPACT_MAX_ROWS, max_wait=0.002):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.scored = 0
+        self._queue = None
+        self._task = None
+        self._executor = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='score')
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._executor.shutdown(wait=True)
+
+    async def score(self, record, name=None):
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((record, name, fut))
+        return await fut
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        if self._queue.qsize() < self.max_batch - 1:
+            await asyncio.sleep(self.max_wait)
+        while len(batch) < self.max_batch and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            records = [r for r, _, _ in batch]
+            names = [n for _, n, _ in batch]
+            try:
+                df = await loop.run_in_executor(self._executor, _score_batch, records, names)
+                results = _rows(df)
+            except Exception as e:
+                for _, _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            self.batches += 1
+            self.scored += len(batch)
+            metrics.incr('service_batches')
+            metrics.incr('service_batched_invoices', len(batch))
+            for (_, _, fut), row in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(row)
+
+
+class ScoringService:
+    """ASGI application; the model is loaded once at startup (lifespan) and
+    reused through the artifact registry, which also picks up retrained files.
+    """
+
+    def __init__(self, parse_workers=None, max_batch=COMPACT_MAX_ROWS, max_wait=0.002,
+                 parse_timeout=DEFAULT_PARSE_TIMEOUT):
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.parse_timeout = parse_timeout
+        self.batcher = MicroBatcher(max_batch=max_batch, max_wait=max_wait)
+        self.requests = 0
+        self._pool = None
+        self._routes = {
+            ('POST', '/score'): self.score,
+            ('POST', '/score/batch'): self.score_batch,
+            ('GET', '/health'): self.health,
+            ('GET', '/metrics'): self.metrics,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    async def startup(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, get_registry().get)
+        self._pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+        self.batcher.start()
+
+    async def shutdown(self):
+        await self.batcher.stop()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self.startup()
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        self.requests += 1
+        handler = self._routes.get((scope['method'], scope['path']))
+        try:
+            if handler is None:
+                allowed = [m for m, p in self._routes if p == scope['path']]
+                raise HTTPError(405 if allowed else 404, 'method not allowed' if allowed else 'not found')
+            body = await self._read_body(receive)
+            with metrics.span('http' + scope['path'].replace('/', '.')):
+                status, payload = await handler(Request(scope, body))
+        except HTTPError as e:
+            status, payload = e.status, {'error': str(e)}
+        except Exception as e:
+            status, payload = 500, {'error': f'internal error: {e}'}
+        if isinstance(payload, str):
+            data, content_type = payload.encode(), b'text/plain; version=0.0.4; charset=utf-8'
+        else:
+            data, content_type = json.dumps(payload).encode(), b'application/json'
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', content_type), (b'content-length', str(len(data)).encode())]})
+        await send({'type': 'http.response.body', 'body': data})
+
+    async def _read_body(self, receive):
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                raise HTTPError(400, 'client disconnected')
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                raise HTTPError(413, f'request body over {MAX_BODY_BYTES} bytes')
+            chunks.append(chunk)
+            if not message.get('more_body', False):
+                return b''.join(chunks)
+
+    def _restart_pool(self, broken):
+        # a worker died (e.g. on a pathological file): later uploads get a fresh pool
+        if self._pool is broken:
+            self._pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+            broken.shutdown(wait=False)
+            metrics.incr('parse_pool_restarts')
+
+    async def _parse_one(self, name, data):
+        # each upload is parsed in a worker under parse_timeout (see invoice_parser._parse_isolated)
+        pool, timeout = self._pool, self.parse_timeout
+        try:
+            fut = asyncio.get_running_loop().run_in_executor(pool, _parse_upload, data, name, timeout)
+            return await (asyncio.wait_for(fut, timeout + PARSE_TIMEOUT_GRACE) if timeout else fut)
+        except asyncio.TimeoutError:
+            metrics.incr('parse_failures', kind='timeout')
+            return {'error': f'parse error: {PARSE_TIMEOUT_ERROR} after {timeout}s'}, None
+        except BrokenProcessPool as e:
+            self._restart_pool(pool)
+            metrics.incr('parse_failures', kind='worker')
+            return {'error': f'parse worker failed: {e!r}'}, None
+
+    async def _parse_files(self, files):
+        results = await asyncio.gather(*[self._parse_one(name, data) for name, data in files])
+        for _, worker_metrics in results:
+            metrics.merge(worker_metrics)
+        return [res for res, _ in results]
+
+    async def score(self, request):
+        if request.content_type == 'application/json':
+            record, name = record_from_json(request.json()), None
+            if 'error' in record:
+                raise HTTPError(400, record['error'])
+        else:
+            files = request.files()
+            if len(files) != 1:
+                raise HTTPError(400, 'expected one invoice file (use /score/batch for several)')
+            name = files[0][0]
+            record = (await self._parse_files(files))[0]
+            if 'error' in record:
+                return 504 if _timed_out(record) else 422, {'file': name, 'error': record['error']}
+        return 200, await self.batcher.score(record, name)
+
+    async def score_batch(self, request):
+        # already a batch: scored with one score_records call, bypassing the micro-batcher
+        if request.content_type == 'application/json':
+            items = request.json()
+            if isinstance(items, dict):
+                items = items.get('invoices')
+            if not isinstance(items, list):
+                raise HTTPError(400, 'expected a JSON list of invoices (or {"invoices": [...]})')
+            records, names = [record_from_json(obj) for obj in items], None
+        else:
+            files = request.files()
+            if not files:
+                raise HTTPError(400, 'no invoice files in the request')
+            records, names = await self._parse_files(files), [name for name, _ in files]
+        loop = asyncio.get_running_loop()
+        df = await loop.run_in_executor(None, score_records, records, names)
+        return 200, {'results': _rows(df)}
+
+    async def health(self, request):
+        artifacts = get_registry().get()
+        batches = self.batcher.batches
+        return 200, {
+            'status': 'ok',
+            'compact_model': artifacts.compact_model is not None,
+            'artifact_load_seconds': artifacts.load_seconds,
+            'requests': self.requests,
+            'batches': batches,
+            'batched_invoices': self.batcher.scored,
+            'mean_batch_size': self.batcher.scored / batches if batches else None,
+        }
+
+    async def metrics(self, request):
+        if not metrics.enabled():
+            return 200, '# metrics disabled; start the service with INVOICE_METRICS=1\n'
+        return 200, metrics.prometheus_text()
+
+
+class Request:
+    def __init__(self, scope, body):
+        self.scope = scope
+        self.body = body
+        self.headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope.get('headers', [])}
+        self.query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        self.content_type = self.headers.get('content-type', '').split(';')[0].strip().lower()
+
+    def json(self):
+        try:
+            return json.loads(self.body)
+        except ValueError as e:
+            raise HTTPError(400, f'invalid JSON: {e}')
+
+    def files(self):
+        # [(filename, bytes)] from a multipart/form-data body, or the raw body as one
+        # file (named by ?filename=, otherwise recognised from its content)
+        if self.content_type != 'multipart/form-data':
+            if not self.body:
+                return []
+            return [(self.query.get('filename', [None])[0], self.body)]
+        header = f'Content-Type: {self.headers["content-type"]}\r\n\r\n'.encode('latin-1')
+        message = BytesParser(policy=HTTP).parsebytes(header + self.body)
+        if not message.is_multipart():
+            raise HTTPError(400, 'malformed multipart body')
+        return [(part.get_filename(), part.get_payload(decode=True))
+                for part in message.iter_parts() if part.get_filename() is not None]
+
+
+app = ScoringService()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='HTTP fraud-scoring service (ASGI, served by uvicorn)')
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=8000)
+    ap.add_argument('--parse-workers', type=int, default=None, help='processes for parsing uploads (default: all cores)')
+    ap.add_argument('--max-batch', type=int, default=COMPACT_MAX_ROWS, help='largest micro-batch of single requests')
+    ap.add_argument('--max-wait-ms', type=float, default=2.0, help='how long a micro-batch waits to fill')
+    ap.add_argument('--parse-timeout', type=float, default=DEFAULT_PARSE_TIMEOUT,
+                    help='per-upload parse timeout in seconds (0: none)')
+    args = ap.parse_args(argv)
+
+    import uvicorn
+    service = ScoringService(parse_workers=args.parse_workers, max_batch=args.max_batch,
+                             max_wait=args.max_wait_ms / 1000, parse_timeout=args.parse_timeout or None)
+    uvicorn.run(service, host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+# stream_scoring.py
+# Streaming scoring of an invoice event log. JSON lines (one invoice per line:
+# {vendor, invoice_no, date, amount, optional id}) from a file - optionally
+# followed as it grows - or stdin flow through
+#   reader thread -> bounded queue -> micro-batches -> score_records -> JSON-lines output
+# The queue blocks the reader when scoring falls behind (backpressure); a batch
+# is scored once it holds batch_size events or flush_interval seconds after its
+# first one. Every scored invoice is folded into the vendor statistics,
+# duplicate index, velocity tracker and vendor resolver, so later invoices are
+# scored against it. The checkpoint directory holds the input offset together
+# with that online state, both as of the end of one batch; a restart resumes
+# from it (output is at-least-once: events scored after the last checkpoint are
+# scored again, against the state they were first scored against).
+# Usage: python stream_scoring.py events.jsonl --out scores.jsonl --checkpoint data/stream_checkpoint [--follow]
+#        ap_export | python stream_scoring.py - --checkpoint data/stream_checkpoint
+import os
+import sys
+import glob
+import json
+import time
+import queue
+import signal
+import argparse
+import threading
+
+import metrics
+from scoring import score_records, record_from_json
+from utils import ARTIFACT_DIR, ArtifactRegistry, atomic_dump, atomic_write_json
+from vendor_stats import VendorStatsStore
+
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_CHECKPOINT_INTERVAL = 10.0
+CHECKPOINT_FILE = 'checkpoint.json'
+_EOF = object()
+
+
+def read_lines(f, start=0, follow=False, poll=0.5, stop=None):
+    """Yield (end offset, line) for every line of a binary stream from byte `start`.
+
+    Seekable files are positioned at `start`; for pipes the first `start` bytes
+    are read and dropped. With follow, end of file means "wait for more" (tail
+    -f): a line is only yielded once its newline has been written. Otherwise a
+    final unterminated line is yielded at end of file. `stop` (a threading.Event)
+    ends a followed stream.
+    """
+    if f.seekable():
+        f.seek(start)
+    else:
+        skip = start
+        while skip:
+            chunk = f.read(min(skip, 1 << 20))
+            if not chunk:
+                break
+            skip -= len(chunk)
+    offset = start
+    partial = b''
+    while True:
+        line = f.readline()
+        if line.endswith(b'\n') or (line and not follow):
+            line, partial = partial + line, b''
+            offset += len(line)
+            yield offset, line
+        elif line:
+            partial += line
+        elif follow and not (stop and stop.is_set()):
+            time.sleep(poll)
+        else:
+            return
+
+
+def _produce(lines, q):
+    # reader thread: q.put blocks while the queue is full
+    try:
+        for item in lines:
+            q.put(item)
+    except Exception as e:
+        q.put(e)
+    q.put(_EOF)
+
+
+def iter_batches(q, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+    # lists of queued (offset, line) items: full batches, or whatever arrived
+    # within flush_interval of a batch's first item
+    batch, deadline = [], None
+    while True:
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            item = q.get(timeout=timeout)
+        except queue.Empty:
+            item = None
+        if item is _EOF or isinstance(item, Exception):
+            if batch:
+                yield batch
+            if item is not _EOF:
+                raise item
+            return
+        if item is not None:
+            if not batch:
+                deadline = time.monotonic() + flush_interval
+            batch.append(item)
+        if batch and (len(batch) >= batch_size or time.monotonic() >= deadline):
+            metrics.set_gauge('stream_queue_depth', q.qsize())
+            yield batch
+            batch, deadline = [], None
+
+
+def parse_event(line):
+    # (id, parsed-invoice dict) of one JSON line; bad lines become error records
+    try:
+        event = json.loads(line)
+    except ValueError as e:
+        return None, {'error': f'bad event: {e}'}
+    event_id = event.get('id') if isinstance(event, dict) else None
+    return event_id, record_from_json(event)
+
+
+class StreamScorer:
+    """Scores micro-batches of invoice events and learns from them.
+
+    Works on its own copy of the artifacts, loaded once (no hot reload, which
+    would drop the online updates), with the frozen stats.json dict replaced
+    by a VendorStatsStore. score() leaves that state alone; learn() then adds
+    a scored batch's valid invoices to the store, the duplicate index, the
+    velocity tracker and the vendor resolver (new vendors included), so they
+    count as history for every later batch. Invoices within one batch are
+    scored against the same history.
+    """
+
+    def __init__(self, artifacts, store):
+        self.artifacts = artifacts._replace(stats=store)
+        self.events = 0
+
+    @classmethod
+    def from_artifacts(cls, artifact_dir=ARTIFACT_DIR):
+        # its own registry: the vendor stats store it gets is updated in place
+        artifacts = ArtifactRegistry(artifact_dir).get()
+        store = artifacts.vendor_stats
+        if store is None:
+            store = VendorStatsStore.from_stats(artifacts.stats)
+        return cls(artifacts, store)
+
+    def score(self, batch):
+        # (parsed records, scored DataFrame: score_records columns plus the input offset)
+        # for a batch from iter_batches
+        with metrics.span('stream.batch'):
+            ids, records = zip(*(parse_event(line) for _, line in batch))
+            df = score_records(list(records), names=list(ids), artifacts=self.artifacts)
+            df.insert(0, 'offset', [offset for offset, _ in batch])
+        return records, df
+
+    def learn(self, records, df):
+        # fold a scored batch into the online state
+        a = self.artifacts
+        self.events += len(records)
+        metrics.incr('stream_events', len(records))
+        for record, resolved, error in zip(records, df['resolved_vendor'], df['error']):
+            if error is not None and error == error:  # NaN when there was no error
+                metrics.incr('stream_bad_events')
+                continue
+            vendor, amount = record.get('vendor'), record.get('amount')
+            if resolved is None and a.vendor_resolver is not None:
+                resolved = a.vendor_resolver.add(vendor)  # a new vendor
+            vendor = resolved or vendor
+            if amount is not None:
+                a.stats.update(vendor, amount)
+            if a.dedup_index is not None:
+                a.dedup_index.add(vendor, record.get('invoice_no'), record.get('date'), amount)
+            if a.velocity is not None:
+                a.velocity.add(vendor, record.get('date'), amount)
+
+    def state(self):
+        a = self.artifacts
+        return {'stats': a.stats, 'dedup_index': a.dedup_index, 'velocity': a.velocity,
+                'vendor_resolver': a.vendor_resolver, 'events': self.events}
+
+    def restore(self, state):
+        self.artifacts = self.artifacts._replace(stats=state['stats'], dedup_index=state['dedup_index'],
+                                                 velocity=state['velocity'], vendor_resolver=state['vendor_resolver'])
+        self.events = state['events']
+
+
+def save_checkpoint(directory, offset, scorer, source=None):
+    # state file first, then the checkpoint.json naming it (the commit point), then older state files
+    os.makedirs(directory, exist_ok=True)
+    if scorer.artifacts.dedup_index is not None:
+        scorer.artifacts.dedup_index.compact()
+    state_name = f'state-{offset:015d}.pkl'
+    atomic_dump(scorer.state(), os.path.join(directory, state_name))
+    atomic_write_json({'offset': offset, 'state': state_name, 'source': source, 'events': scorer.events,
+                       'saved_at': time.time()}, os.path.join(directory, CHECKPOINT_FILE))
+    for path in glob.glob(os.path.join(directory, 'state-*.pkl')):
+        if os.path.basename(path) != state_name:
+            os.remove(path)
+
+
+def load_checkpoint(directory, scorer):
+    # restores the scorer's online state; returns the checkpoint dict, or None when there is none
+    path = os.path.join(directory, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return None
+    from joblib import load
+    with open(path) as f:
+        checkpoint = json.load(f)
+    scorer.restore(load(os.path.join(directory, checkpoint['state'])))
+    return checkpoint
+
+
+def run(f, out, scorer, start=0, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+        max_queue=None, follow=False, checkpoint_dir=None, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL,
+        source=None):
+    """Score the JSON-lines stream f (binary) from byte `start`, writing JSON lines to out.
+
+    At most max_queue lines (default 4 batches) wait between the reader thread
+    and the scorer. Each batch's output is flushed before the batch is learned
+    from, and the offset only advances once it has been, so offset and online
+    state always describe the same completed batch. With checkpoint_dir, a
+    checkpoint is written at most every checkpoint_interval seconds between
+    batches, and once more when the stream ends or is interrupted - unless that
+    happens mid-batch, when the last checkpoint is kept. Returns the offset reached.
+    """
+    q = queue.Queue(maxsize=max_queue or 4 * batch_size)
+    stop = threading.Event()
+    lines = read_lines(f, start, follow=follow, stop=stop)
+    threading.Thread(target=_produce, args=(lines, q), daemon=True).start()
+    offset, saved_offset, saved_at = start, start, time.monotonic()
+    complete = True  # the online state matches offset
+    try:
+        for batch in iter_batches(q, batch_size, flush_interval):
+            records, df = scorer.score(batch)
+            out.write(df.to_json(orient='records', lines=True, force_ascii=False))
+            out.flush()
+            complete = False
+            scorer.learn(records, df)
+            offset, complete = batch[-1][0], True
+            if checkpoint_dir and time.monotonic() - saved_at >= checkpoint_interval:
+                save_checkpoint(checkpoint_dir, offset, scorer, source)
+                saved_offset, saved_at = offset, time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        if checkpoint_dir and complete and offset != saved_offset:
+            save_checkpoint(checkpoint_dir, offset, scorer, source)
+    return offset
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Score a JSON-lines invoice event stream in micro-batches')
+    ap.add_argument('source', help="JSON-lines file, or '-' for stdin")
+    ap.add_argument('--out', default='-', help="JSON-lines output (appended to), '-' for stdout")
+    ap.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    ap.add_argument('--flush-interval', type=float, default=DEFAULT_FLUSH_INTERVAL,
+                    help='seconds after its first event that a partial batch is scored')
+    ap.add_argument('--max-queue', type=int, default=None, help='lines buffered ahead of the scorer (default: 4 batches)')
+    ap.add_argument('--follow', action='store_true', help='keep reading as the file grows (like tail -f)')
+    ap.add_argument('--checkpoint', default=None, help='checkpoint directory (offset + online vendor state)')
+    ap.add_argument('--checkpoint-interval', type=float, default=DEFAULT_CHECKPOINT_INTERVAL)
+    ap.add_argument('--artifacts', default=ARTIFACT_DIR)
+    args = ap.parse_args(argv)
+
+    signal.signal(signal.SIGTERM, _interrupt)  # stop like Ctrl-C: checkpoint, then exit
+    scorer = StreamScorer.from_artifacts(args.artifacts)
+    start = 0
+    if args.checkpoint:
+        checkpoint = load_checkpoint(args.checkpoint, scorer)
+        if checkpoint is not None:
+            if checkpoint.get('source') != args.source:
+                print(f'warning: checkpoint was taken on {checkpoint.get("source")!r}', file=sys.stderr)
+            start = checkpoint['offset']
+            print(f'Resuming at byte {start:,} ({checkpoint["events"]:,} events scored before)', file=sys.stderr)
+
+    f = sys.stdin.buffer if args.source == '-' else open(args.source, 'rb')
+    out = sys.stdout if args.out == '-' else open(args.out, 'a', encoding='utf-8')
+    try:
+        t0 = time.perf_counter()
+        events_before = scorer.events
+        offset = run(f, out, scorer, start=start, batch_size=args.batch_size, flush_interval=args.flush_interval,
+                     max_queue=args.max_queue, follow=args.follow, checkpoint_dir=args.checkpoint,
+                     checkpoint_interval=args.checkpoint_interval, source=args.source)
+        elapsed = time.perf_counter() - t0
+        n = scorer.events - events_before
+        print(f'Scored {n:,} events in {elapsed:.1f}s ({n / elapsed if elapsed else 0:,.0f}/s); '
+              f'stopped at byte {offset:,}', file=sys.stderr)
+    finally:
+        if f is not sys.stdin.buffer:
+            f.close()
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,130 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from invoice_parser import parse_pdf, parse_excel
-from utils import load_model_and_artifacts
+import metrics
+from invoice_parser import parse_file, parse_many
+from utils import get_registry
 from features_extraction import extract_invoice_features, FEATURE_COLS
+from scoring import (risk_level, predict_features, score_records, explain_features, get_explainer, RISK_LEVELS,
+                     FEATURE_LABELS, CONTRIB_COLS, MIN_RISK_CONTRIBUTION, TOP_RISK_FACTORS)
 
 st.set_page_config(page_title='Invoice Fraud Detector', layout='wide')
 st.title('Invoice Fraud Detection — Demo')
 
-st.markdown('Upload an invoice (PDF or Excel). The app extracts fields and predicts probability of fraud using a trained model.')
+st.markdown('Upload an invoice (PDF or Excel) - or many, in batch review mode. The app extracts fields and predicts probability of fraud using a trained model.')
+
+
+@st.cache_resource
+def artifact_registry():
+    # one registry per server process; it reloads by itself when new artifacts are trained
+    return get_registry()
+
+
+def pipeline_metrics():
+    if metrics.enabled():
+        # INVOICE_METRICS=1: per-stage timings and counters of this server process
+        with st.expander("Pipeline Metrics"):
+            st.code(metrics.prometheus_text(), language='text')
+
+
+def show_contributions(contributions, baseline, values=None):
+    # tree-path explanation of one invoice: how far each feature moved its
+    # probability away from the model's baseline
+    explained = pd.DataFrame({'Feature': [FEATURE_LABELS[c] for c in FEATURE_COLS], 'Value': values,
+                              'Contribution': contributions}).sort_values('Contribution', ascending=False)
+    st.caption(f"The model starts every invoice at {baseline*100:.1f}%; each feature's contribution moves it up or "
+               "down along the decision paths of the forest's trees, and together they add up to the score.")
+    st.bar_chart(explained.set_index('Feature')['Contribution'])
+    raising = explained[explained['Contribution'] >= MIN_RISK_CONTRIBUTION].head(TOP_RISK_FACTORS)
+    if len(raising):
+        st.warning("**Key Risk Factors Detected:**")
+        for row in raising.itertuples():
+            value = f" (value {row.Value:g})" if values is not None else ""
+            st.write(f"• **{row.Feature}**{value}: +{row.Contribution*100:.1f} percentage points")
+    else:
+        st.success("**No significant risk factors detected.**")
+    return explained
+
+
+def batch_results(files, artifacts):
+    """Scored DataFrame for the uploaded files, kept in st.session_state.
+
+    Parse results are kept per upload (file_id), so only newly added files are
+    parsed - in parallel, across a process pool. All files are then scored in
+    one score_records call; that result is reused on every re-render until the
+    set of files or the model artifacts change.
+    """
+    records = st.session_state.setdefault('batch_records', {})
+    new = [f for f in files if f.file_id not in records]
+    if new:
+        with st.spinner(f'Parsing {len(new)} invoice(s)...'), metrics.profiled('app_parse'):
+            parsed = parse_many([f.getvalue() for f in new], workers=None if len(new) > 1 else 1)
+            for f, (_, res) in zip(new, parsed):
+                records[f.file_id] = res
+    key = (tuple(f.file_id for f in files), artifacts.signature)
+    batch = st.session_state.get('batch')
+    if batch is None or batch['key'] != key:
+        with metrics.profiled('app_score'):
+            df = score_records([records[f.file_id] for f in files], names=[f.name for f in files],
+                               artifacts=artifacts, explain=True)
+        batch = st.session_state['batch'] = {'key': key, 'results': df}
+        for file_id in set(records) - set(key[0]):
+            del records[file_id]  # removed from the uploader
+    return batch['results']
+
+
+def batch_review():
+    files = st.file_uploader('Upload invoices (PDF or Excel)', type=['pdf', 'xlsx', 'xls'], accept_multiple_files=True)
+    if not files:
+        return
+    artifacts = artifact_registry().get()
+    df = batch_results(files, artifacts)
+
+    bands = [band for _, band, _, _ in RISK_LEVELS]
+    counts = df['risk_band'].value_counts()
+    cols = st.columns(len(bands) + 1)
+    for col, band in zip(cols, bands):
+        col.metric(f'{band.title()} risk', int(counts.get(band, 0)))
+    cols[-1].metric('Not scored', int(df['error'].notna().sum()))
+
+    col1, col2, col3 = st.columns([2, 1, 2])
+    shown = col1.multiselect('Risk bands', bands, default=bands)
+    min_proba = col2.slider('Min. probability', 0.0, 1.0, 0.0, 0.05)
+    search = col3.text_input('File, vendor or invoice number contains')
+    mask = df['risk_band'].isin(shown) & (df['fraud_probability'] >= min_proba)
+    if st.checkbox('Include files that could not be parsed', value=True):
+        mask |= df['error'].notna()
+    if search:
+        text = df[['file', 'vendor', 'resolved_vendor', 'invoice_no']].fillna('').astype(str).agg(' '.join, axis=1)
+        mask &= text.str.contains(search, case=False, regex=False)
+    view = df[mask].sort_values('fraud_probability', ascending=False, na_position='last')
+
+    st.caption(f'{len(view)} of {len(df)} invoices - click a column header to sort')
+    columns = [c for c in view.columns if c not in CONTRIB_COLS and c != 'risk_band']
+    st.dataframe(view, column_order=columns, hide_index=True, use_container_width=True, column_config={
+        'fraud_probability': st.column_config.ProgressColumn('Fraud probability', min_value=0.0, max_value=1.0,
+                                                             format='%.3f'),
+        'risk_label': 'Risk level',
+        'risk_factors': 'Risk factors',
+    })
+    st.download_button('Download results with contributions (CSV)', view.to_csv(index=False),
+                       file_name='invoice_scores.csv', mime='text/csv')
+
+    scored = view[view['fraud_probability'].notna()]
+    if len(scored):
+        with st.expander('🔍 Risk Factor Analysis'):
+            pick = st.selectbox('Invoice', scored.index, format_func=lambda i: f"{scored.at[i, 'file']} "
+                                f"({scored.at[i, 'fraud_probability'] * 100:.1f}%)")
+            # contributions were computed with the scores; nothing is re-scored here
+            show_contributions(scored.loc[pick, CONTRIB_COLS].to_numpy(dtype=float), get_explainer(artifacts).baseline)
+
+
+mode = st.radio('Mode', ['Single invoice', 'Batch review'], horizontal=True)
+if mode == 'Batch review':
+    # many uploads at once: one results table to triage by risk band
+    batch_review()
+    pipeline_metrics()
+    st.stop()
 
 uploaded = st.file_uploader('Upload invoice (PDF or Excel)', type=['pdf','xlsx','xls'])
 
@@ -18,47 +134,40 @@ if st.button('Run demo (sample invoice)'):
     st.session_state['parsed'] = sample
 
 if uploaded is not None:
-    bytes_data = uploaded.read()
-    # write to temp file
-    with open('temp_uploaded_' + uploaded.name, 'wb') as f:
-        f.write(bytes_data)
-    path = 'temp_uploaded_' + uploaded.name
-    if uploaded.name.lower().endswith('.pdf'):
-        parsed = parse_pdf(path)
-    else:
-        parsed = parse_excel(path)
+    # parse straight from the uploaded bytes - no temp file on disk
+    with metrics.profiled('app_parse'):
+        parsed = parse_file(uploaded.getvalue(), name=uploaded.name)
     st.session_state['parsed'] = parsed
 
 if 'parsed' in st.session_state:
     st.subheader("Parsed Invoice Data")
     st.json(st.session_state['parsed'])
 
-    # Load model and artifacts
-    model, scaler, stats = load_model_and_artifacts()
+    # Load model and artifacts (cached; reloaded only when the files change)
+    artifacts = artifact_registry().get()
+    stats = artifacts.stats
 
-    # Extract features for model input
-    features = extract_invoice_features(st.session_state['parsed'], stats)
-    X = np.array([features])
-    X_scaled = scaler.transform(X)
+    with metrics.profiled('app_score'), metrics.span('app.score'):
+        # Extract features for model input
+        features = extract_invoice_features(st.session_state['parsed'], stats, dedup_index=artifacts.dedup_index,
+                                            velocity=artifacts.velocity, resolver=artifacts.vendor_resolver)
+        X = np.array([features])
 
-    # Predict probability
-    proba = model.predict_proba(X_scaled)[0, 1]
+        # Predict probability (compact forest export when available - same result, less overhead)
+        proba = predict_features(X, artifacts)[0]
     
     # More nuanced labeling based on risk levels
-    if proba >= 0.7:
-        label = "🚨 HIGH RISK - Likely Fraudulent"
-        color = "red"
-    elif proba >= 0.4:
-        label = "⚠️ MEDIUM RISK - Suspicious"
-        color = "orange"
-    elif proba >= 0.2:
-        label = "🟡 LOW RISK - Review Recommended"
-        color = "yellow"
-    else:
-        label = "✅ LOW RISK - Likely Genuine"
-        color = "green"
+    label, color = risk_level(proba)
 
     st.subheader("Fraud Detection Results")
+    if artifacts.vendor_resolver is not None:
+        parsed_vendor = st.session_state['parsed'].get('vendor')
+        resolved = artifacts.vendor_resolver.resolve(parsed_vendor)
+        if resolved is None:
+            st.caption(f"Vendor {parsed_vendor!r} matches no known vendor - scored without vendor history")
+        elif resolved != parsed_vendor:
+            st.caption(f"Vendor {parsed_vendor!r} matched to known vendor {resolved!r}")
+    st.caption(f"Model artifacts loaded in {artifacts.load_seconds:.2f}s")
     
     # Create a visual risk indicator
     col1, col2, col3 = st.columns([1, 2, 1])
@@ -101,28 +210,13 @@ if 'parsed' in st.session_state:
     # Add risk factor analysis
     st.subheader("🔍 Risk Factor Analysis")
     
-    # Analyze the features to explain why this score was given
-    risk_factors = []
-    if features[1] == 1:  # is_round_amount
-        risk_factors.append("• **Round Amount**: Invoice amount is divisible by 100 (suspicious)")
-    if features[0] > 5000:  # amount > 5000
-        risk_factors.append("• **High Amount**: Invoice amount exceeds $5,000 threshold")
-    if abs(features[4]) > 1.0:  # amount_zscore > 1
-        risk_factors.append("• **Unusual Amount**: Amount significantly differs from vendor's typical invoices")
-    if features[3] < 100:  # vendor_freq < 100
-        risk_factors.append("• **New Vendor**: Vendor has limited transaction history")
-    
-    if risk_factors:
-        st.warning("**Key Risk Factors Detected:**")
-        for factor in risk_factors:
-            st.write(factor)
-    else:
-        st.success("**No significant risk factors detected.**")
+    # Explain the score with the trained forest's own decision paths
+    with metrics.span('app.explain'):
+        contributions = explain_features(X, artifacts)[0]
+    explained = show_contributions(contributions, get_explainer(artifacts).baseline, values=features)
 
     # Show features used
     with st.expander("Show Extracted Features for Model"):
-        feature_df = pd.DataFrame({
-            'Feature': FEATURE_COLS,
-            'Value': features
-        })
-        st.dataframe(feature_df)
+        st.dataframe(explained)
+
+pipeline_metrics()
@@ -0,0 +1,259 @@
+# synthetic.py
+# Seeded, vectorized synthetic invoice data for training and load testing.
+# Usage:
+#   python synthetic.py rows --rows 10000000 --vendors 5000 --out data/load_test.parquet
+#   python synthetic.py files --rows 200 --out-dir Invoices/synthetic --formats pdf xlsx
+import os
+import argparse
+import datetime as dt
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+BASE_VENDORS = ['Alpha Supplies', 'Beta Traders', 'Gamma Co', 'Delta Services', 'Omega Inc']
+BASE_AMOUNTS = np.array([100, 250, 500, 1200, 5000, 10000])
+COLUMNS = ['invoice_no', 'vendor', 'date', 'amount', 'label']
+
+# fraud patterns; the first four reproduce the original per-row generator
+DEFAULT_PATTERNS = {
+    'base_rate': 0.02,         # fraud probability of an ordinary invoice
+    'large_amount': 0.12,      # added when amount > 3000
+    'round_amount': 0.08,      # added when amount is a multiple of 100
+    'spike_rate': 0.01,        # share of invoices with an extra...
+    'spike_prob': 0.4,         # ...fraud probability
+    'duplicate_rate': 0.005,   # share of rows re-billing an earlier invoice (always fraud)
+    'duplicate_max_days': 20,  # re-billed this many days after the original, at most
+    'burst_rate': 0.0005,      # share of rows starting a velocity burst (always fraud)
+    'burst_size': 8,           # invoices per burst...
+    'burst_days': 3,           # ...all from one vendor within this many days
+}
+
+
+def vendor_names(n_vendors):
+    extra = max(0, n_vendors - len(BASE_VENDORS))
+    return np.array(BASE_VENDORS[:n_vendors] + [f'Vendor {i:05d}' for i in range(extra)], dtype=object)
+
+
+def _vendor_cdf(n_vendors):
+    # Zipf-like popularity: a few vendors send most invoices
+    weights = 1.0 / np.arange(1, n_vendors + 1)
+    return np.cumsum(weights) / weights.sum()
+
+
+def _amounts(rng, n):
+    base = BASE_AMOUNTS[rng.integers(0, len(BASE_AMOUNTS), size=n)]
+    return np.maximum(10, base + np.round(rng.normal(0, base * 0.15))).astype(np.float64)
+
+
+def _labels(rng, amount, patterns):
+    p = np.full(len(amount), patterns['base_rate'])
+    p += np.where(amount > 3000, patterns['large_amount'], 0.0)
+    p += np.where(amount % 100 == 0, patterns['round_amount'], 0.0)
+    p += np.where(rng.random(len(amount)) < patterns['spike_rate'], patterns['spike_prob'], 0.0)
+    return (rng.random(len(amount)) < p).astype(np.int64)
+
+
+def _format_days(days, epoch):
+    # YYYY-MM-DD strings, formatting each distinct day once
+    uniques, inverse = np.unique(days, return_inverse=True)
+    table = np.datetime_as_string(epoch + uniques.astype('timedelta64[D]'), unit='D').astype(object)
+    return table[inverse]
+
+
+def generate_chunk(rng, n, vendors, cdf, first_no, end_day, span_days, patterns):
+    # one DataFrame of n rows; days are offsets back from end_day
+    vendor = np.searchsorted(cdf, rng.random(n), side='right').clip(max=len(vendors) - 1)
+    day = end_day - rng.integers(0, span_days, size=n)
+    amount = _amounts(rng, n)
+    label = _labels(rng, amount, patterns)
+    number = np.arange(first_no, first_no + n, dtype=np.int64)
+
+    # velocity bursts: runs of burst_size rows rewritten as one vendor billing
+    # repeatedly within burst_days
+    size = patterns['burst_size']
+    n_bursts = min(rng.binomial(n, patterns['burst_rate']), n // max(size, 1))
+    if n_bursts:
+        rows = np.arange(n_bursts * size)
+        burst = rows // size
+        vendor[rows] = vendor[burst * size]
+        day[rows] = day[burst * size] - rng.integers(0, patterns['burst_days'], size=len(rows))
+        label[rows] = 1
+
+    # duplicates: copies of other rows of the chunk, re-billed a few days later
+    n_dups = rng.binomial(n, patterns['duplicate_rate'])
+    if n_dups:
+        dst = rng.integers(0, n, size=n_dups)
+        src = rng.integers(0, n, size=n_dups)
+        vendor[dst], number[dst], amount[dst] = vendor[src], number[src], amount[src]
+        day[dst] = np.minimum(end_day, day[src] + rng.integers(1, patterns['duplicate_max_days'] + 1, size=n_dups))
+        label[dst] = 1
+
+    # bursts were written to the leading rows; spread them through the chunk
+    order = rng.permutation(n)
+    vendor, number, day, amount, label = vendor[order], number[order], day[order], amount[order], label[order]
+    return pd.DataFrame({
+        'invoice_no': np.char.add('INV-', number.astype('U10')).astype(object),
+        'vendor': vendors[vendor],
+        'date': _format_days(day, np.datetime64('1970-01-01', 'D')),
+        'amount': amount,
+        'label': label,
+    }, columns=COLUMNS)
+
+
+def iter_synthetic(n_rows, n_vendors=2000, seed=0, chunk_size=1_000_000, patterns=None,
+                   end_date=None, span_days=365):
+    """Yield DataFrame chunks of synthetic invoices (columns as data/synthetic_invoices.csv).
+
+    Chunk i is drawn from its own generator seeded with (seed, i), so a given
+    seed and chunk_size always produce the same rows, and memory stays at one
+    chunk however many rows are requested. end_date defaults to today.
+    """
+    patterns = dict(DEFAULT_PATTERNS, **(patterns or {}))
+    vendors = vendor_names(n_vendors)
+    cdf = _vendor_cdf(len(vendors))
+    end = np.datetime64(end_date or dt.date.today(), 'D')
+    end_day = int((end - np.datetime64('1970-01-01', 'D')).astype(np.int64))
+    for i, start in enumerate(range(0, n_rows, chunk_size)):
+        rng = np.random.default_rng([seed, i])
+        n = min(chunk_size, n_rows - start)
+        yield generate_chunk(rng, n, vendors, cdf, 10_000_000 + start, end_day, span_days, patterns)
+
+
+def write_synthetic(out, n_rows, **kwargs):
+    # stream iter_synthetic chunks to a .csv or .parquet file; returns the row count
+    tmp = f'{out}.tmp-{os.getpid()}'
+    if os.path.dirname(out):
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+    written = 0
+    writer = None
+    try:
+        for chunk in iter_synthetic(n_rows, **kwargs):
+            if out.lower().endswith('.parquet'):
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp, table.schema)
+                writer.write_table(table)
+            else:
+                chunk.to_csv(tmp, mode='a' if written else 'w', header=not written, index=False)
+            written += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp, out)
+    return written
+
+
+LINE_ITEMS = [
+    ("Office Supplies", "Premium pens and notebooks"),
+    ("Paper", "A4 printer paper, 500 sheets"),
+    ("Consulting Services", "Business process optimization"),
+    ("Software License", "Enterprise software package"),
+    ("Training", "On-site training session"),
+    ("Support", "Annual support contract"),
+    ("Hardware", "Laptop docking station"),
+    ("Logistics", "Freight and handling"),
+]
+
+
+def _line_items(rng, amount):
+    # 1-4 line items whose totals add up to amount to the cent
+    cents = int(round(amount * 100))
+    k = int(min(rng.integers(1, 5), max(1, cents // 1000)))
+    cuts = np.sort(rng.choice(cents - 1, size=k - 1, replace=False) + 1) if k > 1 else []
+    parts = np.diff(np.concatenate([[0], cuts, [cents]])).astype(int)
+    items = []
+    for part in parts:
+        qty = int(rng.integers(1, 11))
+        if part % qty:
+            qty = 1
+        name, description = LINE_ITEMS[int(rng.integers(0, len(LINE_ITEMS)))]
+        items.append([name, description, qty, part / qty / 100, part / 100])
+    return items
+
+
+def _invoice_document(row, seed):
+    rng = np.random.default_rng([seed, int(row['invoice_no'].split('-')[-1])])
+    slug = ''.join(ch for ch in row['vendor'].lower() if ch.isalnum())
+    due = (dt.date.fromisoformat(row['date']) + dt.timedelta(days=30)).isoformat()
+    return {
+        'invoice_no': row['invoice_no'],
+        'date': row['date'],
+        'due_date': due,
+        'vendor': row['vendor'],
+        'contact': f'billing@{slug}.com',
+        'phone': f'+1-555-{int(rng.integers(0, 10000)):04d}',
+        'items': _line_items(rng, row['amount']),
+    }
+
+
+def _write_invoice_file(task):
+    path, row, seed = task
+    if path.endswith('.pdf'):
+        from create_pdf_invoice import write_pdf_invoice
+        write_pdf_invoice(path, _invoice_document(row, seed))
+    else:
+        from sample_invoices import write_excel_invoice
+        write_excel_invoice(path, _invoice_document(row, seed))
+    return path
+
+
+def write_invoice_files(out_dir, n_files, formats=('pdf', 'xlsx'), seed=0, workers=None, **kwargs):
+    """Render n_files synthetic invoices as PDF/XLSX files plus a manifest.csv.
+
+    Rows come from iter_synthetic (same seed and patterns) and are rendered
+    with create_pdf_invoice.write_pdf_invoice / sample_invoices.write_excel_invoice,
+    alternating between the requested formats. manifest.csv maps every file
+    to its ground-truth fields and label.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rows = pd.concat(iter_synthetic(n_files, seed=seed, **kwargs), ignore_index=True)
+    paths = [os.path.join(out_dir, f'invoice_{i:07d}.{formats[i % len(formats)]}') for i in range(len(rows))]
+    tasks = [(p, row, seed) for p, row in zip(paths, rows.to_dict('records'))]
+    if workers == 1:
+        for task in tasks:
+            _write_invoice_file(task)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for _ in pool.map(_write_invoice_file, tasks, chunksize=16):
+                pass
+    rows.insert(0, 'file', [os.path.basename(p) for p in paths])
+    rows.to_csv(os.path.join(out_dir, 'manifest.csv'), index=False)
+    return paths
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Generate synthetic invoice data for training and load tests')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--rows', type=int, required=True)
+    common.add_argument('--vendors', type=int, default=2000)
+    common.add_argument('--seed', type=int, default=0)
+    common.add_argument('--end-date', default=None, help='latest invoice date (YYYY-MM-DD, default today)')
+    for name in DEFAULT_PATTERNS:
+        common.add_argument('--' + name.replace('_', '-'), type=type(DEFAULT_PATTERNS[name]), default=None)
+
+    r = sub.add_parser('rows', parents=[common], help='tabular history (.csv or .parquet), written in chunks')
+    r.add_argument('--out', required=True)
+    r.add_argument('--chunk-size', type=int, default=1_000_000)
+    f = sub.add_parser('files', parents=[common], help='PDF/XLSX invoice files + manifest.csv')
+    f.add_argument('--out-dir', required=True)
+    f.add_argument('--formats', nargs='+', choices=['pdf', 'xlsx'], default=['pdf', 'xlsx'])
+    f.add_argument('--workers', type=int, default=None)
+    args = ap.parse_args(argv)
+
+    patterns = {k: getattr(args, k) for k in DEFAULT_PATTERNS if getattr(args, k) is not None}
+    opts = dict(n_vendors=args.vendors, patterns=patterns, end_date=args.end_date)
+    if args.cmd == 'rows':
+        n = write_synthetic(args.out, args.rows, seed=args.seed, chunk_size=args.chunk_size, **opts)
+        print(f'Wrote {n:,} rows -> {args.out}')
+    else:
+        paths = write_invoice_files(args.out_dir, args.rows, formats=tuple(args.formats), seed=args.seed,
+                                    workers=args.workers, **opts)
+        print(f'Wrote {len(paths):,} invoice files + manifest.csv -> {args.out_dir}')
+
+
+if __name__ == '__main__':
+    main()
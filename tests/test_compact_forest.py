@@ -0,0 +1,59 @@
+# tests/test_compact_forest.py
+# Usage: python -m pytest tests/test_compact_forest.py
+# CompactForest.predict_proba must equal scaler.transform + model.predict_proba
+# bit for bit, including rows sitting exactly at the folded split thresholds.
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from compact_forest import CompactForest
+
+
+def fitted(class_weight=None, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(0, 1, size=(2000, 6)) * [1, 10, 1000, 0.01, 5, 1] + [0, 5, 2000, 0, -3, 0]
+    X[:, 5] = np.round(X[:, 5])  # a discrete feature: many rows on one threshold
+    y = ((X[:, 0] + X[:, 1] / 10 + rng.normal(0, 0.5, size=len(X))) > 1).astype(int)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=15, max_depth=8, min_samples_leaf=2, class_weight=class_weight,
+                                   random_state=seed).fit(scaler.transform(X), y)
+    return model, scaler, X
+
+
+def threshold_rows(compact, X, seed=0):
+    # each row has one feature set to a folded threshold or its float64 neighbours
+    rng = np.random.default_rng(seed)
+    nodes = np.flatnonzero(~compact.is_leaf)
+    edge = X[rng.integers(0, len(X), size=3 * len(nodes))].copy()
+    for k, i in enumerate(np.repeat(nodes, 3)):
+        t = compact.threshold[i]
+        edge[k, compact.feature[i]] = (t, np.nextafter(t, np.inf), np.nextafter(t, -np.inf))[k % 3]
+    return edge[np.isfinite(edge).all(axis=1)]
+
+
+@pytest.mark.parametrize('class_weight', [None, 'balanced'])
+def test_random_rows_bit_identical(class_weight):
+    model, scaler, X = fitted(class_weight)
+    compact = CompactForest.from_sklearn(model, scaler)
+    rows = np.random.default_rng(1).normal(0, 1, size=(5000, 6)) * X.std(axis=0) + X.mean(axis=0)
+    for Z in (X, rows, rows[:1]):
+        assert np.array_equal(compact.predict_proba(Z), model.predict_proba(scaler.transform(Z)))
+
+
+@pytest.mark.parametrize('class_weight', [None, 'balanced'])
+def test_threshold_rows_bit_identical(class_weight):
+    model, scaler, X = fitted(class_weight, seed=2)
+    compact = CompactForest.from_sklearn(model, scaler)
+    edge = threshold_rows(compact, X)
+    assert len(edge) > 100
+    assert np.array_equal(compact.predict_proba(edge), model.predict_proba(scaler.transform(edge)))
+
+
+def test_without_scaler():
+    model, scaler, X = fitted(seed=3)
+    Xs = scaler.transform(X)
+    compact = CompactForest.from_sklearn(model)
+    assert np.array_equal(compact.predict_proba(Xs), model.predict_proba(Xs))
+    edge = threshold_rows(compact, Xs)
+    assert np.array_equal(compact.predict_proba(edge), model.predict_proba(edge))
@@ -0,0 +1,71 @@
+# tests/test_features.py
+# Usage: python -m pytest tests/test_features.py
+# Parity of the columnar feature engine (build_feature_matrix) with the per-row
+# extract_invoice_features path it replaced.
+import numpy as np
+import pandas as pd
+
+from features_extraction import build_feature_matrix, compute_vendor_stats, extract_invoice_features
+
+
+def per_row(df, stats):
+    X = []
+    for _, row in df.iterrows():
+        parsed = {'invoice_no': row['invoice_no'], 'vendor': row['vendor'], 'date': row['date'],
+                  'amount': row['amount']}
+        X.append(extract_invoice_features(parsed, stats))
+    return np.array(X, dtype=np.float64)
+
+
+def history(n, seed=0):
+    rng = np.random.default_rng(seed)
+    vendors = np.array(['Alpha Supplies', 'Beta Traders', 'Gamma Co'] + [f'Vendor {i:05d}' for i in range(40)],
+                       dtype=object)
+    base = rng.choice([100, 250, 500, 1200, 5000, 10000], size=n)
+    dates = pd.Timestamp('2025-01-01') - pd.to_timedelta(rng.integers(0, 365, size=n), unit='D')
+    return pd.DataFrame({
+        'invoice_no': [f'INV-{i}' for i in rng.integers(1000, 10000, size=n)],
+        'vendor': vendors[rng.integers(0, len(vendors), size=n)],
+        'date': dates.strftime('%Y-%m-%d'),
+        'amount': np.maximum(0, base + np.round(rng.normal(0, base * 0.15))).astype(np.float64),
+    })
+
+
+def edge_rows():
+    # missing and empty vendors, zero / sub-1 / round amounts, vendors seen once
+    return pd.DataFrame({
+        'invoice_no': ['E-1', 'E-2', 'E-3', 'E-4', 'E-5', 'E-6', 'E-7'],
+        'vendor': [np.nan, '', None, 'Only Once Ltd', 'Beta Traders', 'Another Single', 'Alpha Supplies'],
+        'date': ['2025-02-01'] * 7,
+        'amount': [0.0, 250.0, 0.5, 1234.56, 0.0, 100000.0, 99.99],
+    })
+
+
+def assert_parity(df, stats):
+    X = build_feature_matrix(df, stats, dtype=np.float64)
+    X_ref = per_row(df, stats)
+    bad = np.argwhere(X != X_ref)[:5].tolist()
+    assert np.array_equal(X, X_ref), f'columnar features differ from the per-row path at {bad}'
+
+
+def test_parity_on_seeded_history():
+    df = history(2000)
+    assert_parity(df, compute_vendor_stats(df))
+
+
+def test_parity_on_edge_rows():
+    df = pd.concat([history(300, seed=1), edge_rows()], ignore_index=True)
+    stats = compute_vendor_stats(df)
+    assert stats['vendor_counts']['Only Once Ltd'] == 1
+    assert_parity(df, stats)
+
+
+def test_parity_against_other_stats():
+    # vendors unknown to the stats fall back to the global mean/std
+    stats = compute_vendor_stats(history(500, seed=2).iloc[:20])
+    assert_parity(pd.concat([history(200, seed=3), edge_rows()], ignore_index=True), stats)
+
+
+def test_zero_amount_features():
+    X = build_feature_matrix(edge_rows(), compute_vendor_stats(edge_rows()), dtype=np.float64)
+    assert X[0, 1] == 1 and X[0, 2] == 1  # 0.0 is round and has one digit
@@ -0,0 +1,93 @@
+# tests/test_text_fields.py
+# Usage: python -m pytest tests/test_text_fields.py
+# The anchored single-pass field scan (_anchored_search / _scan_fields) must
+# return what the original independent re.search calls return.
+import random
+import re
+from datetime import datetime
+
+import pytest
+
+from invoice_parser import (_AMOUNT_ANCHORS, _AMOUNT_RE, _DATE_ANCHORS, _DATE_RES, _INVOICE_ANCHORS, _INVOICE_RE,
+                            _anchored_search, _parse_text_fields, AMOUNT_PATTERN, DATE_PATTERNS, INVOICE_PATTERN)
+
+TOKENS = ['Invoice', 'INVOICE', 'Invoice No.', 'Inv. No.', 'Inv No', 'Total', 'Grand Total', 'TOTAL:',
+          'Amount', 'Invoice Total:', '₹', 'Vendor:', 'Omega Inc', 'Beta Traders', 'Date:', '2024-08-10',
+          '2024-13-45', '10/08/2024', '31/02/2024', '10 August 2024', '10-Aug-2024', '5 Foo 2024',
+          '1,234.50', '5000', '12.', ',', '.5', 'INV-2024-001', 'x/y_z', ':', '  ', '\n', '\r\n', '\x0c',
+          '12024-08-10', 'a2024-08-10', '1/10/08/2024', 'Grand  Total', 'AMOUNT₹5', 'inv-', '-', '/', 'İnv']
+
+
+def legacy_parse_text_fields(text):
+    # the original implementation
+    res = {'vendor': None, 'invoice_no': None, 'date': None, 'amount': None}
+    lines = [l.strip() for l in text.splitlines() if l.strip()]
+    if lines:
+        res['vendor'] = lines[0][:60]
+    m = re.search(INVOICE_PATTERN, text, flags=re.IGNORECASE)
+    if m:
+        res['invoice_no'] = m.group(2)
+    for pat in DATE_PATTERNS:
+        m = re.search(pat, text)
+        if m:
+            date_str = m.group(1)
+            try:
+                if '-' in date_str:
+                    parsed = datetime.strptime(date_str, '%Y-%m-%d')
+                elif '/' in date_str:
+                    parsed = datetime.strptime(date_str, '%d/%m/%Y')
+                else:
+                    parsed = datetime.strptime(date_str, '%d %B %Y')
+                res['date'] = parsed.strftime('%Y-%m-%d')
+                break
+            except Exception:
+                continue
+    m = re.search(AMOUNT_PATTERN, text, flags=re.IGNORECASE)
+    if m:
+        amt = m.group(2).replace(',', '')
+        try:
+            res['amount'] = float(amt)
+        except ValueError:
+            pass
+    else:
+        floats = []
+        for n in re.findall(r"\b[0-9,]+\.?[0-9]*\b", text):
+            try:
+                floats.append(float(n.replace(',', '')))
+            except ValueError:
+                pass
+        if floats:
+            res['amount'] = float(max(floats))
+    return res
+
+
+def random_texts(n, seed=0):
+    rng = random.Random(seed)
+    for _ in range(n):
+        yield ''.join(rng.choice(TOKENS) + rng.choice([' ', '', '\n', ': ']) for _ in range(rng.randint(0, 30)))
+
+
+def span(m):
+    return None if m is None else (m.span(), m.groups())
+
+
+def test_anchored_search_matches_re_search():
+    searches = [(_INVOICE_RE, _INVOICE_ANCHORS, True), (_AMOUNT_RE, _AMOUNT_ANCHORS, True)]
+    searches += [(regex, anchors, False) for regex, anchors in zip(_DATE_RES, _DATE_ANCHORS)]
+    for text in random_texts(5000):
+        for regex, anchors, fold in searches:
+            folded = (text.lower() if text.isascii() else None) if fold else text
+            assert span(_anchored_search(regex, text, folded, anchors)) == span(regex.search(text)), text
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_parse_text_fields_matches_legacy(seed):
+    for text in random_texts(5000, seed):
+        assert _parse_text_fields(text) == legacy_parse_text_fields(text), text
+
+
+def test_invoice_like_text():
+    text = ('Omega Inc\nINVOICE\nInvoice Number: INV-2024-007\nDate: 10/08/2024\n'
+            'Item 1  Consulting  3  $125.00  $375.00\nDue Date: 2024-09-10\nGrand Total: 12,375.00')
+    assert _parse_text_fields(text) == legacy_parse_text_fields(text)
+    assert _parse_text_fields(text)['date'] == '2024-09-10'  # ISO dates take priority, as before
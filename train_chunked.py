@@ -0,0 +1,285 @@
+# train_chunked.py
+# Out-of-core training for histories that do not fit comfortably in RAM: the
+# CSV/Parquet file is streamed in chunks and the feature matrix lives in
+# memory-mapped float32 .npy files under a work directory.
+import os
+import math
+import resource
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from history_store import is_store, iter_history_batches
+from dedup import DuplicateIndex, key_arrays, duplicate_features_from_keys
+from features_extraction import FEATURE_COLS, build_feature_matrix
+from vendor_stats import VendorStatsStore
+from vendor_resolver import VendorResolver
+from velocity import VelocityTracker, velocity_features_from_arrays
+
+DEFAULT_WORK_DIR = 'data/train_work'
+# rough peak bytes per row of a pandas chunk while its features are built
+CHUNK_ROW_BYTES = 1024
+# per-row peak bytes of the duplicate/velocity history features (keys, sort
+# orders, composite keys); rows are processed in vendor buckets sized to the budget
+HISTORY_ROW_BYTES = 400
+# per-row bytes of a forest fit block: float32 features plus sklearn's sample
+# indices, weights and labels
+FIT_ROW_BYTES = 4 * len(FEATURE_COLS) + 64
+_GOLDEN = 0x9E3779B97F4A7C15
+
+# per-row key columns written in the first pass: name -> dtype
+KEY_COLUMNS = {
+    'vendor': np.uint64,
+    'exact': np.uint64,
+    'has_no': np.bool_,
+    'near': np.uint64,
+    'day': np.int64,
+    'dated': np.bool_,
+    'amount': np.float64,
+    'label': np.int8,
+}
+
+
+def peak_rss_mb():
+    # peak resident set size of this process so far (ru_maxrss is KiB on Linux)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def iter_history(path, chunk_rows, start=None, end=None):
+    # DataFrame chunks of a .csv or .parquet invoice history, or of a history_store
+    # directory (the only source that takes a start/end date range)
+    if is_store(path):
+        yield from iter_history_batches(path, chunk_rows, start=start, end=end)
+    elif path.lower().endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows)
+
+
+def _column_path(work_dir, name):
+    return os.path.join(work_dir, f'{name}.bin')
+
+
+def _first_pass(path, chunk_rows, work_dir, start, end):
+    # vendor names, vendor statistics, the velocity tracker and per-row key
+    # columns (appended to raw files in work_dir); returns (resolver, store, tracker, n_rows)
+    resolver = VendorResolver()
+    store = VendorStatsStore()
+    tracker = VelocityTracker()
+    files = {name: open(_column_path(work_dir, name), 'wb') for name in KEY_COLUMNS}
+    n = 0
+    try:
+        for chunk in iter_history(path, chunk_rows, start, end):
+            chunk['vendor'] = resolver.normalize_many(chunk['vendor'])
+            store.update_many(chunk['vendor'], chunk['amount'])
+            tracker.update_from_dataframe(chunk)
+            keys = key_arrays(chunk)
+            keys['amount'] = chunk['amount'].to_numpy(dtype=np.float64)
+            keys['label'] = chunk['label'].to_numpy() if 'label' in chunk.columns else np.zeros(len(chunk))
+            for name, dtype in KEY_COLUMNS.items():
+                np.asarray(keys[name], dtype=dtype).tofile(files[name])
+            n += len(chunk)
+    finally:
+        for f in files.values():
+            f.close()
+    return resolver, store, tracker, n
+
+
+def _load_keys(work_dir, n):
+    return {name: np.memmap(_column_path(work_dir, name), dtype=dtype, mode='r', shape=(n,))
+            for name, dtype in KEY_COLUMNS.items()}
+
+
+def _vendor_buckets(vendor, n_buckets, chunk_rows):
+    # row indices per vendor-hash bucket, scanning the memmapped column in chunks;
+    # every history feature compares a row only with rows of the same vendor, so
+    # buckets can be processed independently
+    if n_buckets == 1:
+        yield np.arange(len(vendor))
+        return
+    for b in range(n_buckets):
+        parts = [start + np.flatnonzero(np.asarray(vendor[start:start + chunk_rows]) % np.uint64(n_buckets) == b)
+                 for start in range(0, len(vendor), chunk_rows)]
+        yield np.concatenate(parts)
+
+
+def _history_features(keys, X, budget, chunk_rows):
+    # duplicate + velocity history features into X[:, 5:], one vendor bucket at a time
+    n_buckets = max(1, math.ceil(len(X) * HISTORY_ROW_BYTES / budget))
+    for rows in _vendor_buckets(keys['vendor'], n_buckets, chunk_rows):
+        sub = {name: np.asarray(col[rows]) for name, col in keys.items()}
+        X[rows, 5:7] = duplicate_features_from_keys(sub)
+        vendor_codes, _ = pd.factorize(sub['vendor'])
+        X[rows, 7:] = velocity_features_from_arrays(vendor_codes, sub['day'], sub['amount'])
+    return n_buckets
+
+
+def _row_hash(rows, seed):
+    # splitmix64 of (row index, seed): a fixed pseudo-random order of the rows
+    z = rows.astype(np.uint64) * np.uint64(_GOLDEN) + np.uint64((seed + 1) * _GOLDEN % 2**64)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def _split_chunks(labels, chunk_rows, test_size, seed):
+    # (first row, is-train mask) per chunk of the label column: a stratified
+    # train/test split computed chunk by chunk. After every chunk,
+    # round(test_size * rows seen so far) rows of each class are test rows; the
+    # ones taken from a chunk are those with the lowest _row_hash. The split
+    # only depends on the labels and the seed, so every pass gets the same one.
+    seen, tested = {}, {}
+    for offset in range(0, len(labels), chunk_rows):
+        y = np.asarray(labels[offset:offset + chunk_rows])
+        order = _row_hash(np.arange(offset, offset + len(y)), seed)
+        is_train = np.ones(len(y), dtype=bool)
+        for c in np.unique(y):
+            rows = np.flatnonzero(y == c)
+            seen[c] = seen.get(c, 0) + len(rows)
+            k = min(len(rows), math.floor(test_size * seen[c] + 0.5) - tested.get(c, 0))
+            tested[c] = tested.get(c, 0) + k
+            is_train[rows[np.argsort(order[rows], kind='stable')[:k]]] = False
+        yield offset, is_train
+
+
+def _class_counts(y, chunk_rows):
+    # {class: rows} of a memory-mapped label column, counted chunk by chunk
+    counts = {}
+    for offset in range(0, len(y), chunk_rows):
+        classes, n = np.unique(np.asarray(y[offset:offset + chunk_rows]), return_counts=True)
+        for c, k in zip(classes.tolist(), n.tolist()):
+            counts[c] = counts.get(c, 0) + k
+    return counts
+
+
+def _fit_forest(clf, X_train, y_train, budget_bytes):
+    # fit in one go when the training rows fit the budget, otherwise grow the
+    # forest with warm_start over strided row blocks (every k-th row, so each
+    # block samples the whole file), n_estimators split evenly across blocks
+    n = len(X_train)
+    block_rows = max(1, budget_bytes // FIT_ROW_BYTES)
+    n_blocks = math.ceil(n / block_rows)
+    if n_blocks <= 1:
+        clf.fit(np.asarray(X_train), np.asarray(y_train))
+        return clf
+    if clf.class_weight == 'balanced':
+        # 'balanced' would be recomputed per block; fix the weights from all rows
+        # (sklearn's formula: n_samples / (n_classes * class count))
+        counts = _class_counts(y_train, block_rows)
+        clf.set_params(class_weight={c: n / (len(counts) * k) for c, k in counts.items()})
+    total = clf.n_estimators
+    per_block = [total // n_blocks + (1 if b < total % n_blocks else 0) for b in range(n_blocks)]
+    clf.set_params(warm_start=True, n_estimators=0)
+    for b, k in enumerate(per_block):
+        if k == 0:
+            continue
+        clf.set_params(n_estimators=clf.n_estimators + k)
+        clf.fit(np.ascontiguousarray(X_train[b::n_blocks]), np.asarray(y_train[b::n_blocks]))
+        print(f'  block {b + 1}/{n_blocks}: {clf.n_estimators} trees, peak RSS {peak_rss_mb():,.0f} MB')
+    clf.set_params(warm_start=False)
+    return clf
+
+
+def _chunked_accuracy(clf, X, y, chunk_rows):
+    correct = 0
+    for offset in range(0, len(X), chunk_rows):
+        correct += int((clf.predict(X[offset:offset + chunk_rows]) == y[offset:offset + chunk_rows]).sum())
+    return correct / len(X) if len(X) else float('nan')
+
+
+def train_chunked(path, clf, memory_budget_mb=1024, work_dir=DEFAULT_WORK_DIR, chunk_rows=None,
+                  test_size=0.2, random_state=42, start=None, end=None):
+    """Train clf on the history at path without loading it whole.
+
+    1. stream the file: vendor stats, velocity tracker and compact per-row
+       key columns (hashes, day numbers, amounts, labels) on disk;
+    2. duplicate and velocity history features from the key columns, in
+       vendor buckets small enough for the budget;
+    3. stream again: per-row features into a float32 memmap;
+    4. StandardScaler.partial_fit over the memmap, then scaled train/test
+       rows and their int8 labels into more memmaps (the stratified split is
+       derived chunk by chunk, see _split_chunks);
+    5. fit the forest, in warm-start blocks if the training rows exceed the budget.
+
+    The budget bounds the data-sized working memory on top of the
+    interpreter's baseline; chunk_rows defaults to what fits it. Not counted
+    in it: the returned DuplicateIndex, which holds every row's duplicate
+    keys (~32 bytes per row) in memory because it is the scoring-time
+    artifact, and the per-vendor stores and tracker. Peak RSS is
+    printed after every phase; it includes pages of the memory-mapped files,
+    which the OS can drop under pressure. The work_dir files are overwritten
+    on every run. start/end restrict a history_store directory to a date
+    range. Vendor spellings are merged by VendorResolver.normalize_many as
+    they stream in. Returns (stats dict, VendorStatsStore, DuplicateIndex,
+    VelocityTracker, fitted scaler, fitted clf, VendorResolver).
+    """
+    if isinstance(clf.class_weight, str) and clf.class_weight != 'balanced':
+        # 'balanced_subsample' weighs each tree's bootstrap sample, which a block
+        # fit would draw from one block only instead of all training rows
+        raise ValueError(f'chunked training supports class_weight="balanced", None or a dict, '
+                         f'not {clf.class_weight!r}')
+    budget = int(memory_budget_mb * 2**20)
+    chunk_rows = chunk_rows or max(1000, budget // CHUNK_ROW_BYTES)
+    os.makedirs(work_dir, exist_ok=True)
+    print(f'baseline RSS {peak_rss_mb():,.0f} MB, working budget {memory_budget_mb:,} MB')
+
+    resolver, store, tracker, n = _first_pass(path, chunk_rows, work_dir, start, end)
+    print(f'[1/5] scanned {n:,} rows in chunks of {chunk_rows:,}; peak RSS {peak_rss_mb():,.0f} MB')
+
+    keys = _load_keys(work_dir, n)
+    X = np.lib.format.open_memmap(os.path.join(work_dir, 'features.npy'), mode='w+',
+                                  dtype=np.float32, shape=(n, len(FEATURE_COLS)))
+    n_buckets = _history_features(keys, X, budget, chunk_rows)
+    # the index itself holds every key (~32 bytes per row) - it is the scoring-time
+    # artifact, kept in memory outside the budget
+    dedup_index = DuplicateIndex.from_keys(keys)
+    labels = keys['label']  # int8 memmap
+    del keys
+    print(f'[2/5] duplicate + velocity history features in {n_buckets} vendor bucket(s); '
+          f'peak RSS {peak_rss_mb():,.0f} MB')
+
+    stats = store.to_stats()
+    row = 0
+    for chunk in iter_history(path, chunk_rows, start, end):
+        stop = row + len(chunk)
+        chunk['vendor'] = resolver.normalize_many(chunk['vendor'])  # same names as in the first pass
+        X[row:stop] = build_feature_matrix(chunk, stats, dtype=np.float32,
+                                           duplicates=X[row:stop, 5:7], velocity=X[row:stop, 7:])
+        row = stop
+    X.flush()
+    print(f'[3/5] feature memmap {X.nbytes / 2**20:,.0f} MB; peak RSS {peak_rss_mb():,.0f} MB')
+
+    scaler = StandardScaler()
+    for offset in range(0, n, chunk_rows):
+        scaler.partial_fit(X[offset:offset + chunk_rows])
+    n_train = sum(int(mask.sum()) for _, mask in _split_chunks(labels, chunk_rows, test_size, random_state))
+
+    def memmap(name, dtype, rows, width=None):
+        return np.lib.format.open_memmap(os.path.join(work_dir, name), mode='w+', dtype=dtype,
+                                         shape=(rows,) if width is None else (rows, width))
+
+    X_train = memmap('train.npy', np.float32, n_train, X.shape[1])
+    y_train = memmap('train_labels.npy', np.int8, n_train)
+    X_test = memmap('test.npy', np.float32, n - n_train, X.shape[1])
+    y_test = memmap('test_labels.npy', np.int8, n - n_train)
+    tr = te = 0
+    for offset, mask in _split_chunks(labels, chunk_rows, test_size, random_state):
+        block = scaler.transform(X[offset:offset + len(mask)])
+        y = np.asarray(labels[offset:offset + len(mask)])
+        k_train, k_test = int(mask.sum()), int((~mask).sum())
+        X_train[tr:tr + k_train], y_train[tr:tr + k_train] = block[mask], y[mask]
+        X_test[te:te + k_test], y_test[te:te + k_test] = block[~mask], y[~mask]
+        tr += k_train
+        te += k_test
+    del X, labels
+    print(f'[4/5] scaled {n_train:,} train / {n - n_train:,} test rows; peak RSS {peak_rss_mb():,.0f} MB')
+
+    print('Training model...')
+    _fit_forest(clf, X_train, y_train, budget // 2)
+    print(f'[5/5] forest fitted; peak RSS {peak_rss_mb():,.0f} MB')
+    print('Train acc:', _chunked_accuracy(clf, X_train, y_train, chunk_rows))
+    print('Test acc:', _chunked_accuracy(clf, X_test, y_test, chunk_rows))
+    return stats, store, dedup_index, tracker, scaler, clf, resolver.compact()
@@ -0,0 +1,88 @@
+# tree_explainer.py
+# Per-feature explanations of the fraud forest's probabilities: path-based tree
+# contributions (Saabas). Walking from a tree's root to the leaf an invoice lands
+# in, every split moves the predicted fraud share from the parent node's value to
+# the child's; that change is credited to the split's feature. Averaged over the
+# trees, baseline + sum(contributions) == predict_proba of the invoice.
+# Written by model_train.py as explainer.pkl; used by scoring.explain_features.
+import numpy as np
+
+
+class TreeExplainer:
+    """Precomputed path contributions of every leaf of a fitted forest.
+
+    Built once from the trees' node arrays: contributions are pushed down one
+    tree level at a time for all trees together, and each leaf keeps the
+    per-feature sum along its root path. Explaining rows is then a gather of
+    their leaves' vectors, averaged over the trees. Leaves are global node ids
+    with the trees concatenated in order - what CompactForest.apply returns,
+    or sklearn's model.apply plus tree_offsets.
+    """
+
+    def __init__(self, leaf_contributions, leaf_rows, tree_offsets, baseline, feature_names=None):
+        self.leaf_contributions = leaf_contributions  # (n_leaves, n_features) fraud-share change per feature
+        self.leaf_rows = leaf_rows                    # global node id -> row of leaf_contributions (-1: not a leaf)
+        self.tree_offsets = tree_offsets              # global id of each tree's root
+        self.baseline = baseline                      # mean root value: the forest's prior fraud share
+        self.feature_names = feature_names
+
+    @property
+    def n_trees(self):
+        return len(self.tree_offsets)
+
+    @property
+    def n_features(self):
+        return self.leaf_contributions.shape[1]
+
+    @classmethod
+    def from_sklearn(cls, model, feature_names=None, positive_class=1):
+        # model: fitted RandomForestClassifier (or any forest of sklearn decision trees)
+        lefts, rights, features, values, offsets = [], [], [], [], []
+        offset = 0
+        for est in model.estimators_:
+            tree = est.tree_
+            leaf = tree.children_left < 0
+            lefts.append(np.where(leaf, -1, tree.children_left + offset))
+            rights.append(np.where(leaf, -1, tree.children_right + offset))
+            features.append(np.where(leaf, -1, tree.feature))
+            value = tree.value[:, 0, :]
+            total = value.sum(axis=1)
+            # nodes without weight (class_weight / sample weights) count as a fraud share of 0
+            values.append(value[:, positive_class] / np.where(total > 0, total, 1))
+            offsets.append(offset)
+            offset += tree.node_count
+        left, right = np.concatenate(lefts), np.concatenate(rights)
+        feature, value = np.concatenate(features), np.concatenate(values)
+        roots = np.array(offsets, dtype=np.int64)
+        n_features = int(model.n_features_in_)
+
+        contrib = np.zeros((len(value), n_features))
+        frontier = roots
+        while len(frontier):
+            parents = frontier[left[frontier] >= 0]
+            for children in (left[parents], right[parents]):
+                contrib[children] = contrib[parents]
+                contrib[children, feature[parents]] += value[children] - value[parents]
+            frontier = np.concatenate([left[parents], right[parents]])
+
+        leaves = np.flatnonzero(left < 0)
+        leaf_rows = np.full(len(value), -1, dtype=np.int32)
+        leaf_rows[leaves] = np.arange(len(leaves), dtype=np.int32)
+        return cls(leaf_contributions=np.ascontiguousarray(contrib[leaves]),
+                   leaf_rows=leaf_rows,
+                   tree_offsets=roots,
+                   baseline=float(value[roots].mean()),
+                   feature_names=list(feature_names) if feature_names is not None else None)
+
+    def sklearn_leaves(self, model, X):
+        # (n_trees, n_rows) global leaf ids from the sklearn forest (X as the model sees it, i.e. scaled)
+        return (model.apply(X) + self.tree_offsets).T
+
+    def contributions(self, leaves):
+        # (n_rows, n_features) mean path contribution for a (n_trees, n_rows) array of leaf ids
+        leaves = np.asarray(leaves)
+        total = np.zeros((leaves.shape[1], self.n_features))
+        for tree_leaves in self.leaf_rows[leaves]:
+            total += self.leaf_contributions[tree_leaves]
+        return total / self.n_trees
+
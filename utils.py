@@ -1,21 +1,272 @@
 # utils.py
+import io
 import os
 import json
-from joblib import load
+import time
+import threading
+from collections import namedtuple
+
+import metrics
 
 ARTIFACT_DIR = 'data/model_artifacts'
+ARTIFACT_FILES = ('model.pkl', 'scaler.pkl', 'stats.json')
+# loaded when present; None otherwise
+OPTIONAL_ARTIFACT_FILES = {'dedup_index': 'dedup_index.pkl', 'velocity': 'velocity.pkl',
+                           'compact_model': 'model_compact.pkl', 'vendor_resolver': 'vendor_resolver.pkl',
+                           'explainer': 'explainer.pkl', 'vendor_stats': 'vendor_stats.json'}
+
+# optional artifacts that are plain numpy arrays underneath; they are loaded
+# memory-mapped (copy-on-write) so every process scoring from the same files
+# shares their pages. sklearn's trees copy their node arrays when unpickled, so
+# model.pkl is read normally. INVOICE_ARTIFACT_MMAP=0 turns this off.
+MMAP_ARTIFACTS = frozenset(['dedup_index', 'compact_model', 'vendor_resolver', 'explainer'])
+MMAP_MODE = None if os.environ.get('INVOICE_ARTIFACT_MMAP', '1').lower() in ('0', 'false', 'no', 'off') else 'c'
+
+# written last by model_train.save_artifacts: size + SHA-256 of every file of the set
+MANIFEST_FILE = 'manifest.json'
+
+Artifacts = namedtuple('Artifacts', ['model', 'scaler', 'stats', 'dedup_index', 'velocity', 'compact_model',
+                                     'vendor_resolver', 'explainer', 'vendor_stats', 'signature', 'load_seconds'])
+
+
+class ArtifactSetError(RuntimeError):
+    # the artifact files on disk are not the set their manifest describes
+    pass
+
+
+def _artifact_paths(artifact_dir):
+    # every file of an artifact set, manifest last
+    names = list(ARTIFACT_FILES) + list(OPTIONAL_ARTIFACT_FILES.values()) + [MANIFEST_FILE]
+    return [os.path.join(artifact_dir, name) for name in names]
+
+
+def _file_digest(path):
+    import hashlib
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def write_manifest(artifact_dir=ARTIFACT_DIR):
+    # seal the artifact files now in artifact_dir as one set; call after all of them are written
+    files = {}
+    for p in _artifact_paths(artifact_dir)[:-1]:
+        if os.path.exists(p):
+            files[os.path.basename(p)] = {'size': os.path.getsize(p), 'sha256': _file_digest(p)}
+    atomic_write_json({'files': files, 'written_at': time.time()}, os.path.join(artifact_dir, MANIFEST_FILE),
+                      indent=2)
+
+
+def manifest_matches(artifact_dir=ARTIFACT_DIR):
+    # True when the files on disk are exactly the set manifest.json lists (sizes
+    # first, then contents); also True without a manifest (sets written before
+    # manifests existed are loaded unchecked)
+    manifest_p = os.path.join(artifact_dir, MANIFEST_FILE)
+    try:
+        with open(manifest_p) as f:
+            files = json.load(f)['files']
+    except FileNotFoundError:
+        return True
+    paths = _artifact_paths(artifact_dir)[:-1]
+    try:
+        for p in paths:
+            expected = files.get(os.path.basename(p))
+            if (expected is None) == os.path.exists(p):
+                return False
+            if expected is not None and os.path.getsize(p) != expected['size']:
+                return False
+        return all(_file_digest(p) == files[os.path.basename(p)]['sha256'] for p in paths if os.path.exists(p))
+    except FileNotFoundError:
+        return False
+
+
+def _unwrap_memmaps(obj):
+    # plain ndarray views of an object's np.memmap attributes: same mapped pages,
+    # without the memmap subclass overhead on every small-array operation
+    import numpy as np
+    for name, value in vars(obj).items():
+        if isinstance(value, np.memmap):
+            setattr(obj, name, np.asarray(value))
+    return obj
+
+
+def _load_vendor_stats(path):
+    from vendor_stats import VendorStatsStore
+    return VendorStatsStore.load(path)
+
+
+# optional artifacts that are not joblib files: key -> loader(path)
+ARTIFACT_LOADERS = {'vendor_stats': _load_vendor_stats}
+
+
+def _read_optional_artifacts(artifact_dir, mmap_mode=MMAP_MODE):
+    # mapping is safe against retraining: atomic_dump replaces files by rename,
+    # so a mapped file is never rewritten in place
+    from joblib import load
+    extras = {}
+    for key, name in OPTIONAL_ARTIFACT_FILES.items():
+        p = os.path.join(artifact_dir, name)
+        if not os.path.exists(p):
+            extras[key] = None
+        elif key in ARTIFACT_LOADERS:
+            extras[key] = ARTIFACT_LOADERS[key](p)
+        elif mmap_mode and key in MMAP_ARTIFACTS:
+            extras[key] = _unwrap_memmaps(load(p, mmap_mode=mmap_mode))
+        else:
+            extras[key] = load(p)
+    return extras
 
 
-def load_model_and_artifacts():
-    model_p = os.path.join(ARTIFACT_DIR, 'model.pkl')
-    scaler_p = os.path.join(ARTIFACT_DIR, 'scaler.pkl')
-    stats_p = os.path.join(ARTIFACT_DIR, 'stats.json')
+class _DeferredArtifact:
+    # a joblib artifact whose bytes are read with the rest of its set (so the set
+    # stays consistent across a retrain) but unpickled - importing sklearn - only
+    # when first used; attribute access is forwarded to the loaded object
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._data = f.read()
+        self._obj = None
+        self._lock = threading.Lock()
+
+    def resolve(self):
+        if self._obj is None:
+            with self._lock:
+                if self._obj is None:
+                    from joblib import load
+                    with metrics.span('artifacts.deferred_load'):
+                        self._obj = load(io.BytesIO(self._data))
+                    self._data = None
+        return self._obj
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+
+def _read_artifacts(artifact_dir, defer=False):
+    # defer: unpickle model and scaler on first use (see _DeferredArtifact)
+    from joblib import load
+    model_p, scaler_p, stats_p = _artifact_paths(artifact_dir)[:3]
 
     if not (os.path.exists(model_p) and os.path.exists(scaler_p) and os.path.exists(stats_p)):
         raise FileNotFoundError('Model artifacts not found. Run `python model_train.py` first to generate them.')
 
-    model = load(model_p)
-    scaler = load(scaler_p)
+    read = _DeferredArtifact if defer else load
+    model = read(model_p)
+    scaler = read(scaler_p)
     with open(stats_p, 'r') as f:
         stats = json.load(f)
-    return model, scaler, stats
\ No newline at end of file
+    return model, scaler, stats
+
+
+def artifact_signature(artifact_dir=ARTIFACT_DIR):
+    # (mtime_ns, size) of every artifact file; None for a missing file
+    sig = []
+    for p in _artifact_paths(artifact_dir):
+        try:
+            st = os.stat(p)
+            sig.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            sig.append(None)
+    return tuple(sig)
+
+
+class ArtifactRegistry:
+    """Process-wide holder of the trained model, scaler, stats and optional extras.
+
+    Artifacts are loaded once and reused. get() re-stats the files at most every
+    check_interval seconds and, if model_train.py has written new ones, loads
+    them in full before swapping the reference, so callers always see a
+    consistent set of artifacts - either the old one or the new one. A set is
+    only loaded when its files match manifest.json, which training writes
+    after all of them; while a training run is still replacing files the
+    previous set stays in use (a first load waits briefly, then raises
+    ArtifactSetError). Files in
+    OPTIONAL_ARTIFACT_FILES load as None when absent; MMAP_ARTIFACTS are
+    memory-mapped with mmap_mode (None reads them into memory). When the
+    compact forest export is present, small batches never touch the sklearn
+    model and scaler, so those are only unpickled on first use.
+    """
+
+    def __init__(self, artifact_dir=ARTIFACT_DIR, check_interval=1.0, mmap_mode=MMAP_MODE):
+        self.artifact_dir = artifact_dir
+        self.check_interval = check_interval
+        self.mmap_mode = mmap_mode
+        self.reloads = 0
+        self._artifacts = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        current = self._artifacts
+        now = time.monotonic()
+        if current is not None and now - self._checked_at < self.check_interval:
+            return current
+        with self._lock:
+            current = self._artifacts
+            self._checked_at = time.monotonic()
+            if current is None or artifact_signature(self.artifact_dir) != current.signature:
+                try:
+                    # a reload does not wait: the current set is served until the new one is complete
+                    self._artifacts = self._load(attempts=5 if current is None else 1)
+                except ArtifactSetError:
+                    if current is None:
+                        raise
+                    metrics.incr('artifact_incomplete_sets')
+                    return current
+                metrics.set_gauge('artifact_load_seconds', self._artifacts.load_seconds)
+                if current is not None:
+                    self.reloads += 1
+                    metrics.incr('artifact_reloads')
+            return self._artifacts
+
+    @metrics.timed('artifacts.load')
+    def _load(self, attempts=5):
+        # retry if the files change while being read (training run finishing mid-load)
+        for attempt in range(attempts):
+            if attempt:
+                time.sleep(0.1)
+            before = artifact_signature(self.artifact_dir)
+            t0 = time.perf_counter()
+            if not manifest_matches(self.artifact_dir):
+                continue
+            extras = _read_optional_artifacts(self.artifact_dir, self.mmap_mode)
+            model, scaler, stats = _read_artifacts(self.artifact_dir, defer=extras['compact_model'] is not None)
+            elapsed = time.perf_counter() - t0
+            if artifact_signature(self.artifact_dir) == before:
+                return Artifacts(model, scaler, stats, signature=before, load_seconds=elapsed, **extras)
+        raise ArtifactSetError(f'artifacts in {self.artifact_dir} do not match {MANIFEST_FILE} '
+                               '(a training run is writing them, or one was interrupted: retrain)')
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(artifact_dir=ARTIFACT_DIR):
+    with _registries_lock:
+        if artifact_dir not in _registries:
+            _registries[artifact_dir] = ArtifactRegistry(artifact_dir)
+        return _registries[artifact_dir]
+
+
+def load_model_and_artifacts(artifact_dir=ARTIFACT_DIR):
+    # cached: the files are read once per process and again only when they change
+    artifacts = get_registry(artifact_dir).get()
+    return artifacts.model, artifacts.scaler, artifacts.stats
+
+
+def atomic_dump(obj, path):
+    # joblib.dump via a temp file + rename so readers never see a half-written artifact
+    # (uncompressed, so numpy arrays inside can be memory-mapped on load)
+    from joblib import dump
+    tmp = f'{path}.tmp-{os.getpid()}'
+    dump(obj, tmp)
+    os.replace(tmp, path)
+
+
+def atomic_write_json(obj, path, **kwargs):
+    tmp = f'{path}.tmp-{os.getpid()}'
+    with open(tmp, 'w') as f:
+        json.dump(obj, f, **kwargs)
+    os.replace(tmp, path)
@@ -0,0 +1,174 @@
+# velocity.py
+# Vendor velocity features: invoices in the last 7/30 days, amount billed in the
+# last 30 days and days since the vendor's previous invoice.
+import numpy as np
+import pandas as pd
+
+from dedup import NO_DAY, day_number, day_numbers, normalize_vendor
+
+WINDOWS = (7, 30)        # count windows in days; the amount sum uses the longest
+RING_DAYS = max(WINDOWS)
+NO_PREV = -1             # days_since_prev for a vendor's first invoice (or no date)
+VELOCITY_COLS = ['vendor_invoices_7d', 'vendor_invoices_30d', 'vendor_amount_30d', 'days_since_prev_invoice']
+
+
+def _vendor_keys(vendors):
+    # (codes, normalized names) with normalize_vendor applied once per distinct vendor
+    codes, uniques = pd.factorize(pd.Series(vendors, dtype=object))
+    names, merged = pd.factorize(pd.Series([normalize_vendor(u) for u in uniques] + [''], dtype=object))
+    return names[codes], merged.to_numpy()
+
+
+def _empty_features(n):
+    out = np.zeros((n, len(VELOCITY_COLS)), dtype=np.float64)
+    out[:, -1] = NO_PREV
+    return out
+
+
+def historical_velocity_features(df):
+    """Training-time velocity features: for each row, over the same vendor's *earlier* rows.
+
+    Rows are ordered by (vendor, date, file order) and every window is a
+    searchsorted over one composite vendor/day key, with amount sums taken
+    from a cumulative sum. Window w covers the days (day - w, day]. Matches
+    VelocityTracker.query + add applied to the rows one at a time in date order.
+    """
+    codes, _ = _vendor_keys(df['vendor'].to_numpy())
+    return velocity_features_from_arrays(codes, day_numbers(df['date'].to_numpy()),
+                                         df['amount'].to_numpy(dtype=np.float64))
+
+
+def velocity_features_from_arrays(vendor_codes, day, amount):
+    # historical_velocity_features on per-row integer vendor codes (equal codes =
+    # same vendor), day numbers (NO_DAY = undated) and amounts
+    out = _empty_features(len(day))
+    dated = day != NO_DAY
+    if not dated.any():
+        return out
+
+    rows = np.flatnonzero(dated)
+    codes = np.asarray(vendor_codes)[dated]
+    d = day[dated] - day[dated].min()
+    amount = np.nan_to_num(np.asarray(amount, dtype=np.float64)[dated])
+
+    srt = np.lexsort((rows, d, codes))
+    span = int(d.max()) + RING_DAYS + 2
+    composite = codes[srt].astype(np.int64) * span + d[srt]
+    pos = np.arange(len(srt))
+    target = rows[srt]
+
+    for j, w in enumerate(WINDOWS):
+        out[target, j] = pos - np.searchsorted(composite, composite - w + 1, side='left')
+
+    csum = np.concatenate([[0.0], np.cumsum(amount[srt])])
+    first = np.searchsorted(composite, composite - RING_DAYS + 1, side='left')
+    out[target, len(WINDOWS)] = csum[pos] - csum[first]
+
+    same_vendor = np.zeros(len(srt), dtype=bool)
+    same_vendor[1:] = codes[srt][1:] == codes[srt][:-1]
+    gap = np.empty(len(srt), dtype=np.float64)
+    gap[0] = NO_PREV
+    gap[1:] = np.diff(d[srt])
+    out[target, -1] = np.where(same_vendor, gap, NO_PREV)
+    return out
+
+
+class _VendorRing:
+    # per-day invoice counts and amount sums for one vendor, slot = day % RING_DAYS;
+    # a slot is reused (reset) when a newer day maps onto it
+    __slots__ = ('days', 'counts', 'sums', 'last_day')
+
+    def __init__(self):
+        self.days = [NO_DAY] * RING_DAYS
+        self.counts = [0] * RING_DAYS
+        self.sums = [0.0] * RING_DAYS
+        self.last_day = NO_DAY
+
+    def add(self, day, amount, count=1):
+        if self.last_day != NO_DAY and day <= self.last_day - RING_DAYS:
+            return  # already outside every window
+        slot = day % RING_DAYS
+        if self.days[slot] != day:
+            self.days[slot], self.counts[slot], self.sums[slot] = day, 0, 0.0
+        self.counts[slot] += count
+        self.sums[slot] += amount
+        self.last_day = max(self.last_day, day)
+
+    def query(self, day):
+        counts = [0] * len(WINDOWS)
+        total = 0.0
+        prev = NO_DAY
+        for d, c, s in zip(self.days, self.counts, self.sums):
+            if d == NO_DAY or d > day:
+                continue
+            age = day - d
+            for j, w in enumerate(WINDOWS):
+                if age < w:
+                    counts[j] += c
+            if age < RING_DAYS:
+                total += s
+            prev = max(prev, d)
+        return counts + [total, day - prev if prev != NO_DAY else NO_PREV]
+
+
+class VelocityTracker:
+    """Online counterpart of historical_velocity_features.
+
+    Keeps a fixed RING_DAYS-slot ring buffer of per-day counts and amount sums
+    for each vendor, so add() and query() cost the same however long the
+    history is. Invoices dated more than RING_DAYS before the vendor's latest
+    one no longer affect the windows.
+    """
+
+    def __init__(self):
+        self._vendors = {}
+
+    def __len__(self):
+        return len(self._vendors)
+
+    @classmethod
+    def from_dataframe(cls, df):
+        return cls().update_from_dataframe(df)
+
+    def update_from_dataframe(self, df):
+        # fold in a batch of history, aggregated per vendor and day; batches may
+        # arrive in any date order (a ring slot only ever gives way to a newer day
+        # RING_DAYS later, which has pushed the older one out of every window)
+        day = day_numbers(df['date'].to_numpy())
+        dated = day != NO_DAY
+        codes, names = _vendor_keys(df['vendor'].to_numpy()[dated])
+        daily = pd.DataFrame({
+            'vendor': codes,
+            'day': day[dated],
+            'amount': np.nan_to_num(df['amount'].to_numpy(dtype=np.float64)[dated]),
+        }).groupby(['vendor', 'day'], sort=True)['amount'].agg(['count', 'sum']).reset_index()
+        latest = daily.groupby('vendor')['day'].transform('max')
+        daily = daily[daily['day'] > latest - RING_DAYS]
+        for vendor, d, c, s in zip(daily['vendor'], daily['day'], daily['count'], daily['sum']):
+            self._ring(names[vendor]).add(int(d), float(s), int(c))
+        return self
+
+    def _ring(self, vendor):
+        ring = self._vendors.get(vendor)
+        if ring is None:
+            ring = self._vendors[vendor] = _VendorRing()
+        return ring
+
+    def add(self, vendor, date, amount):
+        day = day_number(date) if date is not None else NO_DAY
+        if day != NO_DAY:
+            amount = 0.0 if amount is None or amount != amount else float(amount)
+            self._ring(normalize_vendor(vendor)).add(day, amount)
+
+    def query(self, vendor, date):
+        # [count per window..., amount sum over RING_DAYS, days since previous invoice]
+        day = day_number(date) if date is not None else NO_DAY
+        ring = self._vendors.get(normalize_vendor(vendor))
+        if day == NO_DAY or ring is None:
+            return [0] * len(WINDOWS) + [0.0, NO_PREV]
+        return ring.query(day)
+
+    def query_many(self, records):
+        # records: parsed invoice dicts; returns an (n, len(VELOCITY_COLS)) array
+        return np.array([self.query(r.get('vendor'), r.get('date')) for r in records],
+                        dtype=np.float64).reshape(-1, len(VELOCITY_COLS))
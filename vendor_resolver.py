@@ -0,0 +1,285 @@
+# vendor_resolver.py
+# Vendor name resolution: maps parsed vendor strings ("BETA TRADERS PVT. LTD.",
+# "Beta Tradres") onto the vendor names the model's history and statistics use.
+#  - canonical_vendor: case, punctuation, legal-form suffixes and document titles removed
+#  - VendorResolver: exact lookup by canonical key, then the closest known key
+#    from a trigram inverted index, accepted only when it is a near-exact spelling
+#    whose words and numbers agree (an unseen vendor must stay unresolved)
+# Usage: python vendor_resolver.py "Beta Traders Pvt Ltd" "INVOICE" ...
+import math
+import re
+import argparse
+import itertools
+import numpy as np
+import pandas as pd
+
+import metrics
+from dedup import normalize_vendor
+
+# edit similarity (1 - edits / longer key length) a fuzzy match must reach
+DEFAULT_MIN_SIMILARITY = 0.85
+# trigram Dice similarity of the keys verified as fuzzy-match candidates, and how many
+CANDIDATE_SIMILARITY = 0.5
+MAX_CANDIDATES = 16
+DEFAULT_CACHE_SIZE = 100_000
+# delta vendors scanned directly before compact() is worth it
+MAX_DELTA = 256
+# legal-form tokens dropped from the end of a name
+LEGAL_FORMS = frozenset(['pvt', 'private', 'ltd', 'limited', 'llc', 'llp', 'lp', 'inc', 'incorporated', 'corp',
+                         'corporation', 'co', 'company', 'plc', 'gmbh', 'ag', 'sa', 'bv', 'pte', 'pty'])
+# first lines of an invoice that are document titles rather than vendor names
+NON_VENDORS = frozenset(['invoice', 'tax invoice', 'invoice copy', 'original invoice', 'commercial invoice',
+                         'proforma invoice', 'pro forma invoice', 'bill', 'bill of supply', 'receipt', 'statement',
+                         'credit note', 'debit note', 'quotation', 'purchase order', 'unknown'])
+_MISSING = object()
+
+
+def canonical_vendor(name):
+    # "The Beta Traders Pvt. Ltd." / "M/s Beta Traders" -> "beta traders";
+    # '' for a missing name or a document title
+    if isinstance(name, str):
+        name = name.replace('&', ' and ')
+    tokens = normalize_vendor(name).split()
+    while len(tokens) > 1 and tokens[-1] in LEGAL_FORMS:
+        tokens.pop()
+    if len(tokens) > 1 and tokens[0] == 'the':
+        tokens = tokens[1:]
+    if len(tokens) > 2 and tokens[:2] == ['m', 's']:
+        tokens = tokens[2:]
+    key = ' '.join(tokens)
+    return '' if key in NON_VENDORS else key
+
+
+def _trigrams(key):
+    padded = f'  {key} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a, b):
+    # Levenshtein distance counting an adjacent transposition as one edit
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+def _typo_budget(length):
+    # edits a word of this length may differ by and still be the same word:
+    # none for short words ("zeta" is not "beta"), one up to 8 letters, then two
+    return 0 if length <= 4 else 1 if length <= 8 else 2
+
+
+def _same_vendor(key, other):
+    # whether two different keys can be spellings of the same vendor: the digit
+    # runs are identical and every word is within its typo budget of the word in
+    # the same position (or, with different word counts, only spaces differ)
+    if re.findall(r'\d+', key) != re.findall(r'\d+', other):
+        return False
+    words, other_words = key.split(), other.split()
+    if len(words) != len(other_words):
+        return key.replace(' ', '') == other.replace(' ', '')
+    return all(a == b or _edit_distance(a, b) <= _typo_budget(max(len(a), len(b)))
+               for a, b in zip(words, other_words))
+
+
+def _edit_similarity(key, other):
+    return 1.0 - _edit_distance(key, other) / max(len(key), len(other))
+
+
+class VendorResolver:
+    """Resolves raw vendor strings to known vendor names.
+
+    Every known vendor is stored under its canonical_vendor key, with the first
+    spelling seen as its display name. A key seen before resolves by dict
+    lookup; any other key is matched against a trigram inverted index over the
+    known keys (trigram -> ids, in flat CSR arrays). The MAX_CANDIDATES keys
+    with the highest Dice similarity (at least CANDIDATE_SIMILARITY) are then
+    verified: a candidate is accepted only if its digits and words agree
+    (_same_vendor) and its edit similarity reaches min_similarity, so
+    "Beta Tradres" resolves to "Beta Traders" while "Zeta Traders" or
+    "Vendor 09999" stay unresolved. Vendors added after the index was built sit
+    in a short delta list that is scanned directly until compact() folds it
+    into the arrays. Results are cached per raw string. min_similarity is not
+    pickled: a loaded resolver uses the current DEFAULT_MIN_SIMILARITY.
+    """
+
+    def __init__(self, min_similarity=None, cache_size=DEFAULT_CACHE_SIZE):
+        self.min_similarity = min_similarity  # None: DEFAULT_MIN_SIMILARITY
+        self.cache_size = cache_size
+        self._names = []     # id -> display name
+        self._keys = []      # id -> canonical key
+        self._ids = {}       # canonical key -> id
+        self._gram_rows = {}  # trigram -> row of _offsets
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._postings = np.empty(0, dtype=np.int32)
+        self._sizes = np.empty(0, dtype=np.int32)  # trigram count per indexed id
+        self._indexed = 0    # ids below this are in the arrays
+        self._cache = {}
+
+    def __len__(self):
+        return len(self._names)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_cache'] = {}
+        state['min_similarity'] = None
+        return state
+
+    def __setstate__(self, state):
+        # resolvers pickled with a fixed threshold use the current default too
+        self.__dict__.update(state, min_similarity=None)
+
+    @property
+    def threshold(self):
+        return DEFAULT_MIN_SIMILARITY if self.min_similarity is None else self.min_similarity
+
+    @property
+    def names(self):
+        return list(self._names)
+
+    def add(self, name):
+        # the display name for `name`, registering it as a new vendor when its key
+        # is new; None for names without a key (missing, document titles)
+        key = canonical_vendor(name)
+        if not key:
+            return None
+        i = self._ids.get(key)
+        if i is None:
+            i = self._ids[key] = len(self._names)
+            self._names.append(str(name).strip())
+            self._keys.append(key)
+            self._cache.clear()  # cached fuzzy matches and misses may change
+        return self._names[i]
+
+    def normalize_many(self, names):
+        # training-time batch mode: every name -> its vendor's display name,
+        # registering new vendors; names without a key are kept as they are
+        codes, uniques = pd.factorize(pd.Series(names, dtype=object))
+        mapped = [self.add(u) or u for u in uniques]
+        return np.array(mapped + [None], dtype=object)[codes]
+
+    def compact(self):
+        # rebuild the trigram arrays over every known vendor
+        grams = {}
+        sizes = np.empty(len(self._keys), dtype=np.int32)
+        for i, key in enumerate(self._keys):
+            key_grams = _trigrams(key)
+            sizes[i] = len(key_grams)
+            for g in key_grams:
+                grams.setdefault(g, []).append(i)
+        self._gram_rows = {g: row for row, g in enumerate(grams)}
+        self._offsets = np.concatenate([[0], np.cumsum([len(ids) for ids in grams.values()])]).astype(np.int64)
+        self._postings = np.fromiter(itertools.chain.from_iterable(grams.values()), dtype=np.int32,
+                                     count=int(self._offsets[-1]))
+        self._sizes = sizes
+        self._indexed = len(self._keys)
+        return self
+
+    def _candidates(self, key):
+        # ids of the known keys with the highest Dice similarity to `key` (at least
+        # CANDIDATE_SIMILARITY), best first, ties by id. Candidates come from the
+        # postings of the query's rarest trigrams only: a key with Dice >= t shares
+        # at least k = ceil(t * q / (2 - t)) of the q query trigrams, so it must
+        # share one of any q - k + 1 of them. Their overlap with the remaining
+        # (common) trigrams is counted by binary search in those sorted postings.
+        if len(self._keys) - self._indexed > MAX_DELTA:
+            self.compact()
+        grams = _trigrams(key)
+        ids, sims = np.empty(0, dtype=np.int64), np.empty(0)
+        rows = np.array([self._gram_rows[g] for g in grams if g in self._gram_rows], dtype=np.int64)
+        t = CANDIDATE_SIMILARITY
+        n_prefix = len(grams) - max(1, math.ceil(t * len(grams) / (2 - t))) + 1 - (len(grams) - len(rows))
+        if n_prefix > 0:
+            offsets, postings = self._offsets, self._postings
+            rows = rows[np.argsort(offsets[rows + 1] - offsets[rows], kind='stable')]
+            ids, shared = np.unique(np.concatenate([postings[offsets[r]:offsets[r + 1]] for r in rows[:n_prefix]]),
+                                    return_counts=True)
+            rest = [postings[offsets[r]:offsets[r + 1]] for r in rows[n_prefix:]]
+            if len(ids) * 8 > sum(len(post) for post in rest):
+                # many candidates: one count over the common postings is cheaper
+                shared += np.bincount(np.concatenate(rest + [ids[:0]]), minlength=self._indexed)[ids]
+            else:
+                for post in rest:
+                    shared += post[np.minimum(np.searchsorted(post, ids), len(post) - 1)] == ids
+            sims = 2.0 * shared / (len(grams) + self._sizes[ids])
+        delta = [(i, 2.0 * len(grams & other) / (len(grams) + len(other)))
+                 for i, other in ((i, _trigrams(self._keys[i])) for i in range(self._indexed, len(self._keys)))]
+        if delta:
+            ids = np.concatenate([ids, [i for i, _ in delta]]).astype(np.int64)
+            sims = np.concatenate([sims, [sim for _, sim in delta]])
+        keep = sims >= t
+        ids, sims = ids[keep], sims[keep]
+        return ids[np.argsort(-sims, kind='stable')[:MAX_CANDIDATES]].tolist()
+
+    def _best_match(self, key):
+        # (id, edit similarity) of the closest candidate that passes _same_vendor;
+        # (None, 0.0) when none does
+        best, best_sim = None, 0.0
+        for i in self._candidates(key):
+            other = self._keys[i]
+            if _same_vendor(key, other):
+                sim = _edit_similarity(key, other)
+                if sim > best_sim:
+                    best, best_sim = i, sim
+        return best, best_sim
+
+    def resolve(self, name):
+        # the known vendor name `name` refers to, or None
+        result = self._cache.get(name, _MISSING)
+        if result is not _MISSING:
+            return result
+        key = canonical_vendor(name)
+        result, kind = None, 'unresolved'
+        if key:
+            i = self._ids.get(key)
+            kind = 'exact'
+            if i is None:
+                i, sim = self._best_match(key)
+                kind = 'fuzzy'
+                if sim < self.threshold:
+                    i, kind = None, 'unresolved'
+            if i is not None:
+                result = self._names[i]
+        metrics.incr('vendor_resolutions', kind=kind)
+        if len(self._cache) >= self.cache_size:
+            self._cache.clear()
+        self._cache[name] = result
+        return result
+
+    def resolve_many(self, names, keep_unresolved=False):
+        # batch resolve(), each distinct name once; with keep_unresolved,
+        # names that match no known vendor are returned unchanged instead of None
+        codes, uniques = pd.factorize(pd.Series(names, dtype=object))
+        resolved = [self.resolve(u) for u in uniques]
+        if keep_unresolved:
+            resolved = [r if r is not None else u for r, u in zip(resolved, uniques)]
+        return np.array(resolved + [None], dtype=object)[codes]
+
+    @classmethod
+    def from_names(cls, names, **kwargs):
+        resolver = cls(**kwargs)
+        resolver.normalize_many(names)
+        return resolver.compact()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Resolve vendor names against the trained model's vendors")
+    ap.add_argument('names', nargs='+')
+    ap.add_argument('--artifacts', default='data/model_artifacts')
+    args = ap.parse_args(argv)
+
+    from utils import get_registry
+    resolver = get_registry(args.artifacts).get().vendor_resolver
+    if resolver is None:
+        ap.error('no vendor_resolver.pkl in the artifacts; retrain with `python model_train.py`')
+    for name in args.names:
+        print(f'{name!r} -> {resolver.resolve(name)!r}  (key {canonical_vendor(name)!r})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+# vendor_stats.py
+# Incremental per-vendor amount statistics (Welford running mean/variance), a
+# drop-in replacement for the frozen stats.json dict used by extract_invoice_features.
+# Usage: python vendor_stats.py merge shard1.json shard2.json -o merged.json
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+STORE_VERSION = 1
+
+
+def _merge_moments(a, b):
+    # Chan et al. parallel combination of (count, mean, M2) triples
+    n_a, mean_a, m2_a = a
+    n_b, mean_b, m2_b = b
+    n = n_a + n_b
+    if n == 0:
+        return [0, 0.0, 0.0]
+    delta = mean_b - mean_a
+    return [n, mean_a + delta * n_b / n, m2_a + m2_b + delta * delta * n_a * n_b / n]
+
+
+class VendorStatsStore:
+    """Running count/mean/variance of invoice amounts per vendor and overall.
+
+    update() is O(1) per invoice, update_many() folds in a whole batch with one
+    groupby, and merge() combines stores built on different shards. lookup()
+    returns the (count, mean, std) extract_invoice_features needs, with the
+    global mean/std for unseen vendors; to_stats() produces the stats.json dict.
+    """
+
+    def __init__(self):
+        self._vendors = {}  # vendor -> [count, mean, M2]
+        self._global = [0, 0.0, 0.0]
+
+    def __len__(self):
+        return len(self._vendors)
+
+    def __contains__(self, vendor):
+        return vendor in self._vendors
+
+    def update(self, vendor, amount):
+        amount = float(amount)
+        for moments in (self._vendors.setdefault(vendor, [0, 0.0, 0.0]), self._global):
+            moments[0] += 1
+            delta = amount - moments[1]
+            moments[1] += delta / moments[0]
+            moments[2] += delta * (amount - moments[1])
+
+    def update_many(self, vendors, amounts):
+        df = pd.DataFrame({'vendor': vendors, 'amount': np.asarray(amounts, dtype=np.float64)}).dropna()
+        if df.empty:
+            return
+        g = df.groupby('vendor')['amount'].agg(['count', 'mean', 'var'])
+        m2 = g['var'].fillna(0.0).to_numpy() * (g['count'].to_numpy() - 1)
+        for vendor, n, mean, v_m2 in zip(g.index, g['count'].to_numpy(), g['mean'].to_numpy(), m2):
+            self._vendors[vendor] = _merge_moments(self._vendors.get(vendor, [0, 0.0, 0.0]),
+                                                   (int(n), float(mean), float(v_m2)))
+        amt = df['amount'].to_numpy()
+        self._global = _merge_moments(self._global, (len(amt), float(amt.mean()), float(((amt - amt.mean()) ** 2).sum())))
+
+    def merge(self, other):
+        for vendor, moments in other._vendors.items():
+            self._vendors[vendor] = _merge_moments(self._vendors.get(vendor, [0, 0.0, 0.0]), moments)
+        self._global = _merge_moments(self._global, other._global)
+        return self
+
+    @property
+    def global_mean(self):
+        return self._global[1]
+
+    @property
+    def global_std(self):
+        n, _, m2 = self._global
+        return float(np.sqrt(m2 / n)) if n else 0.0
+
+    def lookup(self, vendor):
+        # (count, mean, population std) for a vendor; global mean/std if unseen
+        moments = self._vendors.get(vendor)
+        if moments is None:
+            return 0, self.global_mean, self.global_std
+        n, mean, m2 = moments
+        return n, mean, float(np.sqrt(max(m2, 0.0) / n))
+
+    def to_stats(self):
+        # the stats.json dict format written by model_train.py
+        counts, means, stds = {}, {}, {}
+        for vendor in self._vendors:
+            counts[vendor], means[vendor], stds[vendor] = self.lookup(vendor)
+        return {
+            'vendor_counts': counts,
+            'vendor_amount_mean': means,
+            'vendor_amount_std': stds,
+            'global_mean': float(self.global_mean),
+            'global_std': self.global_std,
+        }
+
+    @classmethod
+    def from_dataframe(cls, df):
+        store = cls()
+        store.update_many(df['vendor'], df['amount'])
+        return store
+
+    @classmethod
+    def from_stats(cls, stats):
+        # rebuild from a stats.json dict (exact up to float rounding)
+        store = cls()
+        for vendor, n in stats['vendor_counts'].items():
+            std = stats['vendor_amount_std'].get(vendor, 0.0)
+            store._vendors[vendor] = [int(n), float(stats['vendor_amount_mean'][vendor]), float(std) ** 2 * int(n)]
+        n = sum(m[0] for m in store._vendors.values())
+        store._global = [n, float(stats['global_mean']), float(stats['global_std']) ** 2 * n]
+        return store
+
+    def save(self, path):
+        # column-oriented JSON: one array per field instead of one object per vendor
+        names = list(self._vendors)
+        moments = np.array([self._vendors[v] for v in names], dtype=np.float64).reshape(-1, 3)
+        payload = {
+            'version': STORE_VERSION,
+            'vendors': names,
+            'count': moments[:, 0].astype(np.int64).tolist(),
+            'mean': moments[:, 1].tolist(),
+            'm2': moments[:, 2].tolist(),
+            'global': self._global,
+        }
+        tmp = f'{path}.tmp-{os.getpid()}'
+        with open(tmp, 'w') as f:
+            json.dump(payload, f, separators=(',', ':'))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            payload = json.load(f)
+        if payload.get('version') != STORE_VERSION:
+            raise ValueError(f'unsupported vendor stats version: {payload.get("version")}')
+        store = cls()
+        store._vendors = {v: [int(n), float(m), float(m2)]
+                          for v, n, m, m2 in zip(payload['vendors'], payload['count'], payload['mean'], payload['m2'])}
+        store._global = [int(payload['global'][0]), float(payload['global'][1]), float(payload['global'][2])]
+        return store
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='Vendor statistics store utilities')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    m = sub.add_parser('merge', help='merge stores built on separate shards')
+    m.add_argument('inputs', nargs='+')
+    m.add_argument('-o', '--out', required=True)
+    args = ap.parse_args(argv)
+
+    if args.cmd == 'merge':
+        merged = VendorStatsStore()
+        for path in args.inputs:
+            merged.merge(VendorStatsStore.load(path))
+        merged.save(args.out)
+        print(f'Merged {len(args.inputs)} stores -> {args.out} ({len(merged)} vendors)')
+
+
+if __name__ == '__main__':
+    main()